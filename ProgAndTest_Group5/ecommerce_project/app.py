@@ -1,14 +1,60 @@
-from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify
-from utils.db import SimpleDB
-from utils.auth import SimpleAuth
+from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify, g, make_response, send_from_directory
+from markupsafe import Markup
+from utils.db import SimpleDB, normalize_email
+from utils.auth import AuthBusyError, SimpleAuth
+from utils.inventory import Inventory
+from utils.search import ProductSearchIndex, SuggestIndex
+from utils.catalog import CategoryTree, ProductListing, SORTS
+from utils.unit_of_work import UnitOfWork
+from utils.stats import STATS_FILE, StatsStore
+from utils.analytics import SalesAnalytics
+from utils.ratelimit import SharedWindowLimiter
+from utils.cache import TTLCache
+from utils.assets import AssetManifest, ENCODINGS
+from utils.images import ImageVariants
+from utils.metrics import metrics, TimedTemplate
+from config import Config
 import os
-from datetime import datetime
+import hashlib
+import mimetypes
+from functools import wraps
+from datetime import datetime, timedelta, timezone
 
 app = Flask(__name__)
-app.secret_key = 'ecommerce-secret-key-2024'
+# Mọi worker phải dùng cùng khóa để đọc được cookie session do worker khác tạo
+app.secret_key = Config.SECRET_KEY
 
 db = SimpleDB()
 auth = SimpleAuth()
+# Tồn kho theo từng sản phẩm (nguồn dữ liệu chính cho số lượng còn bán được)
+inventory = Inventory(db)
+# Chỉ mục tìm kiếm sản phẩm (tự cập nhật khi admin thêm/sửa/xóa sản phẩm)
+search_index = ProductSearchIndex(db)
+# Gợi ý tên sản phẩm khi gõ vào ô tìm kiếm
+suggest_index = SuggestIndex(db)
+# Cây danh mục tính sẵn (con cháu mọi cấp và sản phẩm của từng nhánh)
+category_tree = CategoryTree(db)
+# Các mảng sản phẩm sắp xếp sẵn theo id/giá/tên để phân trang và lọc theo giá
+product_listing = ProductListing(db)
+# Chỉ số của dashboard admin, được cập nhật dần khi dữ liệu thay đổi
+stats_store = StatsStore(db)
+# Dữ liệu bán hàng dạng cột cho các báo cáo theo ngày/sản phẩm/danh mục
+sales_analytics = SalesAnalytics(db, category_tree)
+# Giới hạn số lần đăng nhập theo IP (mọi lần thử) và theo tài khoản (lần sai), chặn trước khi chạy bcrypt;
+# số lần được đếm chung cho mọi worker qua file trong data/ratelimit
+login_ip_limiter = SharedWindowLimiter(Config.LOGIN_IP_LIMIT, Config.LOGIN_WINDOW_SECONDS,
+                                       os.path.join(db.data_dir, 'ratelimit', 'login_ip'))
+login_account_limiter = SharedWindowLimiter(Config.LOGIN_ACCOUNT_LIMIT, Config.LOGIN_WINDOW_SECONDS,
+                                            os.path.join(db.data_dir, 'ratelimit', 'login_account'))
+# Cache toàn trang catalog cho khách chưa đăng nhập và cache HTML của lưới sản phẩm
+page_cache = TTLCache(Config.PAGE_CACHE_TTL, Config.PAGE_CACHE_MAX_ENTRIES)
+fragment_cache = TTLCache(Config.FRAGMENT_CACHE_TTL, Config.FRAGMENT_CACHE_MAX_ENTRIES)
+# Manifest của các file tĩnh đã build (static/dist, tạo bằng build_assets.py)
+asset_manifest = AssetManifest(app.static_folder)
+# Các bản thu nhỏ của ảnh sản phẩm (static/images/variants, sinh khi admin thêm/sửa sản phẩm)
+image_variants = ImageVariants(app.static_folder, app.static_url_path)
+# Đo thời gian render từng template (chỉ khi bật METRICS_ENABLED)
+app.jinja_env.template_class = TimedTemplate
 
 # Helper functions
 def format_currency(amount):
@@ -20,27 +66,190 @@ def format_currency(amount):
 # Đăng ký bộ lọc Jinja2 tên 'currency' để dùng trong template: {{ value|currency }}
 app.jinja_env.filters['currency'] = format_currency
 
+def asset_url(filename):
+    # Đường dẫn tới file tĩnh, nhận tên như url_for('static', filename=...) ('css/style.css')
+    # hoặc đường dẫn đầy đủ như cột image của sản phẩm ('/static/images/15-pro.jpg').
+    # Nếu đã chạy build_assets.py thì trả về bản có mã băm trong tên (/assets/...) để trình
+    # duyệt cache lâu dài; chưa build thì dùng /static như cũ.
+    if not filename or '://' in filename:
+        return filename
+    prefix = app.static_url_path + '/'
+    if filename.startswith(prefix):
+        filename = filename[len(prefix):]
+    elif filename.startswith('/'):
+        return filename
+    hashed = asset_manifest.hashed(filename)
+    if hashed:
+        return url_for('dist_asset', filename=hashed)
+    return url_for('static', filename=filename)
+
+# Dùng trong template: {{ asset_url('css/style.css') }}
+app.jinja_env.globals['asset_url'] = asset_url
+
+def image_srcset(image, format='jpeg'):
+    # Giá trị thuộc tính srcset ("... 320w, ... 800w") từ các bản thu nhỏ của ảnh theo
+    # định dạng ('avif', 'webp', 'jpeg'); chuỗi rỗng nếu chưa sinh (dùng macro picture trong _image.html)
+    return ', '.join(f'{asset_url(path)} {width}w' for path, width in image_variants.variants(image).get(format, []))
+
+app.jinja_env.globals['image_srcset'] = image_srcset
+
+@app.before_request
+def start_metrics():
+    # Bắt đầu đo request (db_read, db_commit, auth, render) nếu METRICS_ENABLED
+    g.metrics_trace = metrics.start_request()
+
+@app.after_request
+def finish_metrics(response):
+    # Đăng ký trước commit_uow nên chạy sau nó (after_request chạy ngược thứ tự đăng ký),
+    # nhờ vậy thời gian ghi dữ liệu cuối request cũng được tính
+    trace = g.pop('metrics_trace', None)
+    if trace is not None:
+        response.headers['Server-Timing'] = metrics.finish_request(
+            trace, request.endpoint or 'unknown', request.method, response.status_code)
+    return response
+
+@app.teardown_request
+def abort_metrics(exc):
+    # Lỗi chưa xử lý vẫn được Flask đổi thành response 500 và chạy after_request (finish_metrics
+    # ghi lại mã 500); hook này chỉ còn việc khi không có response nào, ví dụ một hook
+    # after_request khác ném lỗi ngay trong lần xử lý lỗi đó: vẫn ghi lại là lỗi 500
+    trace = g.pop('metrics_trace', None)
+    if trace is not None:
+        metrics.finish_request(trace, request.endpoint or 'unknown', request.method, 500)
+
+def get_uow():
+    # Unit of work của request hiện tại: mỗi bảng chỉ được tải một lần cho cả route,
+    # get_cart_count() và template; thay đổi được ghi một lần khi request kết thúc.
+    if 'uow' not in g:
+        g.uow = UnitOfWork(db)
+    return g.uow
+
+@app.after_request
+def commit_uow(response):
+    # Ghi các bảng đã thay đổi trong một giao dịch. after_request cũng chạy cho response 500
+    # khi route ném lỗi (Flask handle_exception -> finalize_request) nên lỗi server thì bỏ
+    # các thay đổi dở dang thay vì ghi
+    uow = g.pop('uow', None)
+    if uow is not None:
+        if response.status_code >= 500:
+            uow.rollback()
+        else:
+            uow.commit()
+    return response
+
+@app.teardown_request
+def discard_uow(exc):
+    # Phòng khi commit_uow không chạy tới (hook after_request khác ném lỗi): bỏ các thay đổi chưa ghi
+    uow = g.pop('uow', None)
+    if uow is not None:
+        uow.rollback()
+
+@app.errorhandler(AuthBusyError)
+def auth_busy(error):
+    # Pool băm mật khẩu đang quá tải: trả lời 503 ngay để client thử lại sau,
+    # thay vì giữ luồng của request chờ và làm chậm các route khác
+    return 'Hệ thống đang bận, vui lòng thử lại sau giây lát.', 503, {'Retry-After': '1'}
+
+def get_active_cart(user_id):
+    # Lấy các giỏ hàng của user qua chỉ mục user_id thay vì duyệt toàn bộ carts.json,
+    # rồi chọn giỏ đang active (True), trả về None nếu không có.
+    return next((c for c in get_uow().find_by('carts.json', 'user_id', user_id) if c['active']), None)
+
+def refresh_cart_summary():
+    # Tính lại tóm tắt giỏ hàng của user hiện tại (id giỏ active, tổng số lượng, tạm tính)
+    # và lưu vào session để badge trên navbar không phải đọc các bảng giỏ hàng mỗi trang.
+    summary = {'cart_id': None, 'count': 0, 'subtotal': 0}
+    user_cart = get_active_cart(session['user_id'])
+    if user_cart:
+        summary['cart_id'] = user_cart['id']
+        # Lấy các item có cart_id khớp với id của giỏ hàng tìm được qua chỉ mục cart_id.
+        for item in get_uow().find_by('cart_items.json', 'cart_id', user_cart['id']):
+            product = get_uow().get_by_id('products.json', item['product_id'])
+            if product:
+                # Tổng số lượng hàng và tạm tính của giỏ
+                summary['count'] += item['quantity']
+                summary['subtotal'] += product['price'] * item['quantity']
+    session['cart_summary'] = summary
+    return summary
+
 def get_cart_count():
     # Nếu session không chứa 'user_id' (người dùng chưa đăng nhập), trả về 0.
     if 'user_id' not in session:
         return 0
     
-    # Đọc danh sách giỏ hàng từ file carts.json (db.load trả về [] nếu file không tồn tại).
-    carts = db.load('carts.json')
-    # Tìm giỏ hàng của user hiện tại mà đang active (True).
-    # Sử dụng next(..., None) để lấy phần tử đầu tiên thỏa điều kiện hoặc None nếu không có.
-    user_cart = next((c for c in carts if c['user_id'] == session['user_id'] and c['active']), None)
-    
-    # Nếu không tìm thấy giỏ hàng active cho user, trả về 0.
-    if not user_cart:
-        return 0
-    
-    # Đọc danh sách item trong giỏ từ cart_items.json.
-    cart_items = db.load('cart_items.json')
-    # Lọc ra các item có cart_id khớp với id của giỏ hàng tìm được.
-    user_items = [item for item in cart_items if item['cart_id'] == user_cart['id']]
-    # Tổng số lượng hàng trong giỏ: cộng trường 'quantity' của từng item.
-    return sum(item['quantity'] for item in user_items)
+    # Đọc số lượng từ tóm tắt giỏ hàng trong session (O(1)); chỉ tính lại khi chưa có,
+    # ví dụ ngay sau khi đăng nhập. Các route sửa giỏ hàng tự cập nhật tóm tắt này.
+    summary = session.get('cart_summary')
+    if summary is None:
+        summary = refresh_cart_summary()
+    return summary['count']
+def apply_stock(products):
+    # Gán số lượng còn bán được (lấy từ kho theo từng sản phẩm) vào danh sách sản phẩm để hiển thị
+    levels = inventory.stock_levels([p['id'] for p in products])
+    for product in products:
+        product['stock'] = levels[product['id']]
+    return products
+
+def catalog_version():
+    # Version của các bảng mà trang catalog phụ thuộc: đổi khi sản phẩm hoặc danh mục được ghi,
+    # khi tồn kho đổi (giữ/trả hàng không ghi products.json nhưng đổi số lượng còn bán hiển thị)
+    # và khi manifest file tĩnh đổi (trang chứa đường dẫn có mã băm của ảnh/CSS)
+    return (db.version('products.json'), db.version('categories.json'), inventory.version(),
+            asset_manifest.version)
+
+def render_product_grid(products):
+    # Lưới thẻ sản phẩm (templates/_product_grid.html) được render một lần rồi dùng lại
+    # cho mọi trang có cùng các sản phẩm và cùng số lượng tồn kho, kể cả khi đã đăng nhập
+    key = (db.version('products.json'), asset_manifest.version, tuple((p['id'], p['stock']) for p in products))
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(render_template('_product_grid.html', products=products))
+        fragment_cache.set(key, html)
+    return html
+
+def cached_page(view):
+    # Cache toàn trang cho khách chưa đăng nhập: trang catalog giống nhau với mọi khách
+    # nên chỉ render một lần trong PAGE_CACHE_TTL giây (hoặc tới khi admin sửa sản phẩm).
+    # Khóa gồm URL và version của bảng sản phẩm/danh mục/tồn kho; ETag + Last-Modified giúp
+    # trình duyệt nhận 304 thay vì tải lại cả trang.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Đã đăng nhập (trang có giỏ hàng riêng) hoặc còn thông báo flash chờ hiển thị: không cache
+        if 'user_id' in session or '_flashes' in session or not page_cache.enabled:
+            return view(*args, **kwargs)
+        key = (request.full_path, catalog_version())
+        page = page_cache.get(key)
+        if page is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                # Chuyển hướng (ví dụ sản phẩm không tồn tại) thì không lưu lại
+                return response
+            body = response.get_data()
+            page = (body, response.mimetype, hashlib.sha1(body).hexdigest(),
+                    datetime.now(timezone.utc).replace(microsecond=0))
+            page_cache.set(key, page)
+        body, mimetype, etag, last_modified = page
+        response = app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Trình duyệt luôn hỏi lại máy chủ (no-cache) và nhận 304 nếu trang chưa đổi;
+        # Vary: Cookie để cache trung gian không trả trang của khách cho người đã đăng nhập
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
+
+def invalidate_catalog_cache():
+    # Admin đã sửa sản phẩm/danh mục: bỏ mọi trang và lưới sản phẩm đã cache
+    page_cache.clear()
+    fragment_cache.clear()
+
+def release_stock_hold():
+    # Giỏ hàng đã thay đổi: trả lại lượng hàng đang giữ cho trang thanh toán (nếu có)
+    hold = session.pop('stock_hold', None)
+    if hold:
+        inventory.release(hold)
+
 def require_admin():
     # Kiểm tra xem người dùng đã đăng nhập chưa và có vai trò là admin không
     if 'user_id' not in session or session.get('role') != 'admin':
@@ -60,11 +269,14 @@ def require_login():
 # ==================== ROUTES ====================
 
 @app.route('/')
+@cached_page
 def home():
-    # Tải danh sách tất cả sản phẩm từ file products.json
-    products = db.load('products.json')
+    # Chỉ lấy vài sản phẩm đầu tiên để hiển thị (không tải toàn bộ danh mục)
+    product_ids, _ = product_listing.page(limit=Config.HOME_PRODUCTS)
+    products = apply_stock([db.get_by_id('products.json', pid) for pid in product_ids])
     # Trả về trang chính (index.html) với danh sách sản phẩm và số lượng giỏ hàng hiện tại
-    return render_template('index.html', products=products, cart_count=get_cart_count())
+    return render_template('index.html', products=products, product_grid=render_product_grid(products),
+                           cart_count=get_cart_count())
 
 # ==================== AUTHENTICATION ====================
 
@@ -74,31 +286,49 @@ def register():
     if request.method == 'POST':
         # Lấy dữ liệu từ form: tên, email và mật khẩu
         name = request.form['name']
-        email = request.form['email']
+        # Email được chuẩn hóa (bỏ khoảng trắng, chữ thường) để không trùng do khác hoa/thường
+        email = normalize_email(request.form['email'])
         password = request.form['password']
         
-        # Tải danh sách tất cả người dùng từ file users.json
-        users = db.load('users.json')
+        # Đăng ký cũng tốn một lần bcrypt nên dùng chung giới hạn theo IP với đăng nhập
+        if login_ip_limiter.attempt(request.remote_addr):
+            flash('Bạn thao tác quá nhiều lần, vui lòng thử lại sau!', 'error')
+            return render_template('register.html'), 429
         
-        # Kiểm tra xem email đã tồn tại trong hệ thống chưa
-        if any(user['email'] == email for user in users):
-            # Nếu email tồn tại, hiển thị thông báo lỗi
+        # Kiểm tra email đã tồn tại qua chỉ mục email trước khi tốn công băm mật khẩu
+        if db.get_by_key('users.json', 'email', email):
             flash('Email đã tồn tại!', 'error')
-            # Trả về form đăng ký
             return render_template('register.html')
         
-        # Tạo đối tượng người dùng mới với các thông tin:
-        new_user = {
-            'id': db.get_next_id(users),  # ID tự động tăng
-            'name': name,  # Tên người dùng
-            'email': email,  # Email người dùng
-            'password_hash': auth.hash_password(password),  # Mã hóa mật khẩu
-            'role': 'user'  # Vai trò mặc định là người dùng thường
-        }
-        # Thêm người dùng mới vào danh sách
-        users.append(new_user)
-        # Lưu danh sách người dùng cập nhật vào file
-        db.save('users.json', users)
+        # Mã hóa mật khẩu trước khi khóa bảng (bcrypt chậm, không nên giữ khóa trong lúc băm)
+        password_hash = auth.hash_password(password)
+        
+        # Ghi người dùng mới và chỉ số dashboard trong cùng một giao dịch
+        with db.transaction('users.json', STATS_FILE) as tx:
+            # Tải danh sách tất cả người dùng trong giao dịch
+            users = tx.load('users.json')
+            
+            # Kiểm tra lại trong giao dịch (có thể vừa có người đăng ký cùng email)
+            if db.get_by_key('users.json', 'email', email):
+                # Nếu email tồn tại, hiển thị thông báo lỗi
+                flash('Email đã tồn tại!', 'error')
+                # Trả về form đăng ký
+                return render_template('register.html')
+            
+            # Tạo đối tượng người dùng mới với các thông tin:
+            new_user = {
+                'id': db.next_id('users.json'),  # ID tự động tăng từ bộ đếm của bảng
+                'name': name,  # Tên người dùng
+                'email': email,  # Email người dùng
+                'password_hash': password_hash,  # Mật khẩu đã mã hóa
+                'role': 'user'  # Vai trò mặc định là người dùng thường
+            }
+            # Thêm người dùng mới vào danh sách
+            users.append(new_user)
+            # Đưa danh sách người dùng cập nhật vào giao dịch
+            tx.save('users.json', users)
+            # Tăng số người dùng trên dashboard
+            stats_store.apply(tx, total_users=1)
         
         # Hiển thị thông báo đăng ký thành công
         flash('Đăng ký thành công! Hãy đăng nhập.', 'success')
@@ -112,18 +342,25 @@ def register():
 def login():
     # Kiểm tra xem yêu cầu là GET (hiển thị form) hay POST (xử lý đăng nhập)
     if request.method == 'POST':
-        # Lấy email từ form đăng nhập
-        email = request.form['email']
+        # Lấy email từ form đăng nhập (chuẩn hóa để tra chỉ mục không phân biệt hoa thường)
+        email = normalize_email(request.form['email'])
         # Lấy mật khẩu từ form đăng nhập
         password = request.form['password']
         
-        # Tải danh sách tất cả người dùng từ file users.json
-        users = db.load('users.json')
-        # Tìm người dùng có email khớp với email nhập vào, trả về None nếu không tìm thấy
-        user = next((u for u in users if u['email'] == email), None)
+        # Chặn IP/tài khoản đang bị dò mật khẩu trước khi tốn công chạy bcrypt: mỗi giới hạn
+        # kiểm tra và ghi nhận lần thử trong một bước (lần thử của tài khoản được xóa nếu đăng nhập đúng)
+        retry = login_ip_limiter.attempt(request.remote_addr) or login_account_limiter.attempt(email)
+        if retry:
+            flash(f'Đăng nhập sai quá nhiều lần, vui lòng thử lại sau {retry} giây!', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(retry)}
+        
+        # Tìm người dùng theo email qua chỉ mục email, trả về None nếu không tìm thấy
+        user = db.get_by_key('users.json', 'email', email)
         
         # Kiểm tra xem người dùng tồn tại và mật khẩu nhập vào có khớp với mật khẩu đã mã hóa không
         if user and auth.verify_password(password, user['password_hash']):
+            # Đăng nhập đúng: xóa các lần sai trước đó của tài khoản
+            login_account_limiter.reset(email)
             # Lưu ID người dùng vào session
             session['user_id'] = user['id']
             # Lưu tên người dùng vào session
@@ -132,6 +369,18 @@ def login():
             session['role'] = user['role']
             # Lưu email người dùng vào session
             session['user_email'] = user['email']
+            # Tóm tắt giỏ hàng được tính lại cho người dùng vừa đăng nhập
+            session.pop('cart_summary', None)
+            
+            # Hash được tạo với số vòng bcrypt khác cấu hình hiện tại: băm lại ngay lúc có mật khẩu gốc
+            if auth.needs_rehash(user['password_hash']):
+                new_hash = auth.hash_password(password)
+                with db.transaction('users.json') as tx:
+                    users = tx.load('users.json')
+                    for row in users:
+                        if row['id'] == user['id']:
+                            row['password_hash'] = new_hash
+                    tx.save('users.json', users)
             
             # Kiểm tra xem người dùng có vai trò admin không
             if user['role'] == 'admin':
@@ -143,6 +392,7 @@ def login():
             # Chuyển hướng về trang chính
             return redirect(url_for('home'))
         else:
+            # Lần sai đã được ghi nhận cho tài khoản ở trên (kể cả email không tồn tại)
             # Nếu email hoặc mật khẩu không đúng, hiển thị thông báo lỗi
             flash('Email hoặc mật khẩu không đúng!', 'error')
     
@@ -161,57 +411,100 @@ def logout():
 # ==================== PRODUCTS ====================
 
 @app.route('/products')
+@cached_page
 def products():
     # Lấy tham số 'category' từ URL query string, chuyển đổi sang kiểu int, mặc định là None
     category_id = request.args.get('category', type=int)
     # Lấy tham số 'search' từ URL query string, mặc định là chuỗi rỗng nếu không có
     search = request.args.get('search', '')
+    # Kiểu sắp xếp, khoảng giá và trang hiện tại (bắt đầu từ 1)
+    sort = request.args.get('sort', 'relevance' if search else 'default')
+    if sort not in SORTS and not (search and sort == 'relevance'):
+        sort = 'default'
+    min_price = request.args.get('min_price', type=int)
+    max_price = request.args.get('max_price', type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = Config.PRODUCTS_PER_PAGE
     
-    # Tải danh sách tất cả sản phẩm từ file products.json
-    all_products = db.load('products.json')
-    # Tải danh sách tất cả danh mục từ file categories.json
-    categories = db.load('categories.json')
-    
-    # Khởi tạo danh sách sản phẩm được lọc bằng tất cả sản phẩm
-    filtered_products = all_products
-    
-    # Nếu có category_id được chọn (người dùng lọc theo danh mục)
-    if category_id:
-        # Lấy tất cả ID danh mục con có parent_id bằng category_id hiện tại
-        subcategory_ids = [cat['id'] for cat in categories if cat['parent_id'] == category_id]
-        
-        # Nếu tồn tại danh mục con
-        if subcategory_ids:
-            # Lọc sản phẩm có category_id nằm trong danh mục con
-            filtered_products = [p for p in filtered_products if p['category_id'] in subcategory_ids]
-        else:
-            # Nếu không có danh mục con, lọc sản phẩm trực tiếp theo category_id
-            filtered_products = [p for p in filtered_products if p['category_id'] == category_id]
+    # Tập id sản phẩm của danh mục được chọn và mọi danh mục con cháu (tính sẵn trong cây danh mục)
+    category_product_ids = category_tree.product_ids(category_id) if category_id else None
     
     # Nếu có từ khóa tìm kiếm
     if search:
-        # Lọc sản phẩm có tên chứa từ khóa tìm kiếm (không phân biệt hoa thường)
-        filtered_products = [p for p in filtered_products if search.lower() in p['name'].lower()]
+        # Tra chỉ mục tìm kiếm (tên + mô tả, không phân biệt dấu, khớp tiền tố),
+        # kết quả đã được sắp theo độ liên quan
+        candidates = search_index.search(search)
+        if category_product_ids is not None:
+            candidates = [pid for pid in candidates if pid in category_product_ids]
+    else:
+        # Không tìm kiếm: mọi sản phẩm, hoặc chỉ sản phẩm của nhánh danh mục đã chọn
+        candidates = category_product_ids
+    
+    # Lấy đúng một trang id từ các mảng đã sắp xếp sẵn rồi mới tra từng sản phẩm
+    page_ids, total = product_listing.page(sort=sort, min_price=min_price, max_price=max_price,
+                                           only=candidates, offset=(page - 1) * per_page, limit=per_page)
+    filtered_products = apply_stock([db.get_by_id('products.json', pid) for pid in page_ids])
     
     # Trả về template products.html với dữ liệu:
-    # - products: danh sách sản phẩm đã được lọc
-    # - categories: danh sách tất cả danh mục
+    # - products: các sản phẩm của trang hiện tại (product_grid: lưới sản phẩm đã render)
+    # - categories: các danh mục theo thứ tự cây, kèm độ sâu để thụt lề
     # - selected_category: danh mục được chọn hiện tại
     # - search_query: từ khóa tìm kiếm
     # - cart_count: số lượng sản phẩm trong giỏ hàng
     return render_template('products.html', 
                          products=filtered_products,
-                         categories=categories,
+                         product_grid=render_product_grid(filtered_products),
+                         categories=category_tree.walk(),
                          selected_category=category_id,
                          search_query=search,
+                         sort=sort,
+                         min_price=min_price,
+                         max_price=max_price,
+                         page=page,
+                         total=total,
+                         total_pages=max((total + per_page - 1) // per_page, 1),
                          cart_count=get_cart_count())
 
+@app.route('/assets/<path:filename>')
+def dist_asset(filename):
+    # File tĩnh đã build: tên chứa mã băm nội dung nên không bao giờ đổi, trình duyệt được
+    # cache tới ASSET_MAX_AGE giây mà không cần hỏi lại. Trả bản nén sẵn (.br/.gz) nếu
+    # trình duyệt chấp nhận thay vì nén lại ở mỗi request.
+    mimetype = mimetypes.guess_type(filename)[0]
+    available = asset_manifest.encodings(filename)
+    for encoding, suffix in ENCODINGS:
+        if encoding in available and request.accept_encodings.quality(encoding) > 0:
+            response = send_from_directory(asset_manifest.dist_dir, filename + suffix,
+                                           mimetype=mimetype, max_age=Config.ASSET_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(asset_manifest.dist_dir, filename, max_age=Config.ASSET_MAX_AGE)
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Số liệu của tiến trình theo định dạng Prometheus; chỉ trả lời khi bật METRICS_ENABLED
+    # và request đến từ địa chỉ trong METRICS_ALLOWED_IPS (mặc định chỉ máy chủ này)
+    if not metrics.enabled or request.remote_addr not in Config.METRICS_ALLOWED_IPS:
+        return 'Not Found', 404
+    return app.response_class(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/suggest')
+def api_suggest():
+    # Gợi ý tên sản phẩm theo tiền tố cho ô tìm kiếm (typeahead), trả về JSON
+    query = request.args.get('q', '')
+    # Không cho phép yêu cầu quá nhiều kết quả một lần
+    limit = min(request.args.get('limit', Config.SUGGEST_LIMIT, type=int), 20)
+    return jsonify({'query': query, 'suggestions': suggest_index.suggest(query, limit=max(limit, 1))})
+
 @app.route('/product/<int:product_id>')
+@cached_page
 def product_detail(product_id):
-    # Tải danh sách tất cả sản phẩm từ file products.json
-    products = db.load('products.json')
-    # Tìm sản phẩm có id khớp với product_id từ URL, trả về None nếu không tìm thấy
-    product = next((p for p in products if p['id'] == product_id), None)
+    # Tìm sản phẩm có id khớp với product_id từ URL qua chỉ mục id, trả về None nếu không tìm thấy
+    product = db.get_by_id('products.json', product_id)
     
     # Kiểm tra xem sản phẩm có tồn tại không
     if not product:
@@ -223,6 +516,8 @@ def product_detail(product_id):
     # Trả về template product_detail.html với dữ liệu:
     # - product: thông tin chi tiết sản phẩm
     # - cart_count: số lượng sản phẩm trong giỏ hàng
+    # Lấy số lượng còn bán được từ kho
+    apply_stock([product])
     return render_template('product_detail.html', product=product, cart_count=get_cart_count())
 
 # ==================== CART & ORDERS (USER) ====================
@@ -232,35 +527,38 @@ def cart():
     # Kiểm tra người dùng đã đăng nhập chưa, nếu chưa thì chuyển hướng đến trang đăng nhập
     require_login()
     
-    # Tải danh sách tất cả giỏ hàng từ file carts.json
-    carts = db.load('carts.json')
     # Tìm giỏ hàng của user hiện tại mà đang active (True), trả về None nếu không tìm thấy
-    user_cart = next((c for c in carts if c['user_id'] == session['user_id'] and c['active']), None)
+    user_cart = get_active_cart(session['user_id'])
     
     # Nếu user không có giỏ hàng active, trả về template với dữ liệu rỗng
     if not user_cart:
+        session['cart_summary'] = {'cart_id': None, 'count': 0, 'subtotal': 0}
         return render_template('cart.html', cart_items=[], total=0, cart_count=0)
     
-    # Tải danh sách tất cả item trong giỏ từ file cart_items.json
-    cart_items = db.load('cart_items.json')
-    # Lọc ra các item thuộc giỏ hàng của user hiện tại
-    user_items = [item for item in cart_items if item['cart_id'] == user_cart['id']]
+    # Lấy các item thuộc giỏ hàng của user hiện tại qua chỉ mục cart_id
+    user_items = get_uow().find_by('cart_items.json', 'cart_id', user_cart['id'])
     
     # Khởi tạo biến tính tổng giá trị giỏ hàng
     total = 0
     # Lặp qua từng item trong giỏ hàng của user
     for item in user_items:
-        # Tìm sản phẩm có id khớp với product_id của item, trả về None nếu không tìm thấy
-        product = next((p for p in db.load('products.json') if p['id'] == item['product_id']), None)
+        # Tìm sản phẩm có id khớp với product_id của item qua chỉ mục id, trả về None nếu không tìm thấy
+        product = get_uow().get_by_id('products.json', item['product_id'])
         # Nếu sản phẩm tồn tại
         if product:
-            # Gán thông tin sản phẩm vào item
-            item['product'] = product
+            # Gán thông tin sản phẩm (kèm số lượng trong kho) vào item
+            item['product'] = apply_stock([product])[0]
             # Tính tiền từng dòng: giá sản phẩm × số lượng
             item['subtotal'] = product['price'] * item['quantity']
             # Cộng tiền từng dòng vào tổng
             total += item['subtotal']
     
+    # Trang giỏ hàng đọc dữ liệu thật nên đồng bộ lại tóm tắt trong session
+    # (phòng khi giỏ bị đổi từ thiết bị/phiên đăng nhập khác)
+    session['cart_summary'] = {'cart_id': user_cart['id'],
+                               'count': sum(item['quantity'] for item in user_items if 'product' in item),
+                               'subtotal': total}
+    
     # Trả về template cart.html với dữ liệu: danh sách item, tổng tiền, và số lượng giỏ hàng
     return render_template('cart.html', cart_items=user_items, total=total, cart_count=get_cart_count())
 
@@ -269,47 +567,45 @@ def add_to_cart(product_id):
     # Kiểm tra xem người dùng đã đăng nhập chưa, nếu chưa thì chuyển hướng đến trang đăng nhập
     require_login()
     
-    # Tải danh sách tất cả giỏ hàng từ file carts.json
-    carts = db.load('carts.json')
     # Tìm giỏ hàng của user hiện tại mà đang active (True), trả về None nếu không tìm thấy
-    user_cart = next((c for c in carts if c['user_id'] == session['user_id'] and c['active']), None)
+    user_cart = get_active_cart(session['user_id'])
     
     # Nếu user không có giỏ hàng active
     if not user_cart:
         # Tạo giỏ hàng mới với các thông tin:
         user_cart = {
-            'id': db.get_next_id(carts),  # ID tự động tăng
+            'id': db.next_id('carts.json'),  # ID tự động tăng từ bộ đếm của bảng
             'user_id': session['user_id'],  # ID của user hiện tại
             'active': True  # Đánh dấu là giỏ hàng đang hoạt động
         }
-        # Thêm giỏ hàng mới vào danh sách
-        carts.append(user_cart)
-        # Lưu danh sách giỏ hàng cập nhật vào file
-        db.save('carts.json', carts)
+        # Ghi nhận dòng mới (không tải cả bảng), bảng được lưu khi request kết thúc
+        get_uow().append('carts.json', user_cart)
     
-    # Tải danh sách tất cả item trong giỏ từ file cart_items.json
-    cart_items = db.load('cart_items.json')
-    # Tìm item trong giỏ hàng của user có product_id khớp, trả về None nếu không tìm thấy
-    existing_item = next((item for item in cart_items 
-                         if item['cart_id'] == user_cart['id'] and item['product_id'] == product_id), None)
+    # Tìm item trong giỏ hàng của user có product_id khớp qua chỉ mục cart_id, trả về None nếu không tìm thấy
+    existing_item = next((item for item in get_uow().find_by('cart_items.json', 'cart_id', user_cart['id'])
+                          if item['product_id'] == product_id), None)
     
     # Nếu sản phẩm đã tồn tại trong giỏ hàng
     if existing_item:
         # Tăng số lượng sản phẩm lên 1
         existing_item['quantity'] += 1
+        # Ghi nhận dòng đã sửa, bảng được lưu khi request kết thúc
+        get_uow().update_row('cart_items.json', existing_item)
     else:
         # Nếu sản phẩm chưa có trong giỏ, tạo item mới với các thông tin:
         new_item = {
-            'id': db.get_next_id(cart_items),  # ID tự động tăng
+            'id': db.next_id('cart_items.json'),  # ID tự động tăng từ bộ đếm của bảng
             'cart_id': user_cart['id'],  # ID của giỏ hàng
             'product_id': product_id,  # ID của sản phẩm
             'quantity': 1  # Số lượng mặc định là 1
         }
-        # Thêm item mới vào danh sách
-        cart_items.append(new_item)
+        # Ghi nhận dòng mới, bảng được lưu khi request kết thúc
+        get_uow().append('cart_items.json', new_item)
     
-    # Lưu danh sách item trong giỏ cập nhật vào file
-    db.save('cart_items.json', cart_items)
+    # Giỏ hàng đã đổi nên lượng hàng giữ cho lần thanh toán trước không còn đúng
+    release_stock_hold()
+    # Cập nhật tóm tắt giỏ hàng cho badge trên navbar
+    refresh_cart_summary()
     # Hiển thị thông báo thành công
     flash('Đã thêm vào giỏ hàng!', 'success')
     # Chuyển hướng về trang trước đó hoặc về trang danh sách sản phẩm nếu không có trang trước
@@ -327,17 +623,19 @@ def update_cart(item_id):
     if new_quantity <= 0:
         return remove_from_cart(item_id)
     
-    # Tải danh sách tất cả item trong giỏ từ file cart_items.json
-    cart_items = db.load('cart_items.json')
-    # Tìm item có id khớp với item_id từ URL, trả về None nếu không tìm thấy
-    item = next((item for item in cart_items if item['id'] == item_id), None)
+    # Tìm item có id khớp với item_id từ URL qua chỉ mục id, trả về None nếu không tìm thấy
+    item = get_uow().get_by_id('cart_items.json', item_id)
     
     # Nếu tìm thấy item trong giỏ hàng
     if item:
         # Cập nhật số lượng mới cho item
         item['quantity'] = new_quantity
-        # Lưu danh sách item cập nhật vào file
-        db.save('cart_items.json', cart_items)
+        # Ghi nhận dòng đã sửa, bảng được lưu khi request kết thúc
+        get_uow().update_row('cart_items.json', item)
+        # Giỏ hàng đã đổi nên lượng hàng giữ cho lần thanh toán trước không còn đúng
+        release_stock_hold()
+        # Cập nhật tóm tắt giỏ hàng cho badge trên navbar
+        refresh_cart_summary()
         # Hiển thị thông báo cập nhật thành công
         flash('Đã cập nhật giỏ hàng!', 'success')
     
@@ -349,12 +647,12 @@ def remove_from_cart(item_id):
     # Kiểm tra xem người dùng đã đăng nhập chưa, nếu chưa thì chuyển hướng đến trang đăng nhập
     require_login()
     
-    # Tải danh sách tất cả item trong giỏ từ file cart_items.json
-    cart_items = db.load('cart_items.json')
-    # Lọc ra các item có id khác với item_id, loại bỏ item cần xóa
-    cart_items = [item for item in cart_items if item['id'] != item_id]
-    # Lưu danh sách item đã cập nhật (sau khi xóa) vào file
-    db.save('cart_items.json', cart_items)
+    # Ghi nhận việc xóa item có id khớp với item_id (không tải cả bảng), bảng được lưu khi request kết thúc
+    get_uow().delete_rows('cart_items.json', [item_id])
+    # Giỏ hàng đã đổi nên lượng hàng giữ cho lần thanh toán trước không còn đúng
+    release_stock_hold()
+    # Cập nhật tóm tắt giỏ hàng cho badge trên navbar
+    refresh_cart_summary()
     # Hiển thị thông báo xóa sản phẩm thành công
     flash('Đã xóa sản phẩm khỏi giỏ hàng!', 'success')
     # Chuyển hướng về trang giỏ hàng
@@ -367,101 +665,126 @@ def checkout():
     
     # Kiểm tra xem yêu cầu là GET (hiển thị trang thanh toán) hay POST (xử lý thanh toán)
     if request.method == 'POST':
-        # Tải danh sách tất cả giỏ hàng từ file carts.json
-        carts = db.load('carts.json')
-        # Tìm giỏ hàng của user hiện tại mà đang active (True), trả về None nếu không tìm thấy
-        user_cart = next((c for c in carts if c['user_id'] == session['user_id'] and c['active']), None)
-        
-        # Nếu user không có giỏ hàng active
-        if not user_cart:
-            # Hiển thị thông báo giỏ hàng trống
-            flash('Giỏ hàng trống!', 'error')
-            # Chuyển hướng về trang giỏ hàng
-            return redirect(url_for('cart'))
-        
-        # Tải danh sách tất cả item trong giỏ từ file cart_items.json
-        cart_items = db.load('cart_items.json')
-        # Lọc ra các item thuộc giỏ hàng của user hiện tại
-        user_items = [item for item in cart_items if item['cart_id'] == user_cart['id']]
-        
-        # Kiểm tra xem giỏ hàng có item nào không
-        if not user_items:
-            # Hiển thị thông báo giỏ hàng trống
-            flash('Giỏ hàng trống!', 'error')
-            # Chuyển hướng về trang giỏ hàng
-            return redirect(url_for('cart'))
-        
-        # Khởi tạo biến tính tổng giá trị đơn hàng
-        total = 0
-        # Tải danh sách tất cả sản phẩm từ file products.json
-        products = db.load('products.json')
-        
-        # Lặp qua từng item trong giỏ hàng của user
-        for item in user_items:
-            # Tìm sản phẩm có id khớp với product_id của item, trả về None nếu không tìm thấy
-            product = next((p for p in products if p['id'] == item['product_id']), None)
-            # Nếu sản phẩm tồn tại
-            if product:
-                # Kiểm tra xem số lượng trong kho có đủ không
-                if product['stock'] < item['quantity']:
+        # Toàn bộ quá trình đặt hàng chạy trong một giao dịch: các bảng liên quan bị khóa
+        # và mọi thay đổi được ghi cùng lúc, nên nếu lỗi giữa chừng thì không bảng nào
+        # bị ghi dở. Tồn kho được trừ qua inventory (khóa theo từng sản phẩm), và chỉ
+        # dòng của các sản phẩm đã bán trong products.json được ghi lại số lượng mới.
+        sold_lines = None
+        try:
+            # products.json được khóa cùng (theo thứ tự tên như mọi giao dịch) vì trừ kho ghi lại
+            # số lượng mới vào products.json, và luôn phải khóa trước các file tồn kho
+            with db.transaction('carts.json', 'cart_items.json', 'orders.json', 'order_items.json',
+                                'products.json', STATS_FILE) as tx:
+                # Tìm giỏ hàng của user hiện tại mà đang active (True) qua chỉ mục user_id; các bảng
+                # đang bị khóa nên dữ liệu đọc được là mới nhất. Trả về None nếu không tìm thấy
+                user_cart = next((c for c in db.find_by('carts.json', 'user_id', session['user_id'])
+                                  if c['active']), None)
+                
+                # Nếu user không có giỏ hàng active
+                if not user_cart:
+                    # Hiển thị thông báo giỏ hàng trống
+                    flash('Giỏ hàng trống!', 'error')
+                    # Chuyển hướng về trang giỏ hàng
+                    return redirect(url_for('cart'))
+                
+                # Lấy các item thuộc giỏ hàng của user hiện tại qua chỉ mục cart_id
+                user_items = db.find_by('cart_items.json', 'cart_id', user_cart['id'])
+                
+                # Kiểm tra xem giỏ hàng có item nào không
+                if not user_items:
+                    # Hiển thị thông báo giỏ hàng trống
+                    flash('Giỏ hàng trống!', 'error')
+                    # Chuyển hướng về trang giỏ hàng
+                    return redirect(url_for('cart'))
+                
+                # Khởi tạo biến tính tổng giá trị đơn hàng
+                total = 0
+                # Ánh xạ id -> sản phẩm của các item trong giỏ (tra qua chỉ mục id)
+                products_by_id = {}
+                
+                # Lặp qua từng item trong giỏ hàng của user
+                for item in user_items:
+                    # Tìm sản phẩm có id khớp với product_id của item, trả về None nếu không tìm thấy
+                    product = db.get_by_id('products.json', item['product_id'])
+                    # Nếu sản phẩm tồn tại
+                    if product:
+                        products_by_id[product['id']] = product
+                        # Tính tiền từng dòng: giá sản phẩm × số lượng, cộng vào tổng
+                        total += product['price'] * item['quantity']
+                
+                # Các dòng cần trừ kho: [product_id, số lượng]
+                lines = [[item['product_id'], item['quantity']] for item in user_items
+                         if item['product_id'] in products_by_id]
+                # Dùng lượng hàng đã giữ ở trang thanh toán nếu giỏ hàng không đổi, nếu không thì giữ mới
+                hold = session.pop('stock_hold', None)
+                if hold and hold['lines'] != lines:
+                    inventory.release(hold)
+                    hold = None
+                if hold is None:
+                    hold = inventory.reserve(lines)
+                # Trừ kho cho tất cả các dòng hoặc không dòng nào
+                if hold is None or not inventory.commit(hold):
+                    # Tìm sản phẩm không đủ số lượng để báo cho người dùng
+                    levels = inventory.stock_levels(products_by_id)
+                    short = next((products_by_id[pid] for pid, quantity in lines if levels[pid] < quantity),
+                                 next(iter(products_by_id.values())))
                     # Hiển thị thông báo sản phẩm không đủ số lượng
-                    flash(f'Sản phẩm {product["name"]} không đủ số lượng!', 'error')
+                    flash(f'Sản phẩm {short["name"]} không đủ số lượng!', 'error')
                     # Chuyển hướng về trang giỏ hàng
                     return redirect(url_for('cart'))
-                # Tính tiền từng dòng: giá sản phẩm × số lượng, cộng vào tổng
-                total += product['price'] * item['quantity']
-        
-        # Tải danh sách tất cả đơn hàng từ file orders.json
-        orders = db.load('orders.json')
-        # Tạo đơn hàng mới với các thông tin:
-        new_order = {
-            'id': db.get_next_id(orders),  # ID tự động tăng
-            'user_id': session['user_id'],  # ID của user hiện tại
-            'total': total,  # Tổng giá trị đơn hàng
-            'status': 'pending',  # Trạng thái mặc định là đang chờ xử lý
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Thời gian tạo đơn hàng
-        }
-        # Thêm đơn hàng mới vào danh sách
-        orders.append(new_order)
-        # Lưu danh sách đơn hàng cập nhật vào file
-        db.save('orders.json', orders)
-        
-        # Tải danh sách tất cả item trong đơn hàng từ file order_items.json
-        order_items = db.load('order_items.json')
-        # Lặp qua từng item trong giỏ hàng của user
-        for item in user_items:
-            # Tìm sản phẩm có id khớp với product_id của item, trả về None nếu không tìm thấy
-            product = next((p for p in products if p['id'] == item['product_id']), None)
-            # Nếu sản phẩm tồn tại
-            if product:
-                # Tạo item mới cho đơn hàng với các thông tin:
-                new_order_item = {
-                    'id': db.get_next_id(order_items),  # ID tự động tăng
-                    'order_id': new_order['id'],  # ID của đơn hàng vừa tạo
-                    'product_id': item['product_id'],  # ID của sản phẩm
-                    'quantity': item['quantity'],  # Số lượng sản phẩm
-                    'price': product['price']  # Giá sản phẩm tại thời điểm đặt hàng
+                sold_lines = lines
+                
+                # Tạo đơn hàng mới với các thông tin:
+                new_order = {
+                    'id': db.next_id('orders.json'),  # ID tự động tăng từ bộ đếm của bảng
+                    'user_id': session['user_id'],  # ID của user hiện tại
+                    'total': total,  # Tổng giá trị đơn hàng
+                    'status': 'pending',  # Trạng thái mặc định là đang chờ xử lý
+                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Thời gian tạo đơn hàng
                 }
-                # Thêm item mới vào danh sách
-                order_items.append(new_order_item)
-                # Giảm số lượng sản phẩm trong kho
-                product['stock'] -= item['quantity']
-        
-        # Lưu danh sách item trong đơn hàng cập nhật vào file
-        db.save('order_items.json', order_items)
-        # Lưu danh sách sản phẩm với số lượng kho đã cập nhật vào file
-        db.save('products.json', products)
-        
-        # Đánh dấu giỏ hàng hiện tại là không còn hoạt động (đã thanh toán)
-        user_cart['active'] = False
-        # Lưu danh sách giỏ hàng cập nhật vào file
-        db.save('carts.json', carts)
-        
-        # Loại bỏ tất cả item của giỏ hàng đã thanh toán khỏi danh sách
-        cart_items = [item for item in cart_items if item['cart_id'] != user_cart['id']]
-        # Lưu danh sách item trong giỏ cập nhật vào file
-        db.save('cart_items.json', cart_items)
+                # Thêm đơn hàng mới vào giao dịch: chỉ dòng mới được ghi, không tải/ghi lại cả bảng
+                tx.append('orders.json', new_order)
+                
+                # Các item của đơn hàng mới
+                order_items = []
+                # Giữ trước một dải id liên tiếp cho tất cả dòng của đơn hàng (một lần khóa bộ đếm)
+                next_item_id = db.next_id('order_items.json', count=len(lines))
+                # Lặp qua từng dòng đã trừ kho
+                for product_id, quantity in lines:
+                    # Tạo item mới cho đơn hàng với các thông tin:
+                    new_order_item = {
+                        'id': next_item_id,  # ID lấy từ dải đã giữ trước
+                        'order_id': new_order['id'],  # ID của đơn hàng vừa tạo
+                        'product_id': product_id,  # ID của sản phẩm
+                        'quantity': quantity,  # Số lượng sản phẩm
+                        'price': products_by_id[product_id]['price']  # Giá sản phẩm tại thời điểm đặt hàng
+                    }
+                    # Thêm item mới vào danh sách
+                    order_items.append(new_order_item)
+                    # Chuyển sang id kế tiếp trong dải
+                    next_item_id += 1
+                
+                # Thêm các item của đơn hàng vào giao dịch (chỉ các dòng mới)
+                tx.append('order_items.json', *order_items)
+                
+                # Đánh dấu giỏ hàng hiện tại là không còn hoạt động (đã thanh toán)
+                user_cart['active'] = False
+                tx.update_row('carts.json', user_cart)
+                
+                # Xóa tất cả item của giỏ hàng đã thanh toán
+                tx.delete_rows('cart_items.json', [item['id'] for item in user_items])
+                
+                # Cộng đơn hàng mới vào chỉ số dashboard (đơn mới luôn ở trạng thái pending)
+                stats_store.apply(tx, total_orders=1, total_revenue=total, pending_orders=1)
+            # Ra khỏi khối with: tất cả các bảng đã được ghi cùng lúc
+        except Exception:
+            # Ghi đơn hàng thất bại sau khi đã trừ kho: cộng lại hàng vào kho
+            if sold_lines:
+                inventory.restock(sold_lines)
+            raise
         
+        # Giỏ hàng đã được thanh toán nên badge trên navbar về 0
+        session['cart_summary'] = {'cart_id': None, 'count': 0, 'subtotal': 0}
         # Hiển thị thông báo đặt hàng thành công
         flash('Đặt hàng thành công! Cảm ơn bạn đã mua sắm.', 'success')
         # Chuyển hướng đến trang lịch sử đơn hàng
@@ -469,10 +792,8 @@ def checkout():
     
     # ===== XỬ LÝ YÊU CẦU GET (HIỂN THỊ TRANG THANH TOÁN) =====
     
-    # Tải danh sách tất cả giỏ hàng từ file carts.json
-    carts = db.load('carts.json')
     # Tìm giỏ hàng của user hiện tại mà đang active (True), trả về None nếu không tìm thấy
-    user_cart = next((c for c in carts if c['user_id'] == session['user_id'] and c['active']), None)
+    user_cart = get_active_cart(session['user_id'])
     
     # Kiểm tra xem user có giỏ hàng active không
     if not user_cart:
@@ -481,10 +802,8 @@ def checkout():
         # Chuyển hướng về trang giỏ hàng
         return redirect(url_for('cart'))
     
-    # Tải danh sách tất cả item trong giỏ từ file cart_items.json
-    cart_items = db.load('cart_items.json')
-    # Lọc ra các item thuộc giỏ hàng của user hiện tại
-    user_items = [item for item in cart_items if item['cart_id'] == user_cart['id']]
+    # Lấy các item thuộc giỏ hàng của user hiện tại qua chỉ mục cart_id
+    user_items = get_uow().find_by('cart_items.json', 'cart_id', user_cart['id'])
     
     # Kiểm tra xem giỏ hàng có item nào không
     if not user_items:
@@ -495,16 +814,27 @@ def checkout():
     
     # Khởi tạo biến tính tổng giá trị đơn hàng
     total = 0
-    # Tải danh sách tất cả sản phẩm từ file products.json
-    products = db.load('products.json')
+    # Các dòng cần giữ hàng: [product_id, số lượng]
+    lines = []
     # Lặp qua từng item trong giỏ hàng của user
     for item in user_items:
-        # Tìm sản phẩm có id khớp với product_id của item, trả về None nếu không tìm thấy
-        product = next((p for p in products if p['id'] == item['product_id']), None)
+        # Tìm sản phẩm có id khớp với product_id của item qua chỉ mục id, trả về None nếu không tìm thấy
+        product = get_uow().get_by_id('products.json', item['product_id'])
         # Nếu sản phẩm tồn tại
         if product:
             # Tính tiền từng dòng: giá sản phẩm × số lượng, cộng vào tổng
             total += product['price'] * item['quantity']
+            lines.append([item['product_id'], item['quantity']])
+    
+    # Giữ hàng cho người dùng trong lúc thanh toán; nếu bỏ dở thì hold tự hết hạn
+    release_stock_hold()
+    hold = inventory.reserve(lines)
+    if hold is None:
+        # Hiển thị thông báo không đủ hàng
+        flash('Một số sản phẩm trong giỏ không đủ số lượng!', 'error')
+        # Chuyển hướng về trang giỏ hàng
+        return redirect(url_for('cart'))
+    session['stock_hold'] = hold
     
     # Trả về template checkout.html với dữ liệu: tổng giá trị đơn hàng và số lượng giỏ hàng
     return render_template('checkout.html', total=total, cart_count=get_cart_count())
@@ -514,24 +844,17 @@ def order_history():
     # Kiểm tra xem người dùng đã đăng nhập chưa, nếu chưa thì chuyển hướng đến trang đăng nhập
     require_login()
     
-    # Tải danh sách tất cả đơn hàng từ file orders.json
-    orders = db.load('orders.json')
-    # Lọc ra các đơn hàng của user hiện tại bằng cách so sánh user_id
-    user_orders = [order for order in orders if order['user_id'] == session['user_id']]
-    
-    # Tải danh sách tất cả item trong đơn hàng từ file order_items.json
-    order_items = db.load('order_items.json')
-    # Tải danh sách tất cả sản phẩm từ file products.json
-    products = db.load('products.json')
+    # Lấy các đơn hàng của user hiện tại qua chỉ mục user_id
+    user_orders = db.find_by('orders.json', 'user_id', session['user_id'])
     
     # Lặp qua từng đơn hàng của user hiện tại
     for order in user_orders:
-        # Lọc ra các item thuộc đơn hàng hiện tại bằng cách so sánh order_id
-        order['order_items'] = [item for item in order_items if item['order_id'] == order['id']]
+        # Lấy các item thuộc đơn hàng hiện tại qua chỉ mục order_id
+        order['order_items'] = db.find_by('order_items.json', 'order_id', order['id'])
         # Lặp qua từng item trong đơn hàng
         for item in order['order_items']:
-            # Tìm sản phẩm có id khớp với product_id của item, trả về None nếu không tìm thấy
-            product = next((p for p in products if p['id'] == item['product_id']), None)
+            # Tìm sản phẩm có id khớp với product_id của item qua chỉ mục id, trả về None nếu không tìm thấy
+            product = db.get_by_id('products.json', item['product_id'])
             # Nếu sản phẩm tồn tại
             if product:
                 # Gán tên sản phẩm vào item để sử dụng trong template
@@ -546,17 +869,9 @@ def order_history():
 def admin_dashboard():  # Định nghĩa hàm xử lý trang tổng quan của admin
     require_admin()  # Kiểm tra quyền: nếu không phải admin sẽ flash + redirect
     
-    orders = db.load('orders.json')  # Đọc danh sách đơn hàng từ file orders.json
-    products = db.load('products.json')  # Đọc danh sách sản phẩm từ file products.json
-    users = db.load('users.json')  # Đọc danh sách người dùng từ file users.json
-    
-    stats = {  # Tạo dictionary chứa các chỉ số/thống kê để hiển thị trên dashboard
-        'total_orders': len(orders),  # Tổng số đơn hàng (đếm phần tử trong orders)
-        'total_products': len(products),  # Tổng số sản phẩm (đếm phần tử trong products)
-        'total_users': len([u for u in users if u['role'] == 'user']),  # Tổng số người dùng có role 'user'
-        'total_revenue': sum(order['total'] for order in orders),  # Tổng doanh thu: cộng trường 'total' của từng đơn
-        'pending_orders': len([o for o in orders if o['status'] == 'pending'])  # Số đơn có trạng thái 'pending'
-    }
+    # Đọc các chỉ số đã tính sẵn trong stats.json (một dòng) thay vì duyệt orders/products/users:
+    # total_orders, total_products, total_users (role 'user'), total_revenue, pending_orders
+    stats = stats_store.read()
     
     return render_template('admin/dashboard.html', stats=stats, cart_count=get_cart_count())  # Trả về template admin/dashboard.html với dữ liệu thống kê và số lượng giỏ hàng
 
@@ -564,7 +879,7 @@ def admin_dashboard():  # Định nghĩa hàm xử lý trang tổng quan của a
 def admin_products():  # Định nghĩa hàm xử lý trang quản lý sản phẩm của admin
     require_admin()  # Kiểm tra quyền: nếu không phải admin sẽ flash thông báo lỗi + redirect
     
-    products = db.load('products.json')  # Đọc danh sách tất cả sản phẩm từ file products.json
+    products = apply_stock(db.load('products.json'))  # Đọc danh sách tất cả sản phẩm kèm số lượng trong kho
     categories = db.load('categories.json')  # Đọc danh sách tất cả danh mục từ file categories.json
     
     return render_template('admin/products.html', products=products, categories=categories, cart_count=get_cart_count())  # Trả về template admin/products.html với dữ liệu: danh sách sản phẩm, danh mục, và số lượng giỏ hàng
@@ -581,20 +896,26 @@ def admin_add_product():  # ĐỊNH NGHĨA HÀM XỬ LÝ CHỨC NĂNG THÊM SẢ
         description = request.form['description']  # LẤY MÔ TẢ SẢN PHẨM TỪ FORM
         image = request.form['image']  # LẤY ĐƯỜNG DẪN HÌNH ẢNH SẢN PHẨM
         
-        products = db.load('products.json')  # ĐỌC DỮ LIỆU SẢN PHẨM HIỆN CÓ TỪ FILE JSON
-        
-        new_product = {  # TẠO ĐỐI TƯỢNG SẢN PHẨM MỚI VỚI ĐẦY ĐỦ THÔNG TIN
-            'id': db.get_next_id(products),  # TỰ ĐỘNG TẠO ID MỚI (LỚN HƠN ID CAO NHẤT HIỆN TẠI + 1)
-            'name': name,  # TÊN SẢN PHẨM
-            'price': price,  # GIÁ SẢN PHẨM
-            'stock': stock,  # SỐ LƯỢNG TỒN KHO
-            'category_id': category_id,  # ID DANH MỤC SẢN PHẨM
-            'description': description,  # MÔ TẢ CHI TIẾT SẢN PHẨM
-            'image': image  # ĐƯỜNG DẪN HÌNH ẢNH
-        }
-        
-        products.append(new_product)  # THÊM SẢN PHẨM MỚI VÀO DANH SÁCH SẢN PHẨM HIỆN CÓ
-        db.save('products.json', products)  # LƯU DANH SÁCH SẢN PHẨM ĐÃ CẬP NHẬT VÀO FILE JSON
+        with db.transaction('products.json', STATS_FILE) as tx:  # GHI SẢN PHẨM VÀ CHỈ SỐ DASHBOARD TRONG CÙNG MỘT GIAO DỊCH
+            products = tx.load('products.json')  # ĐỌC DỮ LIỆU SẢN PHẨM HIỆN CÓ TRONG GIAO DỊCH
+            
+            new_product = {  # TẠO ĐỐI TƯỢNG SẢN PHẨM MỚI VỚI ĐẦY ĐỦ THÔNG TIN
+                'id': db.next_id('products.json'),  # TỰ ĐỘNG TẠO ID MỚI TỪ BỘ ĐẾM CỦA BẢNG (KHÔNG DÙNG LẠI ID ĐÃ XÓA)
+                'name': name,  # TÊN SẢN PHẨM
+                'price': price,  # GIÁ SẢN PHẨM
+                'stock': stock,  # SỐ LƯỢNG TỒN KHO
+                'category_id': category_id,  # ID DANH MỤC SẢN PHẨM
+                'description': description,  # MÔ TẢ CHI TIẾT SẢN PHẨM
+                'image': image  # ĐƯỜNG DẪN HÌNH ẢNH
+            }
+            
+            products.append(new_product)  # THÊM SẢN PHẨM MỚI VÀO DANH SÁCH SẢN PHẨM HIỆN CÓ
+            tx.save('products.json', products)  # ĐƯA DANH SÁCH SẢN PHẨM ĐÃ CẬP NHẬT VÀO GIAO DỊCH
+            stats_store.apply(tx, total_products=1)  # TĂNG SỐ SẢN PHẨM TRÊN DASHBOARD
+        # SINH CÁC BẢN THU NHỎ (AVIF/WEBP/JPEG) CỦA ẢNH Ở LUỒNG NỀN, KHÔNG BẮT ADMIN CHỜ; TRONG LÚC ĐÓ TRANG DÙNG ẢNH GỐC,
+        # SINH XONG THÌ XÓA CACHE ĐỂ TRANG DÙNG CÁC BẢN THU NHỎ
+        image_variants.generate_async(image, on_done=invalidate_catalog_cache)
+        invalidate_catalog_cache()  # XÓA CÁC TRANG CATALOG ĐÃ CACHE ĐỂ KHÁCH THẤY SẢN PHẨM MỚI NGAY
         
         flash('Thêm sản phẩm thành công!', 'success')  # HIỂN THỊ THÔNG BÁO THÀNH CÔNG CHO NGƯỜI DÙNG
         return redirect(url_for('admin_products'))  # CHUYỂN HƯỚNG VỀ TRANG QUẢN LÝ SẢN PHẨM
@@ -606,36 +927,48 @@ def admin_add_product():  # ĐỊNH NGHĨA HÀM XỬ LÝ CHỨC NĂNG THÊM SẢ
 def admin_edit_product(product_id):  # ĐỊNH NGHĨA HÀM XỬ LÝ CHỨC NĂNG SỬA SẢN PHẨM, NHẬN product_id LÀM THAM SỐ
     require_admin()  # KIỂM TRA QUYỀN TRUY CẬP - CHỈ CHO PHÉP ADMIN SỬ DỤNG CHỨC NĂNG NÀY
     
-    products = db.load('products.json')  # ĐỌC TOÀN BỘ DANH SÁCH SẢN PHẨM TỪ DATABASE
-    product = next((p for p in products if p['id'] == product_id), None)  # TÌM SẢN PHẨM THEO ID SỬ DỤNG GENERATOR EXPRESSION
+    product = db.get_by_id('products.json', product_id)  # TÌM SẢN PHẨM THEO ID QUA CHỈ MỤC (KHÔNG TẢI CẢ BẢNG)
     
     if not product:  # KIỂM TRA NẾU KHÔNG TÌM THẤY SẢN PHẨM
         flash('Sản phẩm không tồn tại!', 'error')  # HIỂN THỊ THÔNG BÁO LỖI CHO NGƯỜI DÙNG
         return redirect(url_for('admin_products'))  # CHUYỂN HƯỚNG VỀ TRANG QUẢN LÝ SẢN PHẨM
     
     if request.method == 'POST':  # NẾU NGƯỜI DÙNG GỬI FORM CẬP NHẬT (NHẤN NÚT "LƯU THAY ĐỔI")
-        product['name'] = request.form['name']  # CẬP NHẬT TÊN SẢN PHẨM TỪ DỮ LIỆU FORM
-        product['price'] = int(request.form['price'])  # CẬP NHẬT GIÁ SẢN PHẨM VÀ CHUYỂN THÀNH SỐ NGUYÊN
-        product['stock'] = int(request.form['stock'])  # CẬP NHẬT SỐ LƯỢNG TỒN KHO VÀ CHUYỂN THÀNH SỐ NGUYÊN
-        product['category_id'] = int(request.form['category_id'])  # CẬP NHẬT ID DANH MỤC VÀ CHUYỂN THÀNH SỐ NGUYÊN
-        product['description'] = request.form['description']  # CẬP NHẬT MÔ TẢ SẢN PHẨM
-        product['image'] = request.form['image']  # CẬP NHẬT ĐƯỜNG DẪN HÌNH ẢNH
+        fields = {
+            'name': request.form['name'],  # TÊN SẢN PHẨM TỪ DỮ LIỆU FORM
+            'price': int(request.form['price']),  # GIÁ SẢN PHẨM, CHUYỂN THÀNH SỐ NGUYÊN
+            'category_id': int(request.form['category_id']),  # ID DANH MỤC, CHUYỂN THÀNH SỐ NGUYÊN
+            'description': request.form['description'],  # MÔ TẢ SẢN PHẨM
+            'image': request.form['image'],  # ĐƯỜNG DẪN HÌNH ẢNH
+        }
+        available = int(request.form['stock'])  # SỐ LƯỢNG CÒN BÁN ĐƯỢC MÀ ADMIN NHẬP (FORM HIỂN THỊ SỐ NÀY, ĐÃ TRỪ HÀNG ĐANG GIỮ)
         
-        db.save('products.json', products)  # LƯU TOÀN BỘ DANH SÁCH SẢN PHẨM ĐÃ ĐƯỢC CẬP NHẬT VÀO DATABASE
+        # GHI CÁC TRƯỜNG VÀ SỐ LƯỢNG (= SỐ ADMIN NHẬP + HÀNG ĐANG GIỮ) VÀO DÒNG CỦA SẢN PHẨM TRONG products.json
+        # MỘT LẦN, TRONG KHÓA CỦA products.json VÀ CỦA FILE TỒN KHO, NÊN KHÔNG GHI ĐÈ THAY ĐỔI ĐỒNG THỜI
+        inventory.set_stock(product_id, available, fields)
+        product.update(fields)
+        image_variants.generate_async(product['image'], on_done=invalidate_catalog_cache)  # SINH Ở LUỒNG NỀN CÁC BẢN THU NHỎ NẾU ẢNH MỚI HOẶC ẢNH GỐC ĐÃ ĐỔI
+        invalidate_catalog_cache()  # XÓA CÁC TRANG CATALOG ĐÃ CACHE (GIÁ, TÊN, TỒN KHO CÓ THỂ ĐÃ ĐỔI)
         flash('Cập nhật sản phẩm thành công!', 'success')  # HIỂN THỊ THÔNG BÁO THÀNH CÔNG
         return redirect(url_for('admin_products'))  # CHUYỂN HƯỚNG VỀ TRANG QUẢN LÝ SẢN PHẨM
     
     categories = db.load('categories.json')  # LOAD DANH SÁCH DANH MỤC ĐỂ HIỂN THỊ TRONG FORM CHỈNH SỬA
+    apply_stock([product])  # HIỂN THỊ SỐ LƯỢNG CÒN BÁN ĐƯỢC (ĐÃ TRỪ HÀNG ĐANG GIỮ); KHI LƯU, set_stock CỘNG LẠI HÀNG ĐANG GIỮ
     return render_template('admin/edit_product.html', product=product, categories=categories, cart_count=get_cart_count())  # HIỂN THỊ TRANG CHỈNH SỬA VỚI DỮ LIỆU SẢN PHẨM HIỆN TẠI
 
 @app.route('/admin/products/<int:product_id>/delete', methods=['POST'])  # TẠO ĐƯỜNG DẪN ĐỘNG CHO CHỨC NĂNG XÓA SẢN PHẨM, CHỈ CHẤP NHẬN PHƯƠNG THỨC POST ĐỂ ĐẢM BẢO BẢO MẬT
 def admin_delete_product(product_id):  # ĐỊNH NGHĨA HÀM XỬ LÝ CHỨC NĂNG XÓA SẢN PHẨM, NHẬN product_id LÀM THAM SỐ
     require_admin()  # KIỂM TRA QUYỀN TRUY CẬP - CHỈ CHO PHÉP ADMIN THỰC HIỆN XÓA SẢN PHẨM
     
-    products = db.load('products.json')  # ĐỌC TOÀN BỘ DANH SÁCH SẢN PHẨM TỪ DATABASE
-    products = [p for p in products if p['id'] != product_id]  # TẠO DANH SÁCH MỚI CHỈ CHỨA CÁC SẢN PHẨM CÓ ID KHÁC VỚI ID CẦN XÓA
-    
-    db.save('products.json', products)  # LƯU DANH SÁCH SẢN PHẨM MỚI (ĐÃ LOẠI BỎ SẢN PHẨM CẦN XÓA) VÀO DATABASE
+    with db.transaction('products.json', STATS_FILE) as tx:  # XÓA SẢN PHẨM VÀ CẬP NHẬT CHỈ SỐ DASHBOARD TRONG CÙNG MỘT GIAO DỊCH
+        products = tx.load('products.json')  # ĐỌC TOÀN BỘ DANH SÁCH SẢN PHẨM TRONG GIAO DỊCH
+        remaining = [p for p in products if p['id'] != product_id]  # TẠO DANH SÁCH MỚI CHỈ CHỨA CÁC SẢN PHẨM CÓ ID KHÁC VỚI ID CẦN XÓA
+        
+        if len(remaining) != len(products):  # CHỈ GHI KHI SẢN PHẨM THẬT SỰ TỒN TẠI
+            tx.save('products.json', remaining)  # ĐƯA DANH SÁCH SẢN PHẨM MỚI (ĐÃ LOẠI BỎ SẢN PHẨM CẦN XÓA) VÀO GIAO DỊCH
+            stats_store.apply(tx, total_products=len(remaining) - len(products))  # GIẢM SỐ SẢN PHẨM TRÊN DASHBOARD
+    inventory.remove(product_id)  # XÓA FILE TỒN KHO CỦA SẢN PHẨM
+    invalidate_catalog_cache()  # XÓA CÁC TRANG CATALOG ĐÃ CACHE CÒN CHỨA SẢN PHẨM NÀY
     flash('Xóa sản phẩm thành công!', 'success')  # HIỂN THỊ THÔNG BÁO THÀNH CÔNG CHO NGƯỜI DÙNG
     return redirect(url_for('admin_products'))  # CHUYỂN HƯỚNG VỀ TRANG QUẢN LÝ SẢN PHẨM
 
@@ -643,36 +976,116 @@ def admin_delete_product(product_id):  # ĐỊNH NGHĨA HÀM XỬ LÝ CHỨC NĂ
 def admin_orders():  # ĐỊNH NGHĨA HÀM XỬ LÝ HIỂN THỊ DANH SÁCH ĐƠN HÀNG
     require_admin()  # KIỂM TRA QUYỀN TRUY CẬP - CHỈ CHO PHÉP ADMIN XEM TRANG NÀY
     
-    orders = db.load('orders.json')  # ĐỌC DANH SÁCH TẤT CẢ ĐƠN HÀNG TỪ DATABASE
-    order_items = db.load('order_items.json')  # ĐỌC DANH SÁCH CHI TIẾT CÁC MẶT HÀNG TRONG ĐƠN HÀNG
-    products = db.load('products.json')  # ĐỌC DANH SÁCH SẢN PHẨM ĐỂ LẤY THÔNG TIN TÊN SẢN PHẨM
-    users = db.load('users.json')  # ĐỌC DANH SÁCH NGƯỜI DÙNG ĐỂ LẤY TÊN KHÁCH HÀNG
+    status = request.args.get('status', '')  # LỌC THEO TRẠNG THÁI (pending/completed/cancelled)
+    user_id = request.args.get('user_id', type=int)  # LỌC THEO KHÁCH HÀNG
+    date_from = request.args.get('date_from', '')  # LỌC TỪ NGÀY (YYYY-MM-DD)
+    date_to = request.args.get('date_to', '')  # LỌC ĐẾN NGÀY (YYYY-MM-DD)
+    page = max(request.args.get('page', 1, type=int), 1)  # TRANG HIỆN TẠI (BẮT ĐẦU TỪ 1)
+    per_page = Config.ADMIN_ORDERS_PER_PAGE
+    
+    # CHỌN TẬP ĐƠN HÀNG BAN ĐẦU QUA CHỈ MỤC (status, user_id) THAY VÌ DUYỆT TOÀN BỘ BẢNG;
+    # CÁC DÒNG DÙNG CHUNG VỚI CACHE NÊN CHỈ ĐỌC, CHỈ SAO CHÉP CÁC ĐƠN CỦA TRANG HIỆN TẠI
+    if status and user_id:
+        orders = [o for o in db.find_by('orders.json', 'status', status, copy=False) if o['user_id'] == user_id]
+    elif status:
+        orders = db.find_by('orders.json', 'status', status, copy=False)  # CHỈ MỤC THEO TRẠNG THÁI: XEM ĐƠN "pending" KHÔNG CẦN QUÉT
+    elif user_id:
+        orders = db.find_by('orders.json', 'user_id', user_id, copy=False)
+    else:
+        _, orders = db.snapshot('orders.json')
     
-    for order in orders:  # DUYỆT QUA TỪNG ĐƠN HÀNG ĐỂ BỔ SUNG THÔNG TIN CHI TIẾT
-        order['user_name'] = next((u['name'] for u in users if u['id'] == order['user_id']), 'Unknown')  # TÌM TÊN NGƯỜI DÙNG THEO user_id VÀ GÁN VÀO ĐƠN HÀNG
-        order['order_items'] = [item for item in order_items if item['order_id'] == order['id']]  # LỌC TẤT CẢ MẶT HÀNG THUỘC VỀ ĐƠN HÀNG NÀY
-        for item in order['order_items']:  # DUYỆT QUA TỪNG MẶT HÀNG TRONG ĐƠN HÀNG
-            product = next((p for p in products if p['id'] == item['product_id']), None)  # TÌM THÔNG TIN SẢN PHẨM THEO product_id
+    if date_from or date_to:  # LỌC THEO NGÀY ĐẶT (SO SÁNH CHUỖI 'YYYY-MM-DD')
+        orders = [o for o in orders if (not date_from or o['created_at'][:10] >= date_from)
+                  and (not date_to or o['created_at'][:10] <= date_to)]
+    
+    if status or user_id or date_from or date_to:  # TỔNG SỐ ĐƠN VÀ DOANH THU CỦA KẾT QUẢ LỌC
+        total_orders, total_revenue = len(orders), sum(o['total'] for o in orders)
+    else:  # KHÔNG LỌC: DÙNG CHỈ SỐ ĐÃ TÍNH SẴN CỦA DASHBOARD
+        stats = stats_store.read()
+        total_orders, total_revenue = stats['total_orders'], stats['total_revenue']
+    
+    # ĐƠN MỚI NHẤT TRƯỚC: BẢNG VÀ CÁC NHÓM CỦA CHỈ MỤC ĐÃ THEO THỨ TỰ id TĂNG DẦN NÊN
+    # CẮT TRANG TỪ CUỐI DANH SÁCH RỒI ĐẢO NGƯỢC, KHÔNG CẦN SẮP XẾP CẢ DANH SÁCH MỖI LẦN XEM
+    total_pages = max((len(orders) + per_page - 1) // per_page, 1)
+    end = len(orders) - (page - 1) * per_page
+    orders = [dict(o) for o in orders[max(end - per_page, 0):max(end, 0)][::-1]]
+    
+    # GHÉP DỮ LIỆU MỘT LƯỢT CHO RIÊNG TRANG NÀY: TRA NGƯỜI DÙNG, MẶT HÀNG, SẢN PHẨM QUA DICT
+    users = {uid: db.get_by_id('users.json', uid) for uid in {o['user_id'] for o in orders}}
+    items_by_order = {o['id']: db.find_by('order_items.json', 'order_id', o['id']) for o in orders}
+    product_ids = {item['product_id'] for items in items_by_order.values() for item in items}
+    products = {pid: db.get_by_id('products.json', pid) for pid in product_ids}
+    for order in orders:  # BỔ SUNG THÔNG TIN CHI TIẾT CHO TỪNG ĐƠN CỦA TRANG
+        user = users[order['user_id']]
+        order['user_name'] = user['name'] if user else 'Unknown'  # GÁN TÊN NGƯỜI DÙNG VÀO ĐƠN HÀNG
+        order['order_items'] = items_by_order[order['id']]
+        for item in order['order_items']:
+            product = products[item['product_id']]
             if product:  # NẾU TÌM THẤY SẢN PHẨM
                 item['product_name'] = product['name']  # BỔ SUNG TÊN SẢN PHẨM VÀO THÔNG TIN MẶT HÀNG
     
-    return render_template('admin/orders.html', orders=orders, cart_count=get_cart_count())  # HIỂN THỊ TRANG QUẢN LÝ ĐƠN HÀNG VỚI DỮ LIỆU ĐÃ ĐƯỢC XỬ LÝ
+    return render_template('admin/orders.html', orders=orders,  # HIỂN THỊ TRANG QUẢN LÝ ĐƠN HÀNG CỦA TRANG HIỆN TẠI
+                           status=status, user_id=user_id, date_from=date_from, date_to=date_to,
+                           filter_user=users.get(user_id) or (db.get_by_id('users.json', user_id) if user_id else None),
+                           page=page, total_pages=total_pages,
+                           total_orders=total_orders, total_revenue=total_revenue,
+                           cart_count=get_cart_count())
 
 @app.route('/admin/orders/<int:order_id>/update', methods=['POST'])  # TẠO ĐƯỜNG DẪN ĐỘNG ĐỂ CẬP NHẬT TRẠNG THÁI ĐƠN HÀNG, CHỈ CHẤP NHẬN PHƯƠNG THỨC POST
 def admin_update_order(order_id):  # ĐỊNH NGHĨA HÀM CẬP NHẬT ĐƠN HÀNG, NHẬN order_id TỪ URL
     require_admin()  # KIỂM TRA QUYỀN TRUY CẬP - CHỈ ADMIN ĐƯỢC CẬP NHẬT TRẠNG THÁI ĐƠN HÀNG
     
     new_status = request.form['status']  # LẤY GIÁ TRỊ TRẠNG THÁI MỚI TỪ FORM NGƯỜI DÙNG GỬI LÊN
-    orders = db.load('orders.json')  # ĐỌC TOÀN BỘ DANH SÁCH ĐƠN HÀNG TỪ DATABASE
-    
-    order = next((o for o in orders if o['id'] == order_id), None)  # TÌM ĐƠN HÀNG CẦN CẬP NHẬT THEO ID SỬ DỤNG GENERATOR EXPRESSION
-    if order:  # KIỂM TRA NẾU TÌM THẤY ĐƠN HÀNG
-        order['status'] = new_status  # CẬP NHẬT TRẠNG THÁI MỚI CHO ĐƠN HÀNG
-        db.save('orders.json', orders)  # LƯU DANH SÁCH ĐƠN HÀNG ĐÃ CẬP NHẬT VÀO DATABASE
+    with db.transaction('orders.json', STATS_FILE) as tx:  # CẬP NHẬT ĐƠN HÀNG VÀ CHỈ SỐ DASHBOARD TRONG CÙNG MỘT GIAO DỊCH
+        orders = tx.load('orders.json')  # ĐỌC TOÀN BỘ DANH SÁCH ĐƠN HÀNG TRONG GIAO DỊCH
+        
+        order = next((o for o in orders if o['id'] == order_id), None)  # TÌM ĐƠN HÀNG CẦN CẬP NHẬT THEO ID SỬ DỤNG GENERATOR EXPRESSION
+        if order:  # KIỂM TRA NẾU TÌM THẤY ĐƠN HÀNG
+            # SỐ ĐƠN PENDING THAY ĐỔI KHI ĐƠN CHUYỂN VÀO HOẶC RA KHỎI TRẠNG THÁI 'pending'
+            pending_delta = (new_status == 'pending') - (order['status'] == 'pending')
+            order['status'] = new_status  # CẬP NHẬT TRẠNG THÁI MỚI CHO ĐƠN HÀNG
+            tx.save('orders.json', orders)  # ĐƯA DANH SÁCH ĐƠN HÀNG ĐÃ CẬP NHẬT VÀO GIAO DỊCH
+            if pending_delta:
+                stats_store.apply(tx, pending_orders=pending_delta)
+    if order:
         flash('Cập nhật trạng thái đơn hàng thành công!', 'success')  # HIỂN THỊ THÔNG BÁO THÀNH CÔNG
     
     return redirect(url_for('admin_orders'))  # CHUYỂN HƯỚNG NGƯỜI DÙNG QUAY LẠI TRANG QUẢN LÝ ĐƠN HÀNG
 
+def report_range():  # ĐỌC KHOẢNG NGÀY CỦA BÁO CÁO TỪ QUERY STRING (?start=YYYY-MM-DD&end=YYYY-MM-DD), MẶC ĐỊNH 30 NGÀY GẦN NHẤT
+    end = request.args.get('end', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date()) or datetime.now().date()
+    start = request.args.get('start', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date()) or end - timedelta(days=29)
+    return start, end
+
+@app.route('/admin/reports/daily-revenue')  # BÁO CÁO DOANH THU THEO NGÀY (JSON)
+def admin_report_daily_revenue():
+    denied = require_admin()  # CHỈ ADMIN ĐƯỢC XEM BÁO CÁO
+    if denied:
+        return denied
+    start, end = report_range()
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(),
+                    'days': sales_analytics.daily_revenue(start, end)})
+
+@app.route('/admin/reports/top-sellers')  # BÁO CÁO SẢN PHẨM BÁN CHẠY (JSON), ?by=revenue|quantity&limit=10
+def admin_report_top_sellers():
+    denied = require_admin()  # CHỈ ADMIN ĐƯỢC XEM BÁO CÁO
+    if denied:
+        return denied
+    start, end = report_range()
+    by = 'quantity' if request.args.get('by') == 'quantity' else 'revenue'
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'by': by,
+                    'products': sales_analytics.top_sellers(start, end, limit=limit, by=by)})
+
+@app.route('/admin/reports/category-mix')  # BÁO CÁO TỶ TRỌNG DOANH THU THEO DANH MỤC GỐC (JSON)
+def admin_report_category_mix():
+    denied = require_admin()  # CHỈ ADMIN ĐƯỢC XEM BÁO CÁO
+    if denied:
+        return denied
+    start, end = report_range()
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(),
+                    'categories': sales_analytics.category_mix(start, end)})
+
 @app.route('/admin/users')  # TẠO ĐƯỜNG DẪN CHO TRANG QUẢN LÝ NGƯỜI DÙNG CỦA ADMIN
 def admin_users():  # ĐỊNH NGHĨA HÀM XỬ LÝ HIỂN THỊ DANH SÁCH NGƯỜI DÙNG
     require_admin()  # KIỂM TRA QUYỀN TRUY CẬP - CHỈ CHO PHÉP ADMIN XEM TRANG NÀY
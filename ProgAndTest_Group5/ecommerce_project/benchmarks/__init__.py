@@ -0,0 +1,13 @@
+"""Benchmark các route chính của cửa hàng (home, products, cart, add_to_cart, checkout, admin_orders).
+
+Chạy từ thư mục ecommerce_project:
+
+    python -m benchmarks.run --size 10000                      # qua Flask test client
+    python -m benchmarks.run --size 10000 --serve --concurrency 8   # qua server cục bộ nhiều luồng
+    python -m benchmarks.run --size 10000 --serve --server gunicorn --workers 4 --concurrency 8
+    python -m benchmarks.run --size 10000 --save-baseline      # lưu kết quả làm mốc
+    python -m benchmarks.run --size 10000 --compare            # so với mốc, thoát mã 1 nếu chậm đi
+
+Bộ dữ liệu tổng hợp (10^2, 10^4, 10^6 đơn hàng...) được tạo một lần vào
+benchmarks/.data và sao chép sang thư mục tạm cho mỗi lần chạy.
+"""
@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+from config import Config
+from generate_data import generate_dataset
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.data')
+META_FILE = 'benchmark_meta.json'
+
+# Tài khoản mà generate_data.py luôn tạo
+BENCH_USER = ('user@example.com', 'user123')
+BENCH_ADMIN = ('admin@example.com', 'admin123')
+# Cost bcrypt của bộ dữ liệu benchmark (app trong benchmark dùng cùng cost để khỏi băm lại khi đăng nhập)
+BCRYPT_ROUNDS = 4
+
+
+def use_data_dir(data_dir, backend):
+    """Trỏ cấu hình sang thư mục dữ liệu của benchmark (phải gọi trước khi tạo SimpleDB/import app)"""
+    Config.DATA_DIR = data_dir
+    Config.SQLITE_PATH = os.path.join(data_dir, 'techstore.db')
+    Config.DB_BACKEND = backend
+
+
+def shape(size):
+    """Số dòng của từng bảng cho bộ dữ liệu `size` (= số đơn hàng)"""
+    return {
+        'orders': size,
+        'products': max(size // 10, 20),
+        'users': max(size // 20, 5),
+    }
+
+
+def generate(data_dir, size, backend='json', seed=42):
+    """Tạo bộ dữ liệu bằng generate_data.py (kho rất lớn để checkout không bao giờ hết hàng)"""
+    os.makedirs(data_dir, exist_ok=True)
+    use_data_dir(data_dir, backend)
+    counts = generate_dataset(seed=seed, bcrypt_rounds=BCRYPT_ROUNDS, stock=10 ** 9, **shape(size))
+    with open(os.path.join(data_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'size': size, 'seed': seed, 'backend': backend, 'counts': counts}, f, indent=2)
+    return counts
+
+
+def prepare(size, backend='json', seed=42):
+    """Đường dẫn tới bộ dữ liệu đã tạo sẵn trong benchmarks/.data (tạo nếu chưa có)"""
+    data_dir = os.path.join(CACHE_DIR, f'{backend}-{size}-{seed}')
+    if not os.path.exists(os.path.join(data_dir, META_FILE)):
+        shutil.rmtree(data_dir, ignore_errors=True)
+        generate(data_dir, size, backend, seed)
+    return data_dir
+
+
+def load_meta(data_dir):
+    with open(os.path.join(data_dir, META_FILE), encoding='utf-8') as f:
+        return json.load(f)
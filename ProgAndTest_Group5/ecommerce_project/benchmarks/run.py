@@ -0,0 +1,329 @@
+"""Đo p50/p99, thông lượng, bộ nhớ cấp phát và số byte JSON đọc/ghi của từng route.
+
+Kết quả được ghi ra JSON (benchmarks/results/); --save-baseline lưu làm mốc trong
+benchmarks/baselines/ và --compare so với mốc, thoát mã 1 nếu có chỉ số chậm/tốn
+hơn mốc quá --tolerance để bắt các lần chậm đi trước khi deploy.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from benchmarks import datasets
+from benchmarks.scenarios import SCENARIOS, Context
+
+PROJECT_DIR = os.path.dirname(datasets.ROOT)
+RESULTS_DIR = os.path.join(datasets.ROOT, 'results')
+BASELINE_DIR = os.path.join(datasets.ROOT, 'baselines')
+# Chỉ số được so với mốc -> mức chênh tuyệt đối tối thiểu để tính là chậm đi (tránh nhiễu)
+COMPARED = {'p50_ms': 0.5, 'p99_ms': 2.0, 'peak_alloc_kb': 16, 'json_bytes_read': 1024, 'json_bytes_written': 1024}
+
+
+class AppClient:
+    """Gửi request qua Flask test client (cùng tiến trình, đo được bộ nhớ và I/O)"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, url, data=None):
+        return self.client.open(url, method=method, data=data).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Gửi request HTTP thật tới server đang chạy, giữ cookie session, không tự theo chuyển hướng"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def request(self, method, url, data=None):
+        body = urllib.parse.urlencode(data or {}).encode() if method == 'POST' else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + url, data=body, method=method)) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def make_context(make_client, counts, seed):
+    clients = {name: make_client() for name in ('anon', 'user', 'admin')}
+    for name, (email, password) in (('user', datasets.BENCH_USER), ('admin', datasets.BENCH_ADMIN)):
+        status = clients[name].request('POST', '/login', {'email': email, 'password': password})
+        if status != 302:
+            raise RuntimeError(f'Không đăng nhập được {email} (HTTP {status})')
+    return Context(clients, counts, random.Random(seed))
+
+
+def run_step(ctx, spec, i):
+    method, url, data = spec['func'](ctx, i)
+    client = ctx.clients[spec['client']]
+    start = time.perf_counter()
+    status = client.request(method, url, data)
+    elapsed = time.perf_counter() - start
+    if status != spec['expect']:
+        raise RuntimeError(f'{method} {url}: HTTP {status}, mong đợi {spec["expect"]}')
+    return elapsed
+
+
+def summarize(latencies, wall):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+    }
+
+
+def measure_in_process(names, counts, requests, warmup, seed, alloc_samples=20):
+    """Chạy các kịch bản qua test client; app phải được import sau datasets.use_data_dir()"""
+    import app as appmod
+    from utils.storage import io_counters
+
+    ctx = make_context(lambda: AppClient(appmod.app), counts, seed)
+    results = {}
+    for name in names:
+        spec = SCENARIOS[name]
+        latencies, io_before = [], None
+        for i in range(warmup + requests):
+            if i == warmup:
+                io_before = io_counters.snapshot()
+            elapsed = run_step(ctx, spec, i)
+            if i >= warmup:
+                latencies.append(elapsed)
+        io_after = io_counters.snapshot()
+        result = summarize(latencies, sum(latencies))
+        for field in ('bytes_read', 'bytes_written', 'files_read', 'files_written'):
+            # Bao gồm cả các request chuẩn bị (không tính giờ) của kịch bản
+            result['json_' + field] = round((io_after[field] - io_before[field]) / requests)
+
+        # Bộ nhớ cấp phát: đo riêng vì tracemalloc làm chậm request nhiều lần
+        peaks = []
+        tracemalloc.start()
+        try:
+            for i in range(warmup + requests, warmup + requests + alloc_samples):
+                method, url, data = spec['func'](ctx, i)
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                ctx.clients[spec['client']].request(method, url, data)
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+        result['peak_alloc_kb'] = round(percentile(peaks, 50) / 1024, 1)
+        results[name] = result
+        print_row(name, result)
+    return results
+
+
+def measure_http(base_url, names, counts, requests, warmup, seed, concurrency):
+    """Chạy các kịch bản qua HTTP với `concurrency` luồng song song (mỗi luồng một phiên đăng nhập)"""
+    contexts = [make_context(lambda: HttpClient(base_url), counts, seed + k) for k in range(concurrency)]
+    results = {}
+    for name in names:
+        spec = SCENARIOS[name]
+        per_worker = max(requests // concurrency, 1)
+        latencies, errors = [], []
+
+        def worker(ctx):
+            try:
+                for i in range(warmup):
+                    run_step(ctx, spec, i)
+                barrier.wait()
+                local = [run_step(ctx, spec, i) for i in range(warmup, warmup + per_worker)]
+                latencies.extend(local)
+            except Exception as error:  # báo lỗi của luồng ở luồng chính
+                errors.append(error)
+                barrier.abort()
+
+        barrier = threading.Barrier(concurrency + 1)
+        threads = [threading.Thread(target=worker, args=(ctx,)) for ctx in contexts]
+        for thread in threads:
+            thread.start()
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+        results[name] = summarize(latencies, wall)
+        print_row(name, results[name])
+    return results
+
+
+def start_server(data_dir, backend, port, server='werkzeug', workers=None, threads=None):
+    env = dict(os.environ, TECHSTORE_DATA_DIR=data_dir, TECHSTORE_DB_BACKEND=backend)
+    command = [sys.executable, '-m', 'benchmarks.serve', '--port', str(port), '--server', server]
+    if workers:
+        command += ['--workers', str(workers)]
+    if threads:
+        command += ['--threads', str(threads)]
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            HttpClient(base_url).request('GET', '/')
+            return process, base_url
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Server benchmark không khởi động được')
+
+
+def print_row(name, result):
+    extra = ''
+    if 'peak_alloc_kb' in result:
+        extra = (f"  alloc {result['peak_alloc_kb']:>8.1f} KB  json r/w "
+                 f"{result['json_bytes_read']:>10} / {result['json_bytes_written']:>10} B")
+    print(f"{name:<15} p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+          f"{result['throughput_rps'] or 0:>8.1f} req/s{extra}")
+
+
+def baseline_path(meta):
+    mode = '-'.join(filter(None, (meta['mode'], meta.get('server'))))
+    return os.path.join(BASELINE_DIR, f"{mode}-{meta['backend']}-{meta['size']}.json")
+
+
+def compare(report, baseline, tolerance):
+    """Danh sách các chỉ số tệ hơn mốc quá `tolerance` (tỷ lệ) và quá mức nhiễu tuyệt đối"""
+    regressions = []
+    for name, result in report['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        for metric, floor in COMPARED.items():
+            if result.get(metric) is None or old.get(metric) is None:
+                continue
+            if result[metric] > old[metric] * (1 + tolerance) and result[metric] - old[metric] > floor:
+                regressions.append(f'{name}.{metric}: {old[metric]} -> {result[metric]}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark các route chính của TechStore')
+    parser.add_argument('--size', type=int, default=10000, help='số đơn hàng của bộ dữ liệu (ví dụ 100, 10000, 1000000)')
+    parser.add_argument('--backend', default='json', choices=['json', 'wal', 'sqlite'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help='số request được đo cho mỗi kịch bản')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='danh sách kịch bản, cách nhau bởi dấu phẩy')
+    parser.add_argument('--url', help='đo server đang chạy tại URL này (trên bộ dữ liệu cùng --size/--seed)')
+    parser.add_argument('--serve', action='store_true', help='tự chạy server cục bộ nhiều luồng rồi đo qua HTTP')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--server', default='werkzeug', choices=['werkzeug', 'gunicorn', 'waitress'],
+                        help='server dùng với --serve')
+    parser.add_argument('--workers', type=int, help='số tiến trình của server gunicorn (--serve)')
+    parser.add_argument('--threads', type=int, help='số luồng mỗi tiến trình của gunicorn/waitress (--serve)')
+    parser.add_argument('--concurrency', type=int, default=1, help='số luồng gửi request song song (chế độ HTTP)')
+    parser.add_argument('--prepare-only', action='store_true', help='chỉ tạo bộ dữ liệu và in đường dẫn')
+    parser.add_argument('--output', help='file JSON kết quả (mặc định benchmarks/results/...)')
+    parser.add_argument('--save-baseline', action='store_true', help='lưu kết quả làm mốc trong benchmarks/baselines/')
+    parser.add_argument('--compare', nargs='?', const='', help='so với mốc (mặc định mốc cùng chế độ/backend/size)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='tỷ lệ chậm đi cho phép khi so với mốc')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'Kịch bản không tồn tại: {", ".join(unknown)}')
+
+    started = time.perf_counter()
+    source_dir = datasets.prepare(args.size, args.backend, args.seed)
+    counts = datasets.load_meta(source_dir)['counts']
+    print(f'📦 Bộ dữ liệu {source_dir} ({time.perf_counter() - started:.1f}s): {counts}')
+    if args.prepare_only:
+        return 0
+
+    mode = 'http' if (args.url or args.serve) else 'test_client'
+    # Mỗi lần chạy dùng bản sao vì các kịch bản ghi thêm đơn hàng/giỏ hàng
+    work_dir = tempfile.mkdtemp(prefix='techstore-bench-')
+    data_dir = os.path.join(work_dir, 'data')
+    process = None
+    try:
+        if not args.url:
+            shutil.copytree(source_dir, data_dir)
+        if mode == 'test_client':
+            datasets.use_data_dir(data_dir, args.backend)
+            from config import Config
+            # Benchmark đăng nhập nhiều lần từ cùng một IP
+            Config.LOGIN_IP_LIMIT = 10 ** 9
+            Config.BCRYPT_ROUNDS = datasets.BCRYPT_ROUNDS
+            results = measure_in_process(names, counts, args.requests, args.warmup, args.seed)
+        else:
+            base_url = args.url
+            if args.serve:
+                process, base_url = start_server(data_dir, args.backend, args.port, args.server,
+                                                 args.workers, args.threads)
+            results = measure_http(base_url, names, counts, args.requests, args.warmup, args.seed,
+                                   max(args.concurrency, 1))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'mode': mode, 'server': args.server if args.serve else None, 'backend': args.backend, 'size': args.size, 'seed': args.seed,
+            'requests': args.requests, 'concurrency': args.concurrency if mode == 'http' else 1,
+            'counts': counts, 'python': platform.python_version(), 'platform': platform.platform(),
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{mode}-{args.backend}-{args.size}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    targets = [output] + ([baseline_path(report['meta'])] if args.save_baseline else [])
+    for path in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'💾 Đã ghi {path}')
+
+    if args.compare is not None:
+        path = args.compare or baseline_path(report['meta'])
+        with open(path, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f'❌ Chậm hơn mốc {path}:')
+            for line in regressions:
+                print('   ' + line)
+            return 1
+        print(f'✅ Không chậm hơn mốc {path} (dung sai {args.tolerance:.0%})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Các kịch bản benchmark: mỗi kịch bản trả về request cần đo (method, url, form).
+
+Hàm kịch bản có thể gửi trước các request chuẩn bị qua ctx.request() (không
+tính giờ), ví dụ thêm hàng vào giỏ trước khi đo checkout.
+"""
+from urllib.parse import quote
+
+SCENARIOS = {}
+
+
+def scenario(name, client='user', expect=200):
+    """Đăng ký một kịch bản; `client` là 'anon', 'user' hoặc 'admin'"""
+    def register(func):
+        SCENARIOS[name] = {'func': func, 'client': client, 'expect': expect}
+        return func
+    return register
+
+
+class Context:
+    """Trạng thái dùng chung của các kịch bản trong một luồng chạy benchmark"""
+
+    def __init__(self, clients, counts, rng):
+        self.clients = clients      # 'anon' / 'user' / 'admin' -> client có request(method, url, data)
+        self.counts = counts        # số dòng của từng bảng trong bộ dữ liệu
+        self.rng = rng
+
+    def request(self, client, method, url, data=None):
+        return self.clients[client].request(method, url, data)
+
+    def product_id(self):
+        return self.rng.randint(1, self.counts['products'])
+
+
+@scenario('home', client='anon')
+def home(ctx, i):
+    return 'GET', '/', None
+
+
+@scenario('products')
+def products(ctx, i):
+    pages = max(ctx.counts['products'] // 12, 1)
+    sort = ('default', 'price_asc', 'name')[i % 3]
+    return 'GET', f'/products?sort={sort}&page={ctx.rng.randint(1, min(pages, 50))}', None
+
+
+@scenario('search')
+def search(ctx, i):
+    return 'GET', '/products?search=' + quote(('samsung', 'laptop', 'app', 'phụ kiện')[i % 4]), None
+
+
+@scenario('product_detail', client='anon')
+def product_detail(ctx, i):
+    return 'GET', f'/product/{ctx.product_id()}', None
+
+
+@scenario('cart')
+def cart(ctx, i):
+    if i == 0:
+        for _ in range(3):
+            ctx.request('user', 'GET', f'/add_to_cart/{ctx.product_id()}')
+    return 'GET', '/cart', None
+
+
+@scenario('add_to_cart', expect=302)
+def add_to_cart(ctx, i):
+    if i and i % 20 == 0:
+        # Thanh toán (không tính giờ) để giỏ hàng không phình to qua các lần đo
+        ctx.request('user', 'POST', '/checkout')
+    return 'GET', f'/add_to_cart/{ctx.product_id()}', None
+
+
+@scenario('checkout', expect=302)
+def checkout(ctx, i):
+    for _ in range(2):
+        ctx.request('user', 'GET', f'/add_to_cart/{ctx.product_id()}')
+    return 'POST', '/checkout', None
+
+
+@scenario('admin_orders', client='admin')
+def admin_orders(ctx, i):
+    if i % 2:
+        return 'GET', '/admin/orders?status=pending', None
+    pages = max(ctx.counts['orders'] // 20, 1)
+    return 'GET', f'/admin/orders?page={ctx.rng.randint(1, min(pages, 100))}', None
@@ -0,0 +1,60 @@
+"""Server cục bộ cho `python -m benchmarks.run --serve`.
+
+Thư mục dữ liệu và backend được truyền qua TECHSTORE_DATA_DIR/TECHSTORE_DB_BACKEND
+(đặt trước khi import app) để server chạy trên bản sao của bộ dữ liệu benchmark.
+--server chọn server dev của werkzeug (nhiều luồng, một tiến trình), gunicorn
+(theo gunicorn.conf.py, nhiều worker) hoặc waitress, để so thông lượng khi tăng
+số worker/luồng.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+from werkzeug.serving import run_simple
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_gunicorn(host, port, workers, threads):
+    from gunicorn.app.wsgiapp import WSGIApplication
+    # Tắt log từng request; các tham số dòng lệnh ghi đè gunicorn.conf.py
+    os.environ['TECHSTORE_ACCESS_LOG'] = ''
+    sys.argv = ['gunicorn', '-c', os.path.join(PROJECT_DIR, 'gunicorn.conf.py'), '--bind', f'{host}:{port}',
+                '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+    WSGIApplication('%(prog)s [OPTIONS]').run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chạy app cho benchmark')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--server', default='werkzeug', choices=['werkzeug', 'gunicorn', 'waitress'])
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='số tiến trình (gunicorn)')
+    parser.add_argument('--threads', type=int, default=4, help='số luồng mỗi tiến trình (gunicorn, waitress)')
+    args = parser.parse_args()
+
+    from config import Config
+    from benchmarks.datasets import BCRYPT_ROUNDS
+    # Benchmark đăng nhập nhiều phiên từ cùng một IP; worker gunicorn thừa hưởng
+    # các thay đổi này vì chúng được fork từ tiến trình này
+    Config.LOGIN_IP_LIMIT = 10 ** 9
+    Config.BCRYPT_ROUNDS = BCRYPT_ROUNDS
+    if args.server == 'gunicorn':
+        run_gunicorn(args.host, args.port, args.workers, args.threads)
+        return
+    from wsgi import create_app
+    app = create_app()
+    if args.server == 'waitress':
+        from waitress import serve
+        # Cảnh báo hàng đợi đầy là bình thường khi benchmark dồn request
+        logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+        serve(app, host=args.host, port=args.port, threads=args.threads, _quiet=True)
+        return
+    # Tắt log từng request để không làm sai lệch thời gian đo
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    run_simple(args.host, args.port, app, threaded=True, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
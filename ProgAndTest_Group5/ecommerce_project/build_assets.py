@@ -0,0 +1,16 @@
+import os
+from utils.assets import build
+
+def build_assets():
+    """Tạo static/dist: file tĩnh có mã băm trong tên, bản nén .gz/.br và manifest.json"""
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    manifest = build(static_dir)
+
+    for logical, hashed in sorted(manifest['files'].items()):
+        encodings = manifest['encodings'].get(hashed)
+        extra = f" (+{', '.join(encodings)})" if encodings else ''
+        print(f"📦 {logical} -> dist/{hashed}{extra}")
+    print(f"✅ Đã build {len(manifest['files'])} file tĩnh vào static/dist")
+
+if __name__ == "__main__":
+    build_assets()
@@ -1,5 +1,31 @@
 import os  # IMPORT THƯ VIỆN HỆ THỐNG ĐỂ LÀM VIỆC VỚI HỆ ĐIỀU HÀNH VÀ ĐƯỜNG DẪN FILE
 
 class Config:  # ĐỊNH NGHĨA LỚP CẤU HÌNH CHỨA TẤT CẢ CÁC THIẾT LẬP QUAN TRỌNG CHO ỨNG DỤNG
-    SECRET_KEY = 'ecommerce-secret-key-2024'  # KHÓA BÍ MẬT DÙNG ĐỂ MÃ HÓA SESSION, COOKIES VÀ BẢO VỆ CSRF
-    DATA_DIR = 'data'  # THƯ MỤC LƯU TRỮ TẤT CẢ CÁC FILE DỮ LIỆU JSON CỦA ỨNG DỤNG
\ No newline at end of file
+    SECRET_KEY = os.environ.get('TECHSTORE_SECRET_KEY', 'ecommerce-secret-key-2024')  # KHÓA BÍ MẬT DÙNG ĐỂ MÃ HÓA SESSION, COOKIES VÀ BẢO VỆ CSRF (KHI DEPLOY ĐẶT TECHSTORE_SECRET_KEY RIÊNG; MỌI WORKER PHẢI DÙNG CÙNG KHÓA)
+    DATA_DIR = os.environ.get('TECHSTORE_DATA_DIR', 'data')  # THƯ MỤC LƯU TRỮ TẤT CẢ CÁC FILE DỮ LIỆU JSON CỦA ỨNG DỤNG (ĐỔI ĐƯỢC QUA BIẾN MÔI TRƯỜNG, VÍ DỤ KHI CHẠY BENCHMARK)
+    DB_BACKEND = os.environ.get('TECHSTORE_DB_BACKEND', 'json')  # BACKEND LƯU TRỮ: 'json' (GHI LẠI TOÀN BỘ FILE), 'wal' (GHI THÊM VÀO LOG CỦA TỪNG BẢNG) HOẶC 'sqlite'
+    WAL_COMPACT_THRESHOLD = 500  # SỐ BẢN GHI TRONG LOG CỦA MỘT BẢNG TRƯỚC KHI GỘP LẠI THÀNH SNAPSHOT
+    WAL_FSYNC = False  # True ĐỂ FSYNC SAU MỖI LẦN GHI LOG (AN TOÀN HƠN KHI MẤT ĐIỆN NHƯNG CHẬM HƠN)
+    SQLITE_PATH = os.path.join(DATA_DIR, 'techstore.db')  # FILE CƠ SỞ DỮ LIỆU KHI DÙNG BACKEND 'sqlite' (TẠO BẰNG migrate_to_sqlite.py)
+    STOCK_HOLD_SECONDS = 600  # THỜI GIAN (GIÂY) GIỮ HÀNG CHO MỘT LƯỢT THANH TOÁN TRƯỚC KHI TỰ TRẢ LẠI KHO
+    SUGGEST_LIMIT = 8  # SỐ GỢI Ý TỐI ĐA MÀ /api/suggest TRẢ VỀ CHO MỖI LẦN GÕ
+    PRODUCTS_PER_PAGE = 12  # SỐ SẢN PHẨM TRÊN MỖI TRANG CỦA /products
+    HOME_PRODUCTS = 8  # SỐ SẢN PHẨM NỔI BẬT HIỂN THỊ Ở TRANG CHỦ
+    ADMIN_ORDERS_PER_PAGE = 20  # SỐ ĐƠN HÀNG TRÊN MỖI TRANG QUẢN LÝ ĐƠN HÀNG CỦA ADMIN
+    BCRYPT_ROUNDS = 12  # SỐ VÒNG (COST) CỦA BCRYPT; ĐỔI GIÁ TRỊ NÀY THÌ MẬT KHẨU CŨ ĐƯỢC BĂM LẠI KHI NGƯỜI DÙNG ĐĂNG NHẬP
+    AUTH_WORKERS = 2  # SỐ LUỒNG BĂM MẬT KHẨU CHẠY SONG SONG TRONG MỖI TIẾN TRÌNH
+    AUTH_QUEUE_SIZE = 8  # SỐ YÊU CẦU BĂM ĐƯỢC PHÉP CHỜ; VƯỢT QUÁ THÌ TRẢ VỀ 503 NGAY
+    AUTH_QUEUE_WAIT = 0.1  # SỐ GIÂY TỐI ĐA CHỜ CHỖ TRONG HÀNG ĐỢI TRƯỚC KHI BÁO BẬN
+    LOGIN_WINDOW_SECONDS = 300  # CỬA SỔ THỜI GIAN (GIÂY) ĐỂ ĐẾM SỐ LẦN ĐĂNG NHẬP
+    LOGIN_IP_LIMIT = 30  # SỐ LẦN ĐĂNG NHẬP/ĐĂNG KÝ TỐI ĐA TỪ MỘT IP TRONG CỬA SỔ
+    LOGIN_ACCOUNT_LIMIT = 5  # SỐ LẦN ĐĂNG NHẬP SAI TỐI ĐA CHO MỘT TÀI KHOẢN TRONG CỬA SỔ
+    PAGE_CACHE_TTL = 30  # SỐ GIÂY GIỮ TRANG CATALOG ĐÃ RENDER CHO KHÁCH CHƯA ĐĂNG NHẬP (SỐ TỒN KHO CÓ THỂ CŨ TỐI ĐA CHỪNG NÀY); 0 ĐỂ TẮT
+    PAGE_CACHE_MAX_ENTRIES = 512  # SỐ TRANG TỐI ĐA TRONG CACHE TOÀN TRANG (BỎ TRANG ÍT DÙNG NHẤT KHI ĐẦY)
+    FRAGMENT_CACHE_TTL = 300  # SỐ GIÂY GIỮ HTML CỦA LƯỚI SẢN PHẨM (KHÓA GỒM CẢ TỒN KHO NÊN KHÔNG BỊ CŨ); 0 ĐỂ TẮT
+    FRAGMENT_CACHE_MAX_ENTRIES = 256  # SỐ LƯỚI SẢN PHẨM TỐI ĐA TRONG CACHE
+    ASSET_MAX_AGE = 365 * 24 * 3600  # SỐ GIÂY TRÌNH DUYỆT ĐƯỢC CACHE FILE TĨNH ĐÃ BUILD (TÊN CÓ MÃ BĂM NÊN AN TOÀN ĐỂ CACHE 1 NĂM)
+    METRICS_ENABLED = os.environ.get('TECHSTORE_METRICS') == '1'  # BẬT ĐO THỜI GIAN TỪNG REQUEST (HEADER Server-Timing VÀ /metrics); ĐẶT TECHSTORE_METRICS=1 ĐỂ BẬT
+    METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')  # CÁC ĐỊA CHỈ ĐƯỢC PHÉP ĐỌC /metrics (MẶC ĐỊNH CHỈ TỪ CHÍNH MÁY CHỦ)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('TECHSTORE_PROFILE_RATE', 0))  # TỶ LỆ REQUEST CHẠY DƯỚI PROFILER (VÍ DỤ 0.05 = 5%) KHI BẬT METRICS; 0 ĐỂ TẮT
+    PROFILE_SLOW_MS = 500  # REQUEST ĐƯỢC PROFILE MÀ CHẬM HƠN SỐ MILI GIÂY NÀY THÌ GHI PROFILE RA FILE
+    PROFILE_DIR = 'profiles'  # THƯ MỤC LƯU PROFILE (.prof CỦA cProfile, HOẶC .html NẾU CÀI pyinstrument)
\ No newline at end of file
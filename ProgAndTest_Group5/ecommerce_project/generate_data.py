@@ -0,0 +1,236 @@
+import argparse
+import bisect
+import math
+import os
+import random
+import shutil
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+from config import Config
+
+# Danh mục gốc -> (thương hiệu, dòng sản phẩm, khoảng giá tính bằng nghìn đồng)
+CATALOG = {
+    'Điện thoại': (['Apple', 'Samsung', 'Xiaomi', 'Oppo', 'Vivo'], ['Pro', 'Lite', 'Ultra', 'Plus'], (2000, 35000)),
+    'Laptop': (['Apple', 'Dell', 'Asus', 'Lenovo', 'HP'], ['Air', 'Gaming', 'Văn phòng', 'Mỏng nhẹ'], (8000, 60000)),
+    'Tablet': (['Apple', 'Samsung', 'Xiaomi', 'Lenovo'], ['Pro', 'Mini', 'Tab'], (3000, 30000)),
+    'Gaming': (['Sony', 'Microsoft', 'Nintendo', 'Razer'], ['Console', 'Tay cầm', 'Ghế'], (500, 20000)),
+    'Phụ kiện': (['Anker', 'Baseus', 'Apple', 'Samsung', 'Ugreen'], ['Sạc', 'Cáp', 'Ốp lưng', 'Pin dự phòng'], (100, 3000)),
+    'Đồng hồ': (['Apple', 'Samsung', 'Garmin', 'Huawei'], ['Thể thao', 'Thời trang'], (1500, 20000)),
+    'Âm thanh': (['Sony', 'JBL', 'Apple', 'Marshall'], ['Tai nghe', 'Loa'], (300, 15000)),
+    'Máy ảnh': (['Canon', 'Sony', 'Fujifilm', 'Nikon'], ['Mirrorless', 'Ống kính', 'Compact'], (3000, 80000)),
+}
+IMAGES = ['15-pro.jpg', 'samsungs24-ultra.jpg', 'macbookair-M3.jpg', 'ipad-pro-M4.jpg',
+          'xiaomi-redmi-note-13.jpg', 'dell-xps-13-plus.jpg', 'airpods-pro-2nd.jpg',
+          'apple-watch-s9.jpg', 'samsung-galaxy-tab-s9.jpg', 'sony-playstation-5.jpg']
+SURNAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+GIVEN_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hùng', 'Lan', 'Linh', 'Minh', 'Nam', 'Ngọc',
+               'Phúc', 'Quân', 'Sơn', 'Thảo', 'Trang', 'Tuấn', 'Vy', 'Yến']
+# Tỷ lệ đơn theo giờ trong ngày (cao điểm buổi tối)
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 7, 6, 5, 5, 6, 7, 8, 9, 10, 9, 6, 3]
+
+
+class WeightedPicker:
+    """Chọn phần tử theo trọng số bằng bisect trên tổng tích lũy (O(log n) mỗi lần)"""
+
+    def __init__(self, items, weights, rng):
+        self.items = items
+        self.cumulative = list(accumulate(weights))
+        self.rng = rng
+
+    def pick(self):
+        return self.items[bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_categories():
+    """Cây 3 cấp: danh mục gốc -> thương hiệu -> dòng sản phẩm; trả về (danh mục, lá)"""
+    categories, leaves = [], []
+    for root_name, (brands, lines, price_range) in CATALOG.items():
+        root = {'id': len(categories) + 1, 'name': root_name, 'parent_id': None}
+        categories.append(root)
+        for brand in brands:
+            brand_node = {'id': len(categories) + 1, 'name': f'{root_name} {brand}', 'parent_id': root['id']}
+            categories.append(brand_node)
+            for line in lines:
+                leaf = {'id': len(categories) + 1, 'name': f'{brand} {line}', 'parent_id': brand_node['id']}
+                categories.append(leaf)
+                leaves.append((leaf['id'], brand, line, price_range))
+    return categories, leaves
+
+
+def generate_dataset(data_dir=None, backend=None, orders=10000, products=1000, users=500, days=365,
+                     seed=42, batch_size=10000, bcrypt_rounds=None, stock=None, cart_ratio=0.03, log=print):
+    """Sinh bộ dữ liệu tổng hợp có thể lặp lại (cùng seed cho cùng dữ liệu) và ghi theo lô.
+
+    Sản phẩm bán chạy theo phân bố Zipf, khách mua nhiều theo phân bố Pareto, số
+    đơn tăng dần về hiện tại và cao điểm buổi tối; đơn càng cũ càng nhiều khả năng
+    đã hoàn tất. Mọi bảng được ghi qua db.bulk_load() nên không giữ cả bảng đơn
+    hàng trong bộ nhớ. Mật khẩu chỉ được băm một lần (user123/admin123) rồi dùng
+    chung. Trả về số dòng của từng bảng.
+    """
+    if data_dir is not None:
+        Config.DATA_DIR = data_dir
+        Config.SQLITE_PATH = os.path.join(data_dir, 'techstore.db')
+    if backend is not None:
+        Config.DB_BACKEND = backend
+    from utils.auth import SimpleAuth
+    from utils.db import SimpleDB
+    from utils.stats import STATS_FILE, STATS_ID
+
+    db = SimpleDB()
+    rng = random.Random(seed)
+    counts = {}
+    # Luôn có tài khoản admin và user demo, và ít nhất một sản phẩm
+    users, products = max(users, 2), max(products, 1)
+    # Tồn kho cũ theo id sản phẩm không còn đúng với dữ liệu mới
+    shutil.rmtree(os.path.join(db.data_dir, 'inventory'), ignore_errors=True)
+
+    def write_table(filename, rows):
+        started = time.perf_counter()
+        with db.bulk_load(filename) as writer:
+            for batch in batched(rows, batch_size):
+                writer.write(batch)
+        counts[filename] = writer.count
+        log(f"✅ {filename}: {writer.count} dòng ({time.perf_counter() - started:.1f}s)")
+
+    categories, leaves = build_categories()
+    write_table('categories.json', categories)
+
+    # Sản phẩm: danh mục lá theo độ phổ biến lệch, giá phân bố log trong khoảng của danh mục gốc
+    leaf_picker = WeightedPicker(leaves, [rng.paretovariate(1.5) for _ in leaves], rng)
+    prices = array('q')
+
+    def product_rows():
+        for pid in range(1, products + 1):
+            category_id, brand, line, (low, high) = leaf_picker.pick()
+            price = round(math.exp(rng.uniform(math.log(low), math.log(high)))) * 1000 // 10000 * 10000
+            prices.append(max(price, 10000))
+            yield {
+                'id': pid,
+                'name': f'{brand} {line} {rng.choice("ABCDEFGHKMNPSTXZ")}{rng.randint(1, 99)}',
+                'price': prices[-1],
+                'stock': stock if stock is not None else int(rng.expovariate(1 / 40)),
+                'category_id': category_id,
+                'description': f'{brand} {line} chính hãng, bảo hành 12 tháng',
+                'image': '/static/images/' + IMAGES[pid % len(IMAGES)],
+            }
+    write_table('products.json', product_rows())
+
+    auth = SimpleAuth(rounds=bcrypt_rounds)
+    user_hash = auth.hash_password('user123')
+
+    def user_rows():
+        yield {'id': 1, 'name': 'Admin', 'email': 'admin@example.com',
+               'password_hash': auth.hash_password('admin123'), 'role': 'admin'}
+        yield {'id': 2, 'name': 'Demo User', 'email': 'user@example.com', 'password_hash': user_hash, 'role': 'user'}
+        for uid in range(3, users + 1):
+            yield {'id': uid, 'name': f'{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)}',
+                   'email': f'user{uid}@example.com', 'password_hash': user_hash, 'role': 'user'}
+    write_table('users.json', user_rows())
+
+    customer_ids = list(range(2, users + 1))
+    product_picker = WeightedPicker(range(1, products + 1), [1 / (rank ** 1.1) for rank in
+                                                             rng.sample(range(1, products + 1), products)], rng)
+    customer_picker = WeightedPicker(customer_ids, [rng.paretovariate(1.2) for _ in customer_ids], rng)
+
+    def order_lines():
+        lines = {}
+        while True:
+            product_id = product_picker.pick()
+            draw = rng.random()
+            lines[product_id] = lines.get(product_id, 0) + (1 if draw < 0.8 else 2 if draw < 0.95 else 3)
+            if len(lines) >= 6 or rng.random() >= 0.45:
+                return lines
+
+    # Thời điểm đặt hàng: mật độ tăng dần về hiện tại, sắp xếp để id tăng theo thời gian
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    hours = list(range(24))
+    offsets = sorted(int(days * rng.random() ** (1 / 1.5)) * 86400 + rng.choices(hours, HOUR_WEIGHTS)[0] * 3600
+                     + rng.randrange(3600) for _ in range(orders))
+    stats = {'id': STATS_ID, 'total_orders': 0, 'total_products': products,
+             'total_users': users - 1, 'total_revenue': 0, 'pending_orders': 0}
+    started = time.perf_counter()
+    with db.bulk_load('orders.json') as order_writer, db.bulk_load('order_items.json') as item_writer:
+        item_id = 0
+        for first in range(0, orders, batch_size):
+            order_batch, item_batch = [], []
+            for oid in range(first + 1, min(first + batch_size, orders) + 1):
+                created_at = start + timedelta(seconds=min(offsets[oid - 1], days * 86400))
+                age = (now - created_at).days
+                draw = rng.random()
+                if age < 2:
+                    status = 'pending' if draw < 0.6 else 'processing'
+                elif age < 7:
+                    status = 'processing' if draw < 0.3 else 'completed' if draw < 0.9 else 'cancelled'
+                else:
+                    status = 'completed' if draw < 0.92 else 'cancelled'
+                total = 0
+                for product_id, quantity in order_lines().items():
+                    item_id += 1
+                    price = prices[product_id - 1]
+                    item_batch.append({'id': item_id, 'order_id': oid, 'product_id': product_id,
+                                       'quantity': quantity, 'price': price})
+                    total += price * quantity
+                order_batch.append({'id': oid, 'user_id': customer_picker.pick(), 'total': total,
+                                    'status': status, 'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S')})
+                stats['total_orders'] += 1
+                stats['total_revenue'] += total
+                stats['pending_orders'] += status == 'pending'
+            order_writer.write(order_batch)
+            item_writer.write(item_batch)
+    counts['orders.json'], counts['order_items.json'] = order_writer.count, item_writer.count
+    log(f"✅ orders.json: {order_writer.count} dòng, order_items.json: {item_writer.count} dòng "
+        f"({time.perf_counter() - started:.1f}s)")
+
+    # Giỏ hàng đang mở của một phần nhỏ khách hàng
+    cart_users = rng.sample(customer_ids, int(len(customer_ids) * cart_ratio))
+    carts = [{'id': cid, 'user_id': uid, 'active': True} for cid, uid in enumerate(sorted(cart_users), 1)]
+    cart_items = []
+    for cart in carts:
+        for product_id in {product_picker.pick() for _ in range(rng.randint(1, 4))}:
+            cart_items.append({'id': len(cart_items) + 1, 'cart_id': cart['id'],
+                               'product_id': product_id, 'quantity': 1})
+    write_table('carts.json', carts)
+    write_table('cart_items.json', cart_items)
+
+    # Chỉ số dashboard đã cộng dồn trong lúc sinh, không phải đọc lại các bảng lớn
+    write_table(STATS_FILE, [stats])
+    return {'categories': counts['categories.json'], 'products': counts['products.json'],
+            'users': counts['users.json'], 'orders': counts['orders.json'],
+            'order_items': counts['order_items.json'], 'carts': counts['carts.json'],
+            'cart_items': counts['cart_items.json']}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu tổng hợp quy mô lớn cho TechStore")
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--days', type=int, default=365, help="khoảng thời gian của các đơn hàng (ngày)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=10000, help="số dòng mỗi lô ghi")
+    parser.add_argument('--bcrypt-rounds', type=int, help="cost của bcrypt (mặc định theo config)")
+    parser.add_argument('--stock', type=int, help="đặt cùng một số lượng tồn kho cho mọi sản phẩm")
+    parser.add_argument('--data-dir', help="thư mục dữ liệu (mặc định theo config)")
+    parser.add_argument('--backend', choices=['json', 'wal', 'sqlite'], help="backend lưu trữ (mặc định theo config)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate_dataset(args.data_dir, args.backend, orders=args.orders, products=args.products,
+                              users=args.users, days=args.days, seed=args.seed, batch_size=args.batch_size,
+                              bcrypt_rounds=args.bcrypt_rounds, stock=args.stock)
+    print(f"📦 Đã sinh dữ liệu trong {time.perf_counter() - started:.1f}s: {counts}")
+    print("👤 Tài khoản: admin@example.com / admin123, user@example.com / user123")
@@ -0,0 +1,26 @@
+import argparse
+import os
+from utils.db import SimpleDB
+from utils.images import ImageVariants, supported_formats
+
+def generate_images(force=False):
+    """Sinh các bản thu nhỏ (thumb/medium) cho ảnh của mọi sản phẩm"""
+    db = SimpleDB()
+    image_variants = ImageVariants(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    formats = supported_formats()
+    if not formats:
+        print("⚠️ Chưa cài Pillow (pip install Pillow): trang sẽ dùng ảnh gốc")
+        return
+
+    print(f"🖼️ Định dạng: {', '.join(formats)}")
+    images = sorted({p['image'] for p in db.load('products.json') if p.get('image')})
+    for image in images:
+        written = image_variants.generate(image, force=force)
+        mark = '✅' if written else '⏭️'
+        print(f"{mark} {image}: {len(written)} bản")
+    print(f"📊 Đã xử lý {len(images)} ảnh")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sinh các bản thu nhỏ của ảnh sản phẩm vào static/images/variants")
+    parser.add_argument('--force', action='store_true', help="sinh lại cả những ảnh đã có bản thu nhỏ")
+    generate_images(parser.parse_args().force)
@@ -0,0 +1,43 @@
+# Cấu hình gunicorn cho production (Linux/macOS): gunicorn -c gunicorn.conf.py
+# Mọi thiết lập đổi được qua biến môi trường, ví dụ WEB_CONCURRENCY=8 TECHSTORE_THREADS=4
+import multiprocessing
+import os
+import wsgi
+
+wsgi_app = 'wsgi:create_app()'
+bind = os.environ.get('TECHSTORE_BIND', '0.0.0.0:8000')
+
+# Mỗi worker là một tiến trình riêng (một GIL riêng) nên thông lượng tăng theo số nhân CPU.
+# Mỗi worker giữ cache các bảng của riêng nó: bộ dữ liệu lớn thì RAM cần ~ số worker x cỡ dữ liệu.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Vài luồng mỗi worker để request này chờ đĩa/bcrypt (nhả GIL) thì request khác vẫn chạy
+worker_class = 'gthread'
+threads = int(os.environ.get('TECHSTORE_THREADS', 4))
+
+# Import app một lần trong master rồi fork: worker khởi động nhanh, dùng chung bộ nhớ
+# (copy-on-write) và app lỗi thì báo ngay khi khởi động. Đổi lại, HUP chỉ khởi động lại
+# worker với code cũ; để nạp code mới không gián đoạn hãy gửi USR2 (master mới) rồi
+# WINCH + QUIT cho master cũ, hoặc đặt TECHSTORE_PRELOAD=0 để HUP nạp lại code.
+preload_app = os.environ.get('TECHSTORE_PRELOAD', '1') != '0'
+
+timeout = int(os.environ.get('TECHSTORE_TIMEOUT', 30))
+# Thời gian worker được hoàn tất các request đang chạy khi reload/tắt
+graceful_timeout = 30
+keepalive = 5
+# Khởi động lại worker sau một số request (lệch nhau) để bộ nhớ không tăng dần
+max_requests = int(os.environ.get('TECHSTORE_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+if os.path.isdir('/dev/shm'):
+    # File heartbeat của worker trên RAM để không bị treo khi đĩa chậm
+    worker_tmp_dir = '/dev/shm'
+
+# Log từng request ra stdout; đặt TECHSTORE_ACCESS_LOG= (rỗng) để tắt
+accesslog = os.environ.get('TECHSTORE_ACCESS_LOG', '-') or None
+
+
+def pre_fork(server, worker):
+    wsgi.before_fork()
+
+
+def post_fork(server, worker):
+    wsgi.after_fork()
@@ -137,6 +137,10 @@ def init_sample_data():
     db.save('orders.json', [])
     db.save('order_items.json', [])
 
+    # Chỉ số dashboard tính lại từ dữ liệu mẫu
+    from utils.stats import StatsStore
+    StatsStore(db).rebuild()
+
     print("✅ Dữ liệu mẫu đã được khởi tạo!")
     print("📦 Đã thêm 10 sản phẩm với đầy đủ hình ảnh")
 
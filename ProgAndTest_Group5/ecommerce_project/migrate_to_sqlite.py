@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+from config import Config
+from utils.storage import JsonStorage, WalStorage
+from utils.sqlite_storage import SqliteStorage
+from utils.stats import STATS_FILE
+
+# Gồm cả chỉ số dashboard (stats.json); nếu chưa có, app tự dựng lại khi đọc lần đầu
+TABLES = ['users.json', 'categories.json', 'products.json', 'carts.json',
+          'cart_items.json', 'orders.json', 'order_items.json', STATS_FILE]
+
+def migrate(data_dir=Config.DATA_DIR, db_path=Config.SQLITE_PATH):
+    """Chép toàn bộ dữ liệu từ data/*.json (kể cả log WAL nếu có) sang SQLite"""
+    # WalStorage đọc snapshot rồi phát lại log, nên dùng được cho cả dữ liệu của backend 'json'
+    source = WalStorage(data_dir)
+    target = SqliteStorage(db_path)
+
+    for filename in TABLES:
+        if source.signature(filename) is None:
+            print(f"⏭️  Bỏ qua {filename} (không tồn tại)")
+            continue
+        _, rows = source.read(filename)
+        # Giữ nguyên bộ đếm id (file .seq) nếu đã có để không cấp lại id cũ
+        last_id = None
+        try:
+            with open(JsonStorage(data_dir).path(filename) + '.seq', 'r', encoding='utf-8') as f:
+                last_id = int(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        target.import_table(filename, rows, last_id=last_id)
+        print(f"✅ {filename}: {len(rows)} dòng")
+
+    print(f"📦 Đã chuyển dữ liệu sang {os.path.abspath(db_path)}")
+    print("👉 Đặt biến môi trường TECHSTORE_DB_BACKEND=sqlite trước khi chạy app để dùng, ví dụ:")
+    print("     Linux/macOS:   TECHSTORE_DB_BACKEND=sqlite python app.py")
+    print("     Windows (cmd): set TECHSTORE_DB_BACKEND=sqlite")
+    print("                    py app.py")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        migrate(db_path=sys.argv[1])
+    else:
+        migrate()
@@ -0,0 +1,20 @@
+from utils.db import SimpleDB
+from utils.stats import StatsStore
+
+def rebuild_stats():
+    """Tính lại chỉ số dashboard từ orders/products/users và so với giá trị đang lưu"""
+    db = SimpleDB()
+    store = StatsStore(db)
+    before = db.get_by_id('stats.json', 1)
+    after = store.rebuild()
+
+    for field, value in after.items():
+        if field == 'id':
+            continue
+        old = before.get(field) if before else None
+        mark = '✅' if old == value else '🔧'
+        print(f"{mark} {field}: {old} -> {value}")
+    print("📊 Đã đồng bộ lại stats.json")
+
+if __name__ == "__main__":
+    rebuild_stats()
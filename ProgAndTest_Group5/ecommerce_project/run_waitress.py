@@ -0,0 +1,30 @@
+import argparse
+import os
+from wsgi import create_app
+
+def main():
+    """Chạy app bằng waitress: server production chạy được trên Windows (một tiến trình, nhiều luồng).
+
+    Waitress không fork nên chỉ dùng một nhân CPU cho phần Python; cần nhiều nhân
+    thì chạy vài tiến trình ở các cổng khác nhau sau một reverse proxy (chúng dùng
+    chung dữ liệu trên đĩa), hoặc dùng gunicorn trên Linux.
+    """
+    parser = argparse.ArgumentParser(description="Chạy TechStore bằng waitress")
+    parser.add_argument('--host', default=os.environ.get('TECHSTORE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('TECHSTORE_PORT', 8000)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('TECHSTORE_THREADS', 8)),
+                        help="số luồng xử lý request")
+    args = parser.parse_args()
+
+    try:
+        from waitress import serve
+    except ImportError:
+        print("❌ Chưa cài waitress: pip install waitress")
+        return
+
+    app = create_app()
+    print(f"🌐 TechStore (waitress, {args.threads} luồng): http://{args.host}:{args.port}")
+    serve(app, host=args.host, port=args.port, threads=args.threads, ident='TechStore')
+
+if __name__ == "__main__":
+    main()
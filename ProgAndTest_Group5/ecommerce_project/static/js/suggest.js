@@ -0,0 +1,23 @@
+// Gợi ý tên sản phẩm khi gõ (gọi /api/suggest sau khi ngừng gõ 150ms)
+(function () {
+    var input = document.getElementById('search-input');
+    var list = document.getElementById('search-suggestions');
+    var url = input.dataset.suggestUrl;
+    var timer = null;
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            if (!input.value.trim()) { list.innerHTML = ''; return; }
+            fetch(url + '?q=' + encodeURIComponent(input.value))
+                .then(function (r) { return r.json(); })
+                .then(function (data) {
+                    list.innerHTML = '';
+                    data.suggestions.forEach(function (item) {
+                        var option = document.createElement('option');
+                        option.value = item.name;
+                        list.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+})();
@@ -0,0 +1,241 @@
+from array import array
+from datetime import date, datetime
+from utils.db import DerivedIndex
+
+try:
+    import numpy as np
+except ImportError:  # NumPy có trong requirements.txt; thiếu thì báo cáo tính bằng Python thuần (chậm hơn)
+    np = None
+
+
+def day_number(value):
+    """'2024-05-01 10:00:00' hoặc date -> số ngày (date.toordinal) để làm khóa theo ngày"""
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.strptime(value[:10], '%Y-%m-%d').toordinal()
+
+
+class SalesAnalytics(DerivedIndex):
+    """Doanh thu và số lượng bán đã gộp sẵn theo (ngày, sản phẩm) để làm báo cáo.
+
+    Mỗi dòng đơn hàng mới (qua db.subscribe trên order_items.json) được cộng
+    vào nhóm của ngày đặt hàng, nên truy vấn chỉ cộng các ngày trong khoảng
+    thay vì duyệt lại mọi dòng đơn hàng. Mỗi ngày chỉ giữ các sản phẩm đã bán
+    trong ngày đó (thưa), nên bộ nhớ tăng theo số cặp (ngày, sản phẩm) có bán,
+    không theo số ngày x cả danh mục sản phẩm. Với NumPy (có trong
+    requirements.txt) nhóm của một ngày là ba mảng int64 (cột sản phẩm, số
+    lượng, doanh thu); các dòng mới được gom lại rồi gộp vào trước truy vấn kế
+    tiếp. Không có NumPy thì nhóm là dict {sản phẩm: [số lượng, doanh thu]} và
+    truy vấn là vòng lặp Python.
+    """
+
+    PENDING = ('day', 'column', 'quantity', 'revenue')
+
+    def __init__(self, db, category_tree, filename='order_items.json'):
+        self.category_tree = category_tree
+        self._item_ids = set()
+        self._order_days = {}
+        self._stale = False
+        self._roots = None
+        super().__init__(db, filename)
+
+    def _reset(self):
+        self._item_ids = set()
+        self._stale = False
+        self._columns = {}          # product_id -> cột (chỉ số) dùng trong các mảng của NumPy
+        self._product_ids = []      # cột -> product_id
+        self._days = {}             # ngày -> nhóm các sản phẩm đã bán trong ngày
+        self._pending = {name: array('q') for name in self.PENDING}
+        self._order_days = self._load_order_days()
+
+    def _load_order_days(self):
+        """order_id -> ngày của đơn, đọc cả bảng orders một lần (không tra từng dòng)"""
+        _, orders = self.db.snapshot('orders.json')
+        days = {}
+        by_date = {}    # mỗi ngày chỉ parse một lần dù có nhiều đơn
+        for order in orders:
+            created = order['created_at'][:10]
+            day = by_date.get(created)
+            if day is None:
+                day = by_date[created] = day_number(created)
+            days[order['id']] = day
+        return days
+
+    def _order_day(self, order_id):
+        day = self._order_days.get(order_id)
+        if day is None:
+            # Đơn mới tạo sau lần dựng lại
+            order = self.db.get_by_id('orders.json', order_id)
+            if order is None:
+                return None
+            day = self._order_days[order_id] = day_number(order['created_at'])
+        return day
+
+    def _add(self, item):
+        day = self._order_day(item['order_id'])
+        if day is None:
+            return
+        product_id = item['product_id']
+        revenue = item['price'] * item['quantity']
+        if np is not None:
+            column = self._columns.get(product_id)
+            if column is None:
+                column = self._columns[product_id] = len(self._product_ids)
+                self._product_ids.append(product_id)
+            for name, value in zip(self.PENDING, (day, column, item['quantity'], revenue)):
+                self._pending[name].append(value)
+        else:
+            totals = self._days.setdefault(day, {}).setdefault(product_id, [0, 0])
+            totals[0] += item['quantity']
+            totals[1] += revenue
+        self._item_ids.add(item['id'])
+
+    def _remove(self, item_id):
+        # Bảng gộp chỉ cộng thêm; dòng đơn hàng bị sửa/xóa (hiếm) thì dựng lại ở lần truy vấn sau
+        if item_id in self._item_ids:
+            self._stale = True
+
+    def _rebuild(self, items):
+        """Dựng lại từ cả bảng: gom các cột bằng list comprehension thay vì _add() từng dòng"""
+        self._reset()
+        if np is None:
+            for item in items:
+                self._add(item)
+            return
+        days = self._order_days
+        items = [item for item in items if item['order_id'] in days]
+        for product_id in {item['product_id'] for item in items}:
+            self._columns[product_id] = len(self._product_ids)
+            self._product_ids.append(product_id)
+        columns = self._columns
+        self._pending = {
+            'day': array('q', [days[item['order_id']] for item in items]),
+            'column': array('q', [columns[item['product_id']] for item in items]),
+            'quantity': array('q', [item['quantity'] for item in items]),
+            'revenue': array('q', [item['price'] * item['quantity'] for item in items]),
+        }
+        self._item_ids = {item['id'] for item in items}
+
+    def _ensure_fresh(self):
+        if self._stale:
+            self._version = None
+        version = self.db.version(self.filename)
+        if self._version is None or self._version != version:
+            version, items = self.db.snapshot(self.filename)
+            self._rebuild(items)
+            self._version = version
+        if np is not None:
+            self._flush()
+
+    def _flush(self):
+        """Gộp các dòng đang chờ vào nhóm của từng ngày (cộng dồn theo cột sản phẩm)"""
+        if not len(self._pending['day']):
+            return
+        pending = {name: np.frombuffer(values, dtype=np.int64) for name, values in self._pending.items()}
+        order = np.argsort(pending['day'], kind='stable')
+        pending = {name: values[order] for name, values in pending.items()}
+        days, starts = np.unique(pending['day'], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for day, first, last in zip(days.tolist(), starts.tolist(), ends.tolist()):
+            parts = [tuple(pending[name][first:last] for name in self.PENDING[1:])]
+            if day in self._days:
+                parts.append(self._days[day])
+            columns = np.concatenate([part[0] for part in parts])
+            products, inverse = np.unique(columns, return_inverse=True)
+            bucket = [products]
+            for i in (1, 2):
+                totals = np.zeros(len(products), np.int64)
+                np.add.at(totals, inverse, np.concatenate([part[i] for part in parts]))
+                bucket.append(totals)
+            self._days[day] = tuple(bucket)
+        self._pending = {name: array('q') for name in self.PENDING}
+
+    def _buckets(self, start, end):
+        """(ngày, nhóm) của các ngày có bán trong [start, end]"""
+        if end - start + 1 <= len(self._days):
+            return [(day, self._days[day]) for day in range(start, end + 1) if day in self._days]
+        return [(day, bucket) for day, bucket in self._days.items() if start <= day <= end]
+
+    def _by_product(self, start, end):
+        """product_id -> (số lượng, doanh thu) trong khoảng ngày"""
+        with self._lock:
+            self._ensure_fresh()
+            buckets = [bucket for _, bucket in self._buckets(start, end)]
+            if not buckets:
+                return {}
+            if np is not None:
+                columns = np.concatenate([bucket[0] for bucket in buckets])
+                size = len(self._product_ids)
+                quantity = np.bincount(columns, weights=np.concatenate([b[1] for b in buckets]), minlength=size)
+                revenue = np.bincount(columns, weights=np.concatenate([b[2] for b in buckets]), minlength=size)
+                return {self._product_ids[column]: (int(quantity[column]), int(round(revenue[column])))
+                        for column in np.flatnonzero(quantity)}
+            totals = {}
+            for products in buckets:
+                for product_id, (quantity, revenue) in products.items():
+                    old = totals.get(product_id, (0, 0))
+                    totals[product_id] = (old[0] + quantity, old[1] + revenue)
+            return totals
+
+    def daily_revenue(self, start, end):
+        """Doanh thu và số lượng bán theo từng ngày trong [start, end] (kể cả ngày không có đơn)"""
+        start, end = day_number(start), day_number(end)
+        span = max(end - start + 1, 0)
+        revenue, quantity = [0] * span, [0] * span
+        with self._lock:
+            self._ensure_fresh()
+            for day, bucket in self._buckets(start, end):
+                if np is not None:
+                    quantity[day - start], revenue[day - start] = int(bucket[1].sum()), int(bucket[2].sum())
+                else:
+                    for day_q, day_r in bucket.values():
+                        quantity[day - start] += day_q
+                        revenue[day - start] += day_r
+        return [{'date': date.fromordinal(start + i).isoformat(), 'revenue': revenue[i], 'quantity': quantity[i]}
+                for i in range(span)]
+
+    def top_sellers(self, start, end, limit=10, by='revenue'):
+        """Các sản phẩm bán chạy nhất theo doanh thu ('revenue') hoặc số lượng ('quantity')"""
+        totals = self._by_product(day_number(start), day_number(end))
+        key = 0 if by == 'quantity' else 1
+        ranked = sorted(totals.items(), key=lambda item: (-item[1][key], item[0]))[:limit]
+        result = []
+        for product_id, (quantity, revenue) in ranked:
+            product = self.db.get_by_id('products.json', product_id)
+            result.append({'product_id': product_id, 'name': product['name'] if product else None,
+                           'quantity': quantity, 'revenue': revenue})
+        return result
+
+    def _root_categories(self):
+        """product_id -> danh mục gốc, dựng lại khi products/categories đổi"""
+        versions = (self.db.version('products.json'), self.db.version('categories.json'))
+        if self._roots is None or self._roots[0] != versions:
+            roots = {}
+            for product in self.db.snapshot('products.json')[1]:
+                category_id = product.get('category_id')
+                if category_id is not None:
+                    # Gộp vào danh mục gốc của nhánh
+                    ancestors = self.category_tree.ancestors(category_id)
+                    category_id = ancestors[0] if ancestors else category_id
+                roots[product['id']] = category_id
+            self._roots = (versions, roots)
+        return self._roots[1]
+
+    def category_mix(self, start, end):
+        """Tỷ trọng doanh thu theo danh mục gốc (cấp cao nhất) trong khoảng ngày"""
+        totals = self._by_product(day_number(start), day_number(end))
+        roots = self._root_categories()
+        mix = {}
+        for product_id, (quantity, revenue) in totals.items():
+            category_id = roots.get(product_id)
+            old = mix.get(category_id, (0, 0))
+            mix[category_id] = (old[0] + quantity, old[1] + revenue)
+        grand_total = sum(revenue for _, revenue in mix.values()) or 1
+        result = []
+        for category_id, (quantity, revenue) in sorted(mix.items(), key=lambda item: -item[1][1]):
+            category = self.db.get_by_id('categories.json', category_id) if category_id is not None else None
+            result.append({'category_id': category_id,
+                           'name': category['name'] if category else 'Khác',
+                           'quantity': quantity, 'revenue': revenue,
+                           'share': round(revenue / grand_total, 4)})
+        return result
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # Brotli là tùy chọn: không có thì chỉ tạo bản .gz
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_FILE = 'manifest.json'
+# Các loại file dạng văn bản được nén sẵn (ảnh JPEG/PNG/WebP đã nén nên bỏ qua)
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+# Các mã hóa theo thứ tự ưu tiên khi phục vụ: tên trong Accept-Encoding -> đuôi file
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def fingerprint(path):
+    """12 ký tự đầu của SHA-256 nội dung file (đổi khi nội dung đổi)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def build(static_dir):
+    """Chép mọi file trong `static_dir` sang static/dist với tên có mã băm và ghi manifest.
+
+    Ví dụ css/style.css -> dist/css/style.3f2a9c0d1b7e.css. File văn bản được nén
+    sẵn thành .gz (và .br nếu có thư viện brotli) để khỏi nén lại mỗi request.
+    Trả về manifest: {'files': {tên gốc: tên có mã băm}, 'encodings': {tên có mã băm: [mã hóa]}}.
+    """
+    dist = os.path.join(static_dir, DIST_DIR)
+    # Dựng vào thư mục tạm rồi mới thay thế để server đang chạy không thấy dist dở dang
+    staging = dist + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    files, encodings = {}, {}
+    for root, dirs, names in os.walk(static_dir):
+        if root == static_dir:
+            dirs[:] = [d for d in dirs if d not in (DIST_DIR, DIST_DIR + '.tmp')]
+        for name in sorted(names):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            stem, ext = os.path.splitext(logical)
+            hashed = f'{stem}.{fingerprint(source)}{ext}'
+            target = os.path.join(staging, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            files[logical] = hashed
+            if ext.lower() in COMPRESSIBLE:
+                with open(source, 'rb') as f:
+                    data = f.read()
+                variants = []
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as f:
+                        f.write(brotli.compress(data, quality=11))
+                    variants.append('br')
+                with open(target + '.gz', 'wb') as f:
+                    # mtime=0 để cùng nội dung luôn cho cùng file .gz
+                    f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                variants.append('gzip')
+                encodings[hashed] = variants
+    manifest = {'files': files, 'encodings': encodings}
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.replace(staging, dist)
+    return manifest
+
+
+class AssetManifest:
+    """Đọc static/dist/manifest.json để đổi tên file tĩnh sang tên có mã băm.
+
+    Manifest được đọc lại khi file thay đổi (chạy build_assets.py lúc server
+    đang chạy). Chưa build thì hashed() trả về None và trang dùng /static như cũ.
+    """
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.dist_dir = os.path.join(static_dir, DIST_DIR)
+        self._path = os.path.join(self.dist_dir, MANIFEST_FILE)
+        # (chữ ký file, files, encodings): gán một lần nên các luồng luôn thấy bản nhất quán
+        self._manifest = (None, {}, {})
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self._path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature != self._manifest[0]:
+            manifest = {}
+            if signature is not None:
+                with open(self._path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+            self._manifest = (signature, manifest.get('files', {}), manifest.get('encodings', {}))
+        return self._manifest
+
+    @property
+    def version(self):
+        """Chữ ký của manifest hiện tại (đổi sau mỗi lần build), dùng làm một phần khóa cache trang"""
+        return self._refresh()[0]
+
+    def hashed(self, filename):
+        """Tên có mã băm (tương đối với static/dist) của file tĩnh, None nếu chưa build"""
+        return self._refresh()[1].get(filename.lstrip('/'))
+
+    def encodings(self, hashed):
+        """Các bản nén sẵn ('br', 'gzip') của một file đã build"""
+        return self._refresh()[2].get(hashed, ())
@@ -1,10 +1,56 @@
+import os  # IMPORT THƯ VIỆN HỆ THỐNG ĐỂ BIẾT TIẾN TRÌNH HIỆN TẠI (POOL KHÔNG DÙNG CHUNG SAU FORK)
+import threading  # IMPORT THƯ VIỆN LUỒNG ĐỂ GIỚI HẠN SỐ YÊU CẦU BĂM ĐANG CHỜ
+from concurrent.futures import ThreadPoolExecutor  # POOL LUỒNG RIÊNG CHO VIỆC BĂM MẬT KHẨU
 import bcrypt  # IMPORT THƯ VIỆN BCRYPT ĐỂ MÃ HÓA VÀ XÁC THỰC MẬT KHẨU MỘT CÁCH AN TOÀN
+from config import Config  # IMPORT CẤU HÌNH (SỐ VÒNG BCRYPT, KÍCH THƯỚC POOL)
+from utils.metrics import metrics  # ĐO THỜI GIAN BĂM (KỂ CẢ THỜI GIAN CHỜ POOL) KHI BẬT METRICS
+
+class AuthBusyError(Exception):  # LỖI KHI POOL BĂM MẬT KHẨU ĐÃ ĐẦY - ROUTE TRẢ VỀ 503 NGAY THAY VÌ XẾP HÀNG VÔ HẠN
+    pass
 
 class SimpleAuth:  # ĐỊNH NGHĨA LỚP XỬ LÝ XÁC THỰC VÀ BẢO MẬT MẬT KHẨU
-    @staticmethod  # ĐÁNH DẤU ĐÂY LÀ PHƯƠNG THỨC TĨNH - KHÔNG CẦN TẠO INSTANCE ĐỂ SỬ DỤNG
-    def hash_password(password):  # PHƯƠNG THỨC MÃ HÓA MẬT KHẨU THÀNH CHUỖI BĂM AN TOÀN
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')  # MÃ HÓA MẬT KHẨU SỬ DỤNG BCRYPT VÀ TRẢ VỀ CHUỖI ĐÃ MÃ HÓA
-    
-    @staticmethod  # ĐÁNH DẤU PHƯƠNG THỨC TĨNH
-    def verify_password(password, hashed):  # PHƯƠNG THỨC KIỂM TRA MẬT KHẨU CÓ KHỚP VỚI CHUỖI ĐÃ MÃ HÓA KHÔNG
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))  # SO SÁNH MẬT KHẨU GỐC VỚI CHUỖI ĐÃ MÃ HÓA VÀ TRẢ VỀ TRUE/FALSE
\ No newline at end of file
+    """Băm/kiểm tra mật khẩu bcrypt trong một pool luồng riêng có giới hạn.
+
+    bcrypt nhả GIL trong lúc băm nên chạy trong pool không chặn các route khác;
+    tối đa `workers` phép băm chạy cùng lúc và `queue_size` phép băm chờ, quá số
+    đó thì báo AuthBusyError ngay (backpressure) để không dồn CPU khi bị dội login.
+    """
+
+    def __init__(self, rounds=None, workers=None, queue_size=None, wait_seconds=None):  # KHỞI TẠO VỚI THÔNG SỐ LẤY TỪ CONFIG NẾU KHÔNG TRUYỀN VÀO
+        self.rounds = rounds or Config.BCRYPT_ROUNDS  # SỐ VÒNG (COST) CỦA BCRYPT CHO CÁC HASH MỚI
+        self.workers = workers or Config.AUTH_WORKERS  # SỐ LUỒNG BĂM CHẠY SONG SONG
+        self.queue_size = Config.AUTH_QUEUE_SIZE if queue_size is None else queue_size  # SỐ YÊU CẦU ĐƯỢC PHÉP CHỜ
+        self.wait_seconds = Config.AUTH_QUEUE_WAIT if wait_seconds is None else wait_seconds  # THỜI GIAN TỐI ĐA CHỜ CHỖ TRONG HÀNG ĐỢI
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)  # GIỚI HẠN TỔNG SỐ YÊU CẦU ĐANG CHẠY + ĐANG CHỜ
+        self._executor = None  # POOL ĐƯỢC TẠO KHI DÙNG LẦN ĐẦU (VÀ TẠO LẠI TRONG TIẾN TRÌNH CON SAU FORK)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):  # LẤY POOL CỦA TIẾN TRÌNH HIỆN TẠI
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, func, *args):  # CHẠY HÀM BĂM TRONG POOL, BÁO BẬN NẾU HÀNG ĐỢI ĐÃ ĐẦY
+        with metrics.span('auth', func.__name__):
+            if not self._slots.acquire(timeout=self.wait_seconds):
+                raise AuthBusyError('Quá nhiều yêu cầu đăng nhập/đăng ký cùng lúc')
+            try:
+                return self._pool().submit(func, *args).result()
+            finally:
+                self._slots.release()
+
+    def hash_password(self, password):  # PHƯƠNG THỨC MÃ HÓA MẬT KHẨU THÀNH CHUỖI BĂM AN TOÀN
+        salt = bcrypt.gensalt(rounds=self.rounds)  # TẠO SALT VỚI SỐ VÒNG CẤU HÌNH
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')  # MÃ HÓA MẬT KHẨU SỬ DỤNG BCRYPT VÀ TRẢ VỀ CHUỖI ĐÃ MÃ HÓA
+
+    def verify_password(self, password, hashed):  # PHƯƠNG THỨC KIỂM TRA MẬT KHẨU CÓ KHỚP VỚI CHUỖI ĐÃ MÃ HÓA KHÔNG
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))  # SO SÁNH MẬT KHẨU GỐC VỚI CHUỖI ĐÃ MÃ HÓA VÀ TRẢ VỀ TRUE/FALSE
+
+    def needs_rehash(self, hashed):  # KIỂM TRA HASH CÓ ĐƯỢC TẠO VỚI SỐ VÒNG KHÁC CẤU HÌNH HIỆN TẠI KHÔNG ('$2b$12$...')
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
\ No newline at end of file
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bộ nhớ đệm LRU trong tiến trình, mỗi mục hết hạn sau `ttl` giây.
+
+    Dùng cho cache toàn trang (trang catalog của khách chưa đăng nhập) và cache
+    đoạn HTML (lưới sản phẩm). Khóa nên chứa version của các bảng liên quan
+    (db.version) để dữ liệu mới tự dùng mục mới; clear() để xóa chủ động khi
+    admin sửa sản phẩm/danh mục. ttl <= 0 thì tắt cache.
+    """
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (hạn dùng, giá trị)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
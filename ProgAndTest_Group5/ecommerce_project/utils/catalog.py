@@ -0,0 +1,249 @@
+import bisect
+from utils.db import DerivedIndex
+from utils.search import fold
+
+
+class _CategoryIndex(DerivedIndex):
+    """Các danh mục theo id và bao đóng (closure) tổ tiên/con cháu của từng danh mục"""
+
+    def __init__(self, db, filename='categories.json'):
+        self._categories = {}   # category_id -> dòng danh mục
+        self._closures = None   # (ancestors, descendants), tính lại khi bảng thay đổi
+        super().__init__(db, filename)
+
+    def _reset(self):
+        self._categories = {}
+        self._closures = None
+
+    def _add(self, category):
+        self._categories[category['id']] = category
+        self._closures = None
+
+    def _remove(self, category_id):
+        self._categories.pop(category_id, None)
+        self._closures = None
+
+    def closures(self):
+        """Trả về (ancestors, descendants): category_id -> danh sách id tổ tiên (gốc trước)
+        và category_id -> frozenset id con cháu (kể cả chính nó). Gọi trong self._lock."""
+        self._ensure_fresh()
+        if self._closures is None:
+            ancestors, descendants = {}, {}
+            for category_id in self._categories:
+                chain, seen = [], {category_id}
+                parent_id = self._categories[category_id].get('parent_id')
+                # `seen` chặn vòng lặp nếu dữ liệu có chu trình parent_id
+                while parent_id in self._categories and parent_id not in seen:
+                    chain.append(parent_id)
+                    seen.add(parent_id)
+                    parent_id = self._categories[parent_id].get('parent_id')
+                chain.reverse()
+                ancestors[category_id] = chain
+            for category_id in self._categories:
+                descendants.setdefault(category_id, set()).add(category_id)
+                for ancestor_id in ancestors[category_id]:
+                    descendants.setdefault(ancestor_id, set()).add(category_id)
+            self._closures = (ancestors, {cid: frozenset(ids) for cid, ids in descendants.items()})
+        return self._closures
+
+
+class _ProductCategoryIndex(DerivedIndex):
+    """category_id -> tập id sản phẩm thuộc trực tiếp danh mục đó"""
+
+    def __init__(self, db, filename='products.json'):
+        self._by_category = {}
+        self._category_of = {}
+        super().__init__(db, filename)
+
+    def _reset(self):
+        self._by_category, self._category_of = {}, {}
+
+    def _add(self, product):
+        category_id = product.get('category_id')
+        self._by_category.setdefault(category_id, set()).add(product['id'])
+        self._category_of[product['id']] = category_id
+
+    def _remove(self, product_id):
+        if product_id in self._category_of:
+            category_id = self._category_of.pop(product_id)
+            self._by_category[category_id].discard(product_id)
+
+
+class CategoryTree:
+    """Cây danh mục tính sẵn: tổ tiên, con cháu (mọi độ sâu) và tập sản phẩm của cả nhánh.
+
+    Hai chỉ mục con tự cập nhật khi categories.json hoặc products.json thay
+    đổi; tập sản phẩm của từng nhánh được tính một lần rồi giữ lại cho tới khi
+    một trong hai bảng đổi version, nên lọc theo danh mục chỉ còn là tra tập hợp.
+    """
+
+    def __init__(self, db):
+        self._categories = _CategoryIndex(db)
+        self._products = _ProductCategoryIndex(db)
+        self._subtree_cache = {}
+        self._cache_versions = None
+
+    def ancestors(self, category_id):
+        """Id các danh mục tổ tiên, từ gốc xuống cha trực tiếp (dùng cho breadcrumb)"""
+        with self._categories._lock:
+            ancestors, _ = self._categories.closures()
+            return list(ancestors.get(category_id, []))
+
+    def descendants(self, category_id):
+        """Tập id của danh mục và mọi danh mục con cháu của nó"""
+        with self._categories._lock:
+            _, descendants = self._categories.closures()
+            return descendants.get(category_id, frozenset())
+
+    def walk(self):
+        """Duyệt cây theo thứ tự trước (cha rồi tới con), sinh ra (danh mục, độ sâu)"""
+        with self._categories._lock:
+            ancestors, _ = self._categories.closures()
+            categories = self._categories._categories
+            children = {}
+            for category in categories.values():
+                parent_id = ancestors[category['id']][-1] if ancestors[category['id']] else None
+                children.setdefault(parent_id, []).append(category)
+            result, stack = [], [(c, 0) for c in reversed(children.get(None, []))]
+            while stack:
+                category, depth = stack.pop()
+                result.append((dict(category), depth))
+                stack.extend((c, depth + 1) for c in reversed(children.get(category['id'], [])))
+        return result
+
+    def product_ids(self, category_id):
+        """Tập id sản phẩm thuộc danh mục hoặc bất kỳ danh mục con cháu nào của nó"""
+        with self._categories._lock, self._products._lock:
+            _, descendants = self._categories.closures()
+            self._products._ensure_fresh()
+            versions = (self._categories._version, self._products._version)
+            if versions != self._cache_versions:
+                self._subtree_cache, self._cache_versions = {}, versions
+            ids = self._subtree_cache.get(category_id)
+            if ids is None:
+                by_category = self._products._by_category
+                ids = frozenset().union(*(by_category.get(cid, ()) for cid in descendants.get(category_id, ())))
+                self._subtree_cache[category_id] = ids
+            return ids
+
+
+# Các kiểu sắp xếp danh sách sản phẩm: tên -> (mảng đã sắp xếp, đảo ngược)
+SORTS = {
+    'default': ('ids', False),      # theo thứ tự thêm vào cửa hàng
+    'newest': ('ids', True),
+    'price_asc': ('by_price', False),
+    'price_desc': ('by_price', True),
+    'name': ('by_name', False),
+}
+
+
+class ProductListing(DerivedIndex):
+    """Các mảng id sản phẩm đã sắp xếp sẵn theo id, giá và tên để phân trang.
+
+    Mảng giá (giá, id) còn dùng bisect để lọc theo khoảng giá, nên một trang
+    của danh mục 50k sản phẩm không phải sắp xếp hay lọc cả danh sách.
+    """
+
+    def __init__(self, db, filename='products.json'):
+        self._keys = {}         # product_id -> (giá, tên đã bỏ dấu) đang nằm trong các mảng
+        self.ids = []
+        self.by_price = []      # [(giá, id)]
+        self.by_name = []       # [(tên đã bỏ dấu, id)]
+        super().__init__(db, filename)
+
+    def _reset(self):
+        self._keys = {}
+        self.ids = self.by_price = self.by_name = None  # sắp xếp một lần ở cuối
+
+    def _add(self, product):
+        price, name = product.get('price') or 0, fold(product.get('name'))
+        self._keys[product['id']] = (price, name)
+        if self.ids is not None:
+            bisect.insort(self.ids, product['id'])
+            bisect.insort(self.by_price, (price, product['id']))
+            bisect.insort(self.by_name, (name, product['id']))
+
+    def _remove(self, product_id):
+        if product_id not in self._keys:
+            return
+        price, name = self._keys.pop(product_id)
+        for array, entry in ((self.ids, product_id), (self.by_price, (price, product_id)),
+                             (self.by_name, (name, product_id))):
+            i = bisect.bisect_left(array, entry)
+            if i < len(array) and array[i] == entry:
+                del array[i]
+
+    def _finish(self):
+        self.ids = sorted(self._keys)
+        self.by_price = sorted((price, pid) for pid, (price, _) in self._keys.items())
+        self.by_name = sorted((name, pid) for pid, (_, name) in self._keys.items())
+
+    def _sort_key(self, array):
+        if array == 'by_price':
+            return lambda pid: (self._keys[pid][0], pid)
+        if array == 'by_name':
+            return lambda pid: (self._keys[pid][1], pid)
+        return None
+
+    def page(self, sort='default', min_price=None, max_price=None, only=None, offset=0, limit=None):
+        """Trả về (danh sách id của trang, tổng số sản phẩm khớp).
+
+        `only` giới hạn trong một tập id (ví dụ sản phẩm của một danh mục); nếu
+        là list thì thứ tự của list được giữ nguyên khi sort='relevance'
+        (kết quả tìm kiếm đã sắp theo độ liên quan).
+        """
+        with self._lock:
+            self._ensure_fresh()
+            if sort == 'relevance' and isinstance(only, list):
+                candidates = [pid for pid in only if pid in self._keys and
+                              (min_price is None or self._keys[pid][0] >= min_price) and
+                              (max_price is None or self._keys[pid][0] <= max_price)]
+                end = None if limit is None else offset + limit
+                return candidates[offset:end], len(candidates)
+
+            array_name, reverse = SORTS.get(sort, SORTS['default'])
+            allowed = set(only) if only is not None else None
+            if min_price is not None or max_price is not None:
+                # Khoảng giá: cắt đoạn liên tiếp của mảng theo giá bằng bisect
+                start = 0 if min_price is None else bisect.bisect_left(self.by_price, (min_price,))
+                end = (len(self.by_price) if max_price is None
+                       else bisect.bisect_right(self.by_price, (max_price, float('inf'))))
+                in_range = [pid for _, pid in self.by_price[start:end]]
+                if array_name == 'by_price' and allowed is None:
+                    ordered = in_range[::-1] if reverse else in_range
+                    stop = None if limit is None else offset + limit
+                    return ordered[offset:stop], len(ordered)
+                allowed = set(in_range) if allowed is None else allowed.intersection(in_range)
+
+            array = getattr(self, array_name)
+            if allowed is None:
+                total = len(array)
+                if reverse:
+                    start = total - offset
+                    stop = 0 if limit is None else max(start - limit, 0)
+                    chosen = array[stop:start][::-1] if start > 0 else []
+                else:
+                    chosen = array[offset:None if limit is None else offset + limit]
+                ids = [entry[1] if isinstance(entry, tuple) else entry for entry in chosen]
+                return ids, total
+
+            allowed.intersection_update(self._keys)
+            total = len(allowed)
+            stop = None if limit is None else offset + limit
+            if total * 8 < len(array):
+                # Ít ứng viên: sắp xếp riêng các ứng viên
+                ordered = sorted(allowed, key=self._sort_key(array_name), reverse=reverse)
+                return ordered[offset:stop], total
+            # Nhiều ứng viên: duyệt mảng đã sắp xếp và dừng khi đủ một trang
+            ids, skipped = [], 0
+            for entry in (reversed(array) if reverse else array):
+                pid = entry[1] if isinstance(entry, tuple) else entry
+                if pid not in allowed:
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                ids.append(pid)
+                if limit is not None and len(ids) >= limit:
+                    break
+            return ids, total
@@ -1,27 +1,376 @@
-import json
-import os
-from config import Config
-
-class SimpleDB:
-    def __init__(self):
-        self.data_dir = Config.DATA_DIR
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-    
-    def save(self, filename, data):
-        filepath = os.path.join(self.data_dir, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    def load(self, filename):
-        filepath = os.path.join(self.data_dir, filename)
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return []
-    
-    def get_next_id(self, data_list):
-        if not data_list:
-            return 1
-        return max(item['id'] for item in data_list) + 1
\ No newline at end of file
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from config import Config
+from utils.metrics import metrics
+from utils.storage import apply_records, create_storage, diff_rows, has_ids
+
+# Các cột khóa ngoại được đánh chỉ mục băm cho từng bảng (cột 'id' luôn có chỉ mục)
+FOREIGN_KEYS = {
+    'categories.json': ('parent_id',),
+    'products.json': ('category_id',),
+    'carts.json': ('user_id',),
+    'cart_items.json': ('cart_id', 'product_id'),
+    'orders.json': ('user_id', 'status'),
+    'order_items.json': ('order_id', 'product_id'),
+}
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+# Các cột được đánh chỉ mục duy nhất sau khi chuẩn hóa giá trị (tra bằng get_by_key)
+UNIQUE_KEYS = {
+    'users.json': {'email': normalize_email},
+}
+
+class _Table:
+    """Một bảng đã parse trong cache cùng các chỉ mục được dựng khi cần"""
+
+    def __init__(self, signature, rows):
+        self.signature = signature
+        self.rows = rows
+        self._indexes = {}
+
+    def index(self, field):
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            if field == 'id':
+                for row in self.rows:
+                    index[row['id']] = row
+            else:
+                for row in self.rows:
+                    index.setdefault(row.get(field), []).append(row)
+            self._indexes[field] = index
+        return index
+
+    def unique_index(self, field, normalize):
+        key = ('unique', field)
+        index = self._indexes.get(key)
+        if index is None:
+            index = {}
+            for row in self.rows:
+                index.setdefault(normalize(row.get(field)), row)
+            self._indexes[key] = index
+        return index
+
+class Transaction:
+    """Các thay đổi trên nhiều bảng được ghi cùng lúc khi khối `with` kết thúc.
+
+    save() thay cả bảng (backend tự so với dữ liệu cũ để biết dòng nào đổi);
+    append()/update_row()/delete_rows() chỉ ghi nhận các dòng bị đổi nên không
+    phải tải, sao chép và so sánh cả bảng lớn (orders, order_items...).
+    """
+
+    def __init__(self, db, filenames):
+        self.db = db
+        self.filenames = set(filenames)
+        self._staged = {}
+        self._records = {}   # filename -> bản ghi insert/update/delete của các lần ghi theo dòng
+
+    def _check(self, filename):
+        if filename not in self.filenames:
+            raise ValueError(f'Bảng {filename} không nằm trong giao dịch')
+
+    def load(self, filename):
+        self._check(filename)
+        if filename in self._staged:
+            return self.db._copy(self._staged[filename])
+        if filename in self._records:
+            _, rows = self.db.snapshot(filename)
+            return self.db._copy(apply_records(rows, self._records[filename]))
+        return self.db.load(filename)
+
+    def save(self, filename, data):
+        self._check(filename)
+        self._staged[filename] = data
+        # Cả bảng được thay nên các lần ghi theo dòng trước đó (đã nằm trong data nếu
+        # data lấy từ load()) không cần ghi riêng nữa
+        self._records.pop(filename, None)
+
+    def write_records(self, filename, records):
+        """Ghi nhận các bản ghi insert/update/delete (dạng của storage.diff_rows) cho bảng"""
+        self._check(filename)
+        if filename in self._staged:
+            self._staged[filename] = apply_records(self._staged[filename], records)
+        else:
+            self._records.setdefault(filename, []).extend(records)
+
+    def append(self, filename, *rows):
+        """Thêm các dòng mới (id cấp từ db.next_id) vào cuối bảng"""
+        self.write_records(filename, [{'op': 'insert', 'row': row} for row in rows])
+
+    def update_row(self, filename, row):
+        """Thay dòng có cùng 'id' bằng `row`"""
+        self.write_records(filename, [{'op': 'update', 'row': row}])
+
+    def delete_rows(self, filename, row_ids):
+        self.write_records(filename, [{'op': 'delete', 'id': row_id} for row_id in row_ids])
+
+class DerivedIndex:
+    """Cấu trúc dữ liệu dẫn xuất từ một bảng (chỉ mục tìm kiếm, gợi ý...).
+
+    Được dựng từ toàn bộ bảng ở lần dùng đầu tiên, sau đó cập nhật dần theo
+    từng dòng qua db.subscribe(). Nếu bảng bị tiến trình khác ghi (version trên
+    đĩa khác version đã dựng) thì dựng lại ở lần dùng kế tiếp. Lớp con cài đặt
+    _reset(), _add(row), _remove(row_id) và có thể _finish() sau khi dựng lại;
+    mọi truy vấn phải chạy trong `with self._lock:` sau khi gọi self._ensure_fresh().
+    """
+
+    def __init__(self, db, filename):
+        self.db = db
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._version = None
+        db.subscribe(filename, self._on_change)
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _add(self, row):
+        raise NotImplementedError
+
+    def _remove(self, row_id):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+    def _ensure_fresh(self):
+        version = self.db.version(self.filename)
+        if self._version is None or self._version != version:
+            self._reset()
+            for row in self.db.load(self.filename):
+                self._add(row)
+            self._finish()
+            self._version = version
+
+    def _on_change(self, old_version, new_version, records):
+        with self._lock:
+            if records is None or old_version != self._version:
+                # Đang cũ hơn dữ liệu: để lần dùng sau dựng lại
+                self._version = None
+                return
+            for record in records:
+                if record['op'] == 'delete':
+                    self._remove(record['id'])
+                else:
+                    self._remove(record['row']['id'])
+                    self._add(dict(record['row']))
+            self._version = new_version
+
+class SimpleDB:
+    def __init__(self):
+        self.data_dir = Config.DATA_DIR
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        # Backend lưu trữ: 'json' (ghi lại cả file) hoặc 'wal' (ghi thêm log)
+        self.storage = create_storage(Config.DB_BACKEND, self.data_dir)
+        # Hoàn tất các giao dịch bị gián đoạn lần chạy trước (nếu có)
+        self.storage.recover()
+        # Bộ nhớ đệm trong tiến trình: filename -> _Table
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        # Các bảng mà luồng hiện tại đang giữ khóa (để giao dịch lồng nhau không tự khóa chết)
+        self._held = threading.local()
+        # Các hàm được gọi sau khi một bảng thay đổi: filename -> [callback]
+        self._listeners = {}
+
+    def subscribe(self, filename, callback):
+        """Đăng ký callback(old_version, new_version, records) chạy sau mỗi lần bảng được ghi.
+
+        `records` là danh sách bản ghi insert/update/delete (xem storage.diff_rows),
+        hoặc None nếu không tính được. Dùng để cập nhật dần các chỉ mục dẫn xuất
+        (tìm kiếm, cây danh mục...) thay vì dựng lại từ đầu. Thay đổi do tiến trình
+        khác ghi thì không gọi callback: hãy so version() để biết cần dựng lại.
+        """
+        self._listeners.setdefault(filename, []).append(callback)
+
+    def version(self, filename):
+        """Chữ ký hiện tại của bảng trên đĩa (đổi mỗi khi bảng được ghi)"""
+        return self.storage.signature(filename)
+
+    def _copy(self, data):
+        # Trả về bản sao từng dòng để route sửa dữ liệu không làm bẩn cache
+        return [dict(row) if isinstance(row, dict) else row for row in data]
+
+    def save(self, filename, data):
+        with self.transaction(filename) as tx:
+            tx.save(filename, data)
+
+    def append(self, filename, *rows):
+        """Thêm các dòng mới vào bảng mà không tải/ghi lại cả bảng (xem Transaction.append)"""
+        with self.transaction(filename) as tx:
+            tx.append(filename, *rows)
+
+    def update_row(self, filename, row):
+        with self.transaction(filename) as tx:
+            tx.update_row(filename, row)
+
+    @contextmanager
+    def transaction(self, *filenames):
+        """Giao dịch trên nhiều bảng: khóa từng bảng (theo thứ tự tên để tránh khóa chết),
+        đọc dữ liệu mới nhất qua tx.load(), và ghi mọi tx.save() một cách nguyên tử khi
+        khối `with` kết thúc không lỗi. Chỉ các bảng liên quan bị khóa nên các route
+        khác vẫn chạy song song.
+
+            with db.transaction('orders.json', 'order_items.json') as tx:
+                orders = tx.load('orders.json')
+                ...
+                tx.save('orders.json', orders)
+        """
+        held = getattr(self._held, 'tables', None)
+        if held is None:
+            held = self._held.tables = set()
+        acquired = []
+        try:
+            with ExitStack() as stack:
+                for filename in sorted(set(filenames)):
+                    if filename not in held:
+                        stack.enter_context(self.storage.lock(filename))
+                        held.add(filename)
+                        acquired.append(filename)
+                tx = Transaction(self, filenames)
+                yield tx
+                if tx._staged or tx._records:
+                    self._commit(tx._staged, tx._records)
+        finally:
+            held.difference_update(acquired)
+
+    def _commit(self, staged, records=None):
+        changes = []
+        for filename, data in staged.items():
+            # Đang giữ khóa nên chữ ký cache được kiểm tra lại với dữ liệu trên đĩa
+            cached = self._table(filename)
+            previous = (cached.signature, cached.rows) if cached else None
+            changes.append((filename, data, previous, None))
+        for filename, table_records in (records or {}).items():
+            cached = self._table(filename)
+            previous = (cached.signature, cached.rows) if cached else None
+            # Sao chép các dòng được ghi để route sửa tiếp không làm bẩn cache; các dòng
+            # không đổi được dùng chung với cache cũ thay vì sao chép cả bảng
+            table_records = [dict(record, row=dict(record['row'])) if 'row' in record else record
+                             for record in table_records]
+            data = apply_records(previous[1] if previous else [], table_records)
+            changes.append((filename, data, previous, table_records))
+        with metrics.span('db_commit', ','.join(sorted(filename for filename, _, _, _ in changes))) as info:
+            signatures = self.storage.commit(changes)
+            info['rows'] = sum(len(data) if table_records is None else len(table_records)
+                               for _, data, _, table_records in changes)
+        # Cập nhật cache ngay để lần load() sau không phải đọc lại bảng vừa ghi
+        with self._cache_lock:
+            for filename, data, _, table_records in changes:
+                rows = self._copy(data) if table_records is None else data
+                self._cache[filename] = _Table(signatures[filename], rows)
+        for filename, data, previous, table_records in changes:
+            listeners = self._listeners.get(filename)
+            if not listeners:
+                continue
+            if previous is not None and table_records is not None:
+                old_version, records = previous[0], table_records
+            elif previous is not None and has_ids(previous[1]) and has_ids(data):
+                old_version, records = previous[0], list(diff_rows(previous[1], data))
+            else:
+                old_version, records = None, None
+            for callback in listeners:
+                callback(old_version, signatures[filename], records)
+
+    def _table(self, filename):
+        signature = self.storage.signature(filename)
+        if signature is None:
+            return None
+
+        with self._cache_lock:
+            cached = self._cache.get(filename)
+        if cached is None or cached.signature != signature:
+            # Bảng mới hoặc đã bị tiến trình khác thay đổi: đọc và parse lại
+            with metrics.span('db_read', filename) as info:
+                cached = _Table(*self.storage.read(filename))
+                info['rows'] = len(cached.rows)
+            with self._cache_lock:
+                self._cache[filename] = cached
+        return cached
+
+    def snapshot(self, filename):
+        """Trả về (version, rows) của bảng trong cache mà không sao chép.
+
+        `rows` dùng chung với cache nên người gọi tuyệt đối không được sửa.
+        """
+        table = self._table(filename)
+        if table is None:
+            return None, []
+        return table.signature, table.rows
+
+    def load(self, filename):
+        table = self._table(filename)
+        if table is None:
+            return []
+        return self._copy(table.rows)
+
+    def get_by_id(self, filename, item_id):
+        """Tìm một dòng theo 'id' qua chỉ mục băm, trả về None nếu không có"""
+        table = self._table(filename)
+        row = table.index('id').get(item_id) if table else None
+        return dict(row) if row is not None else None
+
+    def find_by(self, filename, field, value, copy=True):
+        """Lấy các dòng có cột khóa ngoại `field` bằng `value` qua chỉ mục băm.
+
+        copy=False trả về chính các dòng trong cache (chỉ được đọc, không được sửa)
+        để khỏi sao chép khi chỉ cần đếm/lọc rồi lấy một phần nhỏ.
+        """
+        if field not in FOREIGN_KEYS.get(filename, ()):
+            raise ValueError(f'Cột {field} của {filename} chưa được khai báo chỉ mục')
+        table = self._table(filename)
+        if table is None:
+            return []
+        rows = table.index(field).get(value, [])
+        return self._copy(rows) if copy else list(rows)
+
+    def get_by_key(self, filename, field, value):
+        """Tìm một dòng theo cột duy nhất trong UNIQUE_KEYS (giá trị được chuẩn hóa trước khi tra)"""
+        normalize = UNIQUE_KEYS.get(filename, {}).get(field)
+        if normalize is None:
+            raise ValueError(f'Cột {field} của {filename} chưa được khai báo chỉ mục duy nhất')
+        table = self._table(filename)
+        row = table.unique_index(field, normalize).get(normalize(value)) if table else None
+        return dict(row) if row is not None else None
+
+    @contextmanager
+    def bulk_load(self, filename):
+        """Thay toàn bộ bảng bằng dữ liệu ghi theo lô (công cụ sinh/nhập dữ liệu lớn).
+
+            with db.bulk_load('orders.json') as writer:
+                for batch in batches:
+                    writer.write(batch)
+
+        Không giữ cả bảng trong bộ nhớ như save(); bộ đếm id được đặt theo id lớn
+        nhất đã ghi. Các chỉ mục dẫn xuất sẽ dựng lại ở lần dùng kế tiếp.
+        """
+        with self.storage.lock(filename):
+            old_version = self.storage.signature(filename)
+            with self.storage.bulk_writer(filename) as writer:
+                yield writer
+        with self._cache_lock:
+            self._cache.pop(filename, None)
+        new_version = self.version(filename)
+        for callback in self._listeners.get(filename, []):
+            callback(old_version, new_version, None)
+
+    def close(self):
+        """Đóng tài nguyên của backend (kết nối SQLite) trước khi fork tiến trình worker.
+
+        Cache các bảng được giữ lại: worker thừa hưởng bản sao (copy-on-write) và
+        vẫn so chữ ký với dữ liệu trên đĩa trước mỗi lần dùng như mọi tiến trình khác.
+        """
+        self.storage.close()
+
+    def next_id(self, filename, count=1):
+        """Cấp id mới cho bảng từ bộ đếm lưu bền vững thay vì quét max() cả bảng.
+
+        Với count > 1 thì giữ trước cả một dải id liên tiếp và trả về id đầu tiên.
+        """
+        def seed():
+            table = self._table(filename)
+            return max((row['id'] for row in table.rows), default=0) if table else 0
+        return self.storage.allocate_ids(filename, count, seed)
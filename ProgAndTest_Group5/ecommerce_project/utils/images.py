@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow là tùy chọn: không có thì trang dùng ảnh gốc như cũ
+    Image = None
+
+VARIANTS_DIR = 'variants'
+# Chiều rộng (px) của các bản thu nhỏ: thẻ sản phẩm trong lưới và trang chi tiết
+VARIANT_WIDTHS = {'thumb': 320, 'medium': 800}
+# Định dạng -> (tên định dạng của Pillow, tham số lưu); bản JPEG dùng cho trình duyệt cũ
+FORMATS = {
+    'avif': ('AVIF', {'quality': 50}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def supported_formats():
+    """Các định dạng mà bản Pillow đang cài ghi được (AVIF/WebP tùy cách build)"""
+    if Image is None:
+        return []
+    result = []
+    for name in FORMATS:
+        if name == 'jpeg' or (name in features.modules and features.check(name)):
+            result.append(name)
+    return result
+
+
+class ImageVariants:
+    """Sinh và tra các bản thu nhỏ (thumb/medium, AVIF/WebP/JPEG) của ảnh sản phẩm.
+
+    Ảnh /static/images/x.jpg có các bản ở static/images/variants/x-320.webp...
+    kèm file x.json liệt kê các bản đã sinh. Các bản chỉ sinh một lần (ở luồng nền
+    qua generate_async() khi admin thêm/sửa sản phẩm, hoặc khi chạy generate_images.py)
+    rồi được phục vụ như file tĩnh; variants() đọc x.json và giữ kết quả trong bộ
+    nhớ tới khi file này đổi. Khi chưa có x.json, trang dùng ảnh gốc.
+    """
+
+    def __init__(self, static_dir, static_url_path='/static'):
+        self.static_dir = static_dir
+        self.prefix = static_url_path.rstrip('/') + '/'
+        self._cache = {}    # image -> (chữ ký file json, {định dạng: [(đường dẫn, chiều rộng)]})
+        self._lock = threading.Lock()
+        self._executor = None   # pool tạo khi dùng lần đầu (và tạo lại trong tiến trình con sau fork)
+        self._pid = None
+        self._pending = set()   # các ảnh đang chờ trong pool
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Một luồng là đủ: sinh ảnh tốn CPU, chạy song song chỉ tranh CPU với các request
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+                self._pid = os.getpid()
+                self._pending = set()
+            return self._executor
+
+    def _paths(self, image):
+        """(file ảnh gốc, thư mục chứa các bản, tên gốc không đuôi) hoặc None nếu không phải ảnh trong static"""
+        if not image or not image.startswith(self.prefix):
+            return None
+        relative = image[len(self.prefix):]
+        source = os.path.normpath(os.path.join(self.static_dir, relative))
+        if not source.startswith(os.path.normpath(self.static_dir) + os.sep):
+            return None
+        folder, name = os.path.split(relative)
+        return source, os.path.join(folder, VARIANTS_DIR), os.path.splitext(name)[0]
+
+    def generate(self, image, force=False):
+        """Sinh các bản thu nhỏ của ảnh `image` (đường dẫn như cột image của sản phẩm).
+
+        Bỏ qua nếu không có Pillow, ảnh nằm ngoài static/ hoặc các bản đã mới hơn ảnh gốc.
+        Trả về danh sách đường dẫn (tương đối với static/) của các bản đã sinh.
+        """
+        paths = self._paths(image)
+        if Image is None or paths is None or not os.path.isfile(paths[0]):
+            return []
+        source, variants_dir, stem = paths
+        index_path = os.path.join(self.static_dir, variants_dir, stem + '.json')
+        if not force and os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(source):
+            return []
+        os.makedirs(os.path.join(self.static_dir, variants_dir), exist_ok=True)
+
+        index, written = {}, []
+        try:
+            with Image.open(source) as original:
+                original.load()
+                # Không phóng to: ảnh nhỏ hơn bản thu nhỏ thì dùng chiều rộng gốc
+                widths = sorted({min(width, original.width) for width in VARIANT_WIDTHS.values()})
+                for width in widths:
+                    height = max(round(original.height * width / original.width), 1)
+                    resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+                    for name in supported_formats():
+                        pil_format, options = FORMATS[name]
+                        frame = resized
+                        if name == 'jpeg':
+                            frame = resized.convert('RGB')
+                        elif resized.mode not in ('RGB', 'RGBA'):
+                            frame = resized.convert('RGBA')
+                        relative = f'{variants_dir}/{stem}-{width}.{name if name != "jpeg" else "jpg"}'.replace(os.sep, '/')
+                        frame.save(os.path.join(self.static_dir, relative), pil_format, **options)
+                        index.setdefault(name, []).append((relative, width))
+                        written.append(relative)
+        except (OSError, ValueError):
+            # Ảnh hỏng hoặc định dạng không đọc được: trang tiếp tục dùng ảnh gốc
+            return []
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+        with self._lock:
+            self._cache.pop(image, None)
+        return written
+
+    def generate_async(self, image, on_done=None):
+        """Xếp generate(image) vào luồng nền để request (admin thêm/sửa sản phẩm) không phải chờ.
+
+        Ảnh đã đang chờ thì không xếp thêm lần nữa. `on_done()` được gọi ở luồng
+        nền khi đã sinh được bản mới (ví dụ để xóa các trang đã cache với ảnh gốc).
+        Trả về Future, hoặc None nếu không có gì để sinh.
+        """
+        if Image is None or self._paths(image) is None:
+            return None
+        pool = self._pool()
+        with self._lock:
+            if image in self._pending:
+                return None
+            self._pending.add(image)
+        return pool.submit(self._generate_in_background, image, on_done)
+
+    def _generate_in_background(self, image, on_done):
+        # Bỏ khỏi danh sách chờ trước khi sinh: nếu ảnh gốc lại đổi trong lúc sinh thì lần xếp sau vẫn chạy
+        with self._lock:
+            self._pending.discard(image)
+        written = self.generate(image)
+        if written and on_done is not None:
+            on_done()
+        return written
+
+    def variants(self, image):
+        """{định dạng: [(đường dẫn tương đối với static/, chiều rộng)]} của các bản đã sinh"""
+        paths = self._paths(image)
+        if paths is None:
+            return {}
+        _, variants_dir, stem = paths
+        index_path = os.path.join(self.static_dir, variants_dir, stem + '.json')
+        try:
+            stat = os.stat(index_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            cached = self._cache.get(image)
+        if cached is None or cached[0] != signature:
+            with open(index_path, encoding='utf-8') as f:
+                cached = (signature, {name: [tuple(v) for v in values] for name, values in json.load(f).items()})
+            with self._lock:
+                self._cache[image] = cached
+        return cached[1]
@@ -0,0 +1,179 @@
+import json
+import os
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from config import Config
+from utils.storage import _stat_signature, file_lock, io_counters, write_json_atomic
+
+class Inventory:
+    """Tồn kho theo từng sản phẩm, mỗi sản phẩm một file data/inventory/<id>.json.
+
+    Mỗi file có khóa riêng nên giữ hàng (reserve/release) cho một sản phẩm đang
+    "hot" không chặn các sản phẩm khác. File chứa số lượng trong kho và các
+    lượt giữ hàng (hold) còn hiệu lực:
+
+        {"stock": 5, "holds": {"<hold_id>": {"quantity": 1, "expires_at": 1700000000.0}}}
+
+    Khi chưa có file, số lượng được lấy từ trường 'stock' trong products.json;
+    mọi thao tác đổi số lượng đều ghi lại trường này (xem _stock_locked) nên nó
+    không bị cũ sau khi bán hàng.
+    Một hold là dict {'id': ..., 'lines': [[product_id, quantity], ...]} để có
+    thể lưu vào session. Mỗi lần một file tồn kho được ghi, file version.json
+    cũng được thay mới để version() (dùng làm khóa cache trang) đổi theo.
+    """
+
+    def __init__(self, db, hold_seconds=None):
+        self.db = db
+        self.hold_seconds = hold_seconds if hold_seconds is not None else Config.STOCK_HOLD_SECONDS
+        self.inventory_dir = os.path.join(db.data_dir, 'inventory')
+        if not os.path.exists(self.inventory_dir):
+            os.makedirs(self.inventory_dir)
+
+    def _path(self, product_id):
+        return os.path.join(self.inventory_dir, f'{int(product_id)}.json')
+
+    def _version_path(self):
+        return os.path.join(self.inventory_dir, 'version.json')
+
+    def version(self):
+        """Chữ ký của lần ghi tồn kho gần nhất (kể cả giữ/trả hàng), đổi qua mọi tiến trình.
+
+        Hold hết hạn không làm đổi version: số lượng đó chỉ hiện lại sau khi
+        trang cache hết hạn hoặc có lần ghi tồn kho tiếp theo.
+        """
+        try:
+            return _stat_signature(os.stat(self._version_path()))
+        except FileNotFoundError:
+            return None
+
+    def _read(self, product_id, now):
+        try:
+            with open(self._path(product_id), 'r', encoding='utf-8') as f:
+                io_counters.read(os.fstat(f.fileno()).st_size)
+                state = json.load(f)
+        except FileNotFoundError:
+            product = self.db.get_by_id('products.json', product_id)
+            state = {'stock': product['stock'] if product else 0, 'holds': {}}
+        # Bỏ các hold đã hết hạn (giỏ hàng bị bỏ dở)
+        state['holds'] = {hold_id: hold for hold_id, hold in state['holds'].items()
+                          if hold['expires_at'] > now}
+        return state
+
+    def _available(self, state):
+        return state['stock'] - sum(hold['quantity'] for hold in state['holds'].values())
+
+    @contextmanager
+    def _locked(self, product_ids):
+        """Khóa các sản phẩm theo thứ tự id (tránh khóa chết), ghi lại những file bị sửa"""
+        product_ids = sorted(set(int(pid) for pid in product_ids))
+        now = time.time()
+        with ExitStack() as stack:
+            for product_id in product_ids:
+                stack.enter_context(file_lock(self._path(product_id) + '.lock'))
+            states = {pid: self._read(pid, now) for pid in product_ids}
+            originals = {pid: json.dumps(state, sort_keys=True) for pid, state in states.items()}
+            yield states, now
+            changed = False
+            for product_id, state in states.items():
+                if json.dumps(state, sort_keys=True) != originals[product_id]:
+                    write_json_atomic(self._path(product_id), state, indent=None)
+                    changed = True
+            if changed:
+                # Mỗi lần thay file inode đổi, nên version() khác nhau kể cả khi hai
+                # tiến trình ghi cùng lúc
+                write_json_atomic(self._version_path(), now, indent=None)
+
+    @contextmanager
+    def _stock_locked(self, product_ids, fields=None):
+        """Như _locked() cho các thao tác đổi số lượng trong kho (commit, restock, set_stock).
+
+        Số lượng mới được ghi vào trường 'stock' của products.json (cùng `fields`
+        khác của sản phẩm nếu có) trong cùng khóa, nên fallback của _read() và
+        migrate_to_sqlite.py luôn thấy đúng số lượng. products.json luôn được khóa
+        trước các file tồn kho (checkout khóa nó cùng các bảng đơn hàng) để không
+        khóa chết.
+        """
+        with self.db.transaction('products.json') as tx:
+            with self._locked(product_ids) as (states, now):
+                before = {pid: state['stock'] for pid, state in states.items()}
+                yield states, now
+            for pid, state in states.items():
+                if state['stock'] == before[pid] and not fields:
+                    continue
+                product = self.db.get_by_id('products.json', pid)
+                if product is not None:
+                    product.update(fields or {})
+                    product['stock'] = state['stock']
+                    tx.update_row('products.json', product)
+
+    def stock_levels(self, product_ids):
+        now = time.time()
+        return {pid: self._available(self._read(pid, now)) for pid in product_ids}
+
+    def reserve(self, lines):
+        """Giữ hàng cho tất cả các dòng [(product_id, quantity)] hoặc không giữ dòng nào.
+
+        Trả về hold (dict) nếu đủ hàng, ngược lại trả về None. Hold tự hết hạn
+        sau `hold_seconds` giây nếu không được commit().
+        """
+        lines = [[int(pid), int(quantity)] for pid, quantity in lines]
+        hold_id = uuid.uuid4().hex
+        with self._locked([pid for pid, _ in lines]) as (states, now):
+            needed = {}
+            for pid, quantity in lines:
+                needed[pid] = needed.get(pid, 0) + quantity
+            if any(self._available(states[pid]) < quantity for pid, quantity in needed.items()):
+                return None
+            for pid, quantity in needed.items():
+                states[pid]['holds'][hold_id] = {'quantity': quantity,
+                                                 'expires_at': now + self.hold_seconds}
+        return {'id': hold_id, 'lines': lines}
+
+    def release(self, hold):
+        """Trả lại hàng đang giữ (khi giỏ hàng thay đổi hoặc hủy thanh toán)"""
+        with self._locked([pid for pid, _ in hold['lines']]) as (states, _):
+            for state in states.values():
+                state['holds'].pop(hold['id'], None)
+
+    def commit(self, hold):
+        """Chuyển hold thành lượng hàng đã bán, tất cả hoặc không dòng nào.
+
+        Nếu hold đã hết hạn thì vẫn commit được khi kho còn đủ hàng.
+        """
+        with self._stock_locked([pid for pid, _ in hold['lines']]) as (states, _):
+            needed = {}
+            for pid, quantity in hold['lines']:
+                needed[pid] = needed.get(pid, 0) + quantity
+            for pid, quantity in needed.items():
+                state = states[pid]
+                if hold['id'] not in state['holds'] and self._available(state) < quantity:
+                    return False
+            for pid, quantity in needed.items():
+                states[pid]['holds'].pop(hold['id'], None)
+                states[pid]['stock'] -= quantity
+        return True
+
+    def restock(self, lines):
+        """Cộng lại hàng vào kho (ví dụ khi ghi đơn hàng thất bại sau khi đã commit)"""
+        with self._stock_locked([pid for pid, _ in lines]) as (states, _):
+            for pid, quantity in lines:
+                states[int(pid)]['stock'] += quantity
+
+    def set_stock(self, product_id, available, fields=None):
+        """Đặt số lượng còn bán được (admin sửa sản phẩm), giữ nguyên các hold.
+
+        Kho = `available` + hàng đang giữ, để hàng đang giữ không bị trừ thêm lần
+        nữa khi hold được commit. Dòng của sản phẩm trong products.json (số lượng
+        cùng các trường `fields` admin sửa) được ghi một lần trong cùng khóa.
+        """
+        with self._stock_locked([product_id], fields) as (states, _):
+            state = states[int(product_id)]
+            state['stock'] = available + sum(hold['quantity'] for hold in state['holds'].values())
+
+    def remove(self, product_id):
+        with file_lock(self._path(product_id) + '.lock'):
+            try:
+                os.remove(self._path(product_id))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,233 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from jinja2 import Template
+from config import Config
+from utils.storage import io_counters
+
+try:
+    from pyinstrument import Profiler as Pyinstrument
+except ImportError:  # không cài pyinstrument thì dùng cProfile có sẵn
+    Pyinstrument = None
+
+# Request đang được đo trong ngữ cảnh (luồng) hiện tại
+_current = ContextVar('metrics_request', default=None)
+# Bộ đếm I/O toàn tiến trình (storage.io_counters) được xuất kèm ở /metrics
+IO_COUNTERS = {
+    'files_read': 'Số lần đọc file JSON',
+    'bytes_read': 'Số byte JSON đã đọc',
+    'files_written': 'Số lần ghi file JSON',
+    'bytes_written': 'Số byte JSON đã ghi',
+}
+
+
+class RequestTrace:
+    """Số liệu của một request: tổng thời gian/số lần/byte/dòng của từng loại span"""
+
+    def __init__(self, profiler=None):
+        self.started = time.perf_counter()
+        self.spans = {}     # tên span -> [số lần, giây, byte, dòng]
+        self.profiler = profiler
+        self._tokens = None
+
+    def add(self, name, seconds, size, rows):
+        total = self.spans.setdefault(name, [0, 0.0, 0, 0])
+        total[0] += 1
+        total[1] += seconds
+        total[2] += size
+        total[3] += rows
+
+    def server_timing(self, elapsed):
+        """Giá trị header Server-Timing (xem trong tab Network của DevTools)"""
+        parts = []
+        for name, (count, seconds, size, rows) in self.spans.items():
+            desc = [f'{count}x']
+            if rows:
+                desc.append(f'{rows} rows')
+            if size:
+                desc.append(f'{size / 1024:.1f} KB')
+            parts.append(f'{name};dur={seconds * 1000:.2f};desc="{", ".join(desc)}"')
+        parts.append(f'total;dur={elapsed * 1000:.2f}')
+        return ', '.join(parts)
+
+
+class Metrics:
+    """Đo thời gian các đoạn nóng của từng request (bật bằng Config.METRICS_ENABLED).
+
+    span('db_read'), span('auth')... cộng thời gian, số byte JSON đọc/ghi và số
+    dòng vào request hiện tại (trả về qua header Server-Timing) và vào các
+    histogram của tiến trình (xuất dạng Prometheus ở /metrics). Ngoài request
+    hoặc khi tắt thì span() không làm gì. Các span có thể lồng nhau (lưới sản
+    phẩm render bên trong trang) nên tổng các span có thể lớn hơn 'total'.
+    Một phần PROFILE_SAMPLE_RATE request được chạy dưới profiler; request nào
+    chậm hơn PROFILE_SLOW_MS thì profile được ghi vào PROFILE_DIR.
+    Số liệu là của từng tiến trình (mỗi worker gunicorn có /metrics riêng).
+    """
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}   # (tên, nhãn) -> [đếm theo từng bucket..., tổng, số lần]
+        self._counters = {}     # (tên, nhãn) -> giá trị
+        self._help = {}         # tên -> (kiểu, mô tả)
+
+    @property
+    def enabled(self):
+        return Config.METRICS_ENABLED
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def start_request(self):
+        """Bắt đầu đo request hiện tại; trả về None nếu đang tắt"""
+        if not self.enabled:
+            return None
+        profiler = None
+        if Config.PROFILE_SAMPLE_RATE and random.random() < Config.PROFILE_SAMPLE_RATE:
+            profiler = Pyinstrument() if Pyinstrument else cProfile.Profile()
+            if Pyinstrument:
+                profiler.start()
+            else:
+                profiler.enable()
+        trace = RequestTrace(profiler)
+        trace._tokens = (_current.set(trace), io_counters.begin_local())
+        return trace
+
+    def finish_request(self, trace, endpoint, method, status):
+        """Kết thúc đo: ghi số liệu, lưu profile nếu chậm; trả về giá trị header Server-Timing"""
+        elapsed = time.perf_counter() - trace.started
+        current_token, io_token = trace._tokens
+        io_counters.end_local(io_token)
+        _current.reset(current_token)
+        if trace.profiler is not None:
+            self._finish_profile(trace.profiler, endpoint, elapsed)
+        self.inc('techstore_requests_total', 'Số request đã xử lý',
+                 endpoint=endpoint, method=method, status=str(status))
+        self.observe('techstore_request_seconds', 'Thời gian xử lý request', elapsed, endpoint=endpoint)
+        return trace.server_timing(elapsed)
+
+    def _finish_profile(self, profiler, endpoint, elapsed):
+        if Pyinstrument:
+            profiler.stop()
+        else:
+            profiler.disable()
+        if elapsed * 1000 < Config.PROFILE_SLOW_MS:
+            return
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        name = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{endpoint}-{elapsed * 1000:.0f}ms'
+        if Pyinstrument:
+            with open(os.path.join(Config.PROFILE_DIR, name + '.html'), 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        else:
+            # Xem bằng: python -m pstats <file> hoặc snakeviz <file>
+            profiler.dump_stats(os.path.join(Config.PROFILE_DIR, name + '.prof'))
+        self.inc('techstore_profiles_written_total', 'Số profile request chậm đã ghi', endpoint=endpoint)
+
+    @contextmanager
+    def span(self, name, detail=''):
+        """Đo khối `with` như một span `name` của request hiện tại.
+
+        Khối có thể gán info['rows'] (số dòng đã xử lý); số byte JSON đọc/ghi
+        được lấy từ io_counters của chính request này.
+        """
+        trace = _current.get()
+        if trace is None:
+            yield {}
+            return
+        info = {}
+        io_before = io_counters.local_snapshot()
+        started = time.perf_counter()
+        try:
+            yield info
+        finally:
+            elapsed = time.perf_counter() - started
+            io_after = io_counters.local_snapshot()
+            size = (io_after['bytes_read'] - io_before['bytes_read']
+                    + io_after['bytes_written'] - io_before['bytes_written'])
+            rows = info.get('rows', 0)
+            trace.add(name, elapsed, size, rows)
+            self.observe('techstore_span_seconds', 'Thời gian của các đoạn nóng trong request',
+                         elapsed, span=name, detail=detail)
+            if size:
+                self.inc('techstore_span_bytes_total', 'Số byte JSON đọc/ghi trong span', size,
+                         span=name, detail=detail)
+            if rows:
+                self.inc('techstore_span_rows_total', 'Số dòng dữ liệu xử lý trong span', rows,
+                         span=name, detail=detail)
+
+    def inc(self, name, help_text, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ('counter', help_text))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, help_text, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ('histogram', help_text))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render_prometheus(self):
+        """Toàn bộ số liệu của tiến trình theo định dạng text của Prometheus"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+            help_texts = dict(self._help)
+        lines = []
+        for field, value in io_counters.snapshot().items():
+            name = f'techstore_json_{field}_total'
+            lines += [f'# HELP {name} {IO_COUNTERS[field]}', f'# TYPE {name} counter',
+                      f'{name} {value}']
+        seen = set()
+
+        def header(name):
+            if name not in seen:
+                seen.add(name)
+                kind, help_text = help_texts[name]
+                lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'])
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), values in histograms:
+            header(name)
+            for bound, count in zip(self.BUCKETS, values):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {count}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {values[-2]:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {values[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+metrics = Metrics()
+
+
+class TimedTemplate(Template):
+    """Template Jinja đo thời gian render (gán vào app.jinja_env.template_class)"""
+
+    def render(self, *args, **kwargs):
+        with metrics.span('render', self.name or ''):
+            return super().render(*args, **kwargs)
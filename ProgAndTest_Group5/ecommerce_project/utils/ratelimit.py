@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from utils.storage import file_lock, write_json_atomic
+
+
+class SlidingWindowLimiter:
+    """Giới hạn số lần trong một cửa sổ thời gian trượt, theo từng khóa (IP, email...).
+
+    Mỗi khóa giữ các mốc thời gian trong `window` giây gần nhất; khóa đã đủ
+    `limit` lần thì bị chặn cho tới khi mốc cũ nhất trôi ra khỏi cửa sổ. Dữ liệu
+    nằm trong bộ nhớ của tiến trình nên mỗi worker đếm riêng (xem SharedWindowLimiter).
+    Tối đa `max_keys` khóa; khi đầy thì bỏ các khóa có lần ghi nhận cuối cũ nhất
+    (khóa đã hết hạn luôn nằm đầu hàng) để nhận khóa mới. Một khóa chưa có lần nào
+    không bao giờ bị chặn, nên kẻ tấn công không thể làm đầy bộ đếm bằng thật
+    nhiều email/IP rác để khóa người dùng thật ở lần đăng nhập đầu tiên.
+    """
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()   # khóa -> mốc thời gian, xếp theo lần ghi nhận cuối
+        self._lock = threading.Lock()
+
+    def _now(self):
+        return time.monotonic()
+
+    def _trim(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        return hits
+
+    def _retry_after(self, hits, now):
+        return max(int(hits[0] + self.window - now) + 1, 1)
+
+    def attempt(self, key, record=True):
+        """Kiểm tra và (nếu còn lượt, record=True) ghi nhận một lần cho khóa trong cùng một bước.
+
+        Trả về 0 nếu được phép, ngược lại số giây tới khi khóa được thử lại.
+        """
+        with self._lock:
+            now = self._now()
+            hits = self._hits.get(key)
+            if hits is not None and self._trim(hits, now) and len(hits) >= self.limit:
+                return self._retry_after(hits, now)
+            if not record:
+                return 0
+            if hits is None:
+                while len(self._hits) >= self.max_keys:
+                    self._hits.popitem(last=False)
+                hits = self._hits[key] = deque()
+            else:
+                self._hits.move_to_end(key)
+            hits.append(now)
+            return 0
+
+    def hit(self, key):
+        """Ghi nhận một lần cho khóa, trả về False nếu khóa đã vượt giới hạn"""
+        return self.attempt(key) == 0
+
+    def is_limited(self, key):
+        """True nếu khóa đã đủ `limit` lần trong cửa sổ (không ghi nhận thêm)"""
+        return self.attempt(key, record=False) > 0
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+class SharedWindowLimiter(SlidingWindowLimiter):
+    """SlidingWindowLimiter dùng chung giữa các tiến trình (nhiều worker gunicorn).
+
+    Mỗi khóa là một file nhỏ <directory>/<2 ký tự đầu sha1>/<sha1>.json chứa các
+    mốc thời gian (giờ hệ thống, tối đa `limit` mốc) của riêng nó; mỗi lần
+    attempt() chỉ khóa một trong SHARDS thư mục con rồi đọc/ghi đúng một file,
+    nên chi phí không phụ thuộc số khóa khác và các lần đăng nhập khác thư mục
+    con chạy song song. N worker vẫn chỉ cho phép tổng cộng `limit` lần. Mỗi thư
+    mục con giữ tối đa max_keys / SHARDS khóa; mtime của file là lần ghi nhận
+    cuối nên khi thư mục con đầy thì file hết hạn được dọn trước, rồi tới các
+    file cũ nhất. Khóa mới không bao giờ bị từ chối chỉ vì thư mục con đầy.
+    """
+
+    SHARDS = 256
+
+    def __init__(self, limit, window, directory, max_keys=100000):
+        super().__init__(limit, window, max_keys)
+        self.directory = directory
+        self.shard_cap = max(-(-max_keys // self.SHARDS), 1)
+
+    def _now(self):
+        return time.time()
+
+    def _paths(self, key):
+        digest = hashlib.sha1(str(key).encode('utf-8')).hexdigest()
+        shard = os.path.join(self.directory, digest[:2])
+        return shard, os.path.join(shard, digest + '.json')
+
+    def _read(self, path, now):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return self._trim(deque(stored), now)
+
+    def _make_room(self, shard, now):
+        """Dọn thư mục con đã đầy: bỏ file hết hạn, nếu vẫn đầy thì bỏ các file cũ nhất"""
+        names = [name for name in os.listdir(shard) if name.endswith('.json') and not name.startswith('.')]
+        if len(names) < self.shard_cap:
+            return
+        files = []
+        for name in names:
+            path = os.path.join(shard, name)
+            try:
+                mtime = os.stat(path).st_mtime
+                if mtime <= now - self.window:
+                    os.remove(path)
+                else:
+                    files.append((mtime, path))
+            except FileNotFoundError:
+                pass
+        if len(files) < self.shard_cap:
+            return
+        # Bỏ thêm ~10% để các khóa mới kế tiếp không phải quét lại cả thư mục con
+        files.sort()
+        for _, path in files[:len(files) - self.shard_cap + 1 + self.shard_cap // 10]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def attempt(self, key, record=True):
+        shard, path = self._paths(key)
+        os.makedirs(shard, exist_ok=True)
+        with file_lock(shard + '.lock'):
+            now = self._now()
+            hits = self._read(path, now)
+            if hits and len(hits) >= self.limit:
+                return self._retry_after(hits, now)
+            if not record:
+                return 0
+            if hits is None:
+                self._make_room(shard, now)
+                hits = deque()
+            hits.append(now)
+            write_json_atomic(path, list(hits), indent=None)
+            return 0
+
+    def reset(self, key):
+        shard, path = self._paths(key)
+        if not os.path.exists(path):
+            return
+        with file_lock(shard + '.lock'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,164 @@
+import bisect
+import math
+import re
+import unicodedata
+from utils.db import DerivedIndex
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Trọng số của từng trường khi chấm điểm: khớp ở tên quan trọng hơn ở mô tả
+FIELD_WEIGHTS = {'name': 3.0, 'description': 1.0}
+# Khớp theo tiền tố ('ipho' -> 'iphone') được tính điểm thấp hơn khớp nguyên từ
+PREFIX_FACTOR = 0.5
+
+
+def fold(text):
+    """Bỏ dấu tiếng Việt và chuyển về chữ thường: 'Điện thoại' -> 'dien thoai'"""
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+class ProductSearchIndex(DerivedIndex):
+    """Chỉ mục đảo (inverted index) trên tên và mô tả sản phẩm.
+
+    Chỉ mục được dựng một lần từ products.json, sau đó cập nhật dần qua
+    db.subscribe() mỗi khi route admin thêm/sửa/xóa sản phẩm. Nếu bảng bị tiến
+    trình khác thay đổi (version khác) thì lần tìm kiếm sau sẽ dựng lại.
+    """
+
+    def __init__(self, db, filename='products.json'):
+        self._postings = {}     # token -> {product_id: trọng số}
+        self._doc_tokens = {}   # product_id -> các token của sản phẩm (để gỡ khi sửa/xóa)
+        self._vocab = []        # các token đã sắp xếp, dùng bisect để tìm theo tiền tố
+        super().__init__(db, filename)
+
+    def _add(self, product):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field)):
+                weights[token] = weights.get(token, 0.0) + weight
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if self._vocab is not None:
+                    bisect.insort(self._vocab, token)
+            postings[product['id']] = weight
+        self._doc_tokens[product['id']] = set(weights)
+
+    def _remove(self, product_id):
+        for token in self._doc_tokens.pop(product_id, ()):
+            postings = self._postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+
+    def _reset(self):
+        self._postings, self._doc_tokens = {}, {}
+        self._vocab = None  # sắp xếp một lần ở cuối thay vì insort từng token
+
+    def _finish(self):
+        self._vocab = sorted(self._postings)
+
+    def _expand(self, token):
+        # Các token trong từ điển bắt đầu bằng `token` (kể cả chính nó)
+        start = bisect.bisect_left(self._vocab, token)
+        end = bisect.bisect_left(self._vocab, token + '\uffff')
+        return self._vocab[start:end]
+
+    def search(self, query, limit=None):
+        """Trả về id sản phẩm khớp với mọi từ trong `query`, sắp theo độ liên quan giảm dần"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_fresh()
+            total = len(self._doc_tokens) or 1
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token in self._expand(term):
+                    postings = self._postings[token]
+                    idf = math.log(1 + total / len(postings))
+                    factor = 1.0 if token == term else PREFIX_FACTOR
+                    for product_id, weight in postings.items():
+                        term_scores[product_id] = term_scores.get(product_id, 0.0) + weight * idf * factor
+                if scores is None:
+                    scores = term_scores
+                else:
+                    # Sản phẩm phải khớp tất cả các từ trong truy vấn
+                    scores = {pid: score + term_scores[pid] for pid, score in scores.items() if pid in term_scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+        return ranked[:limit] if limit else ranked
+
+
+class SuggestIndex(DerivedIndex):
+    """Gợi ý tên sản phẩm khi đang gõ (typeahead) bằng mảng đã sắp xếp + bisect.
+
+    Mỗi sản phẩm có một khóa cho cả tên và một khóa cho mỗi vị trí bắt đầu một
+    từ trong tên ('iphone 15 pro' -> 'iphone 15 pro', '15 pro', 'pro'), nên gõ
+    '15' hay 'pro' cũng ra 'iPhone 15 Pro'. Tìm theo tiền tố chỉ tốn
+    O(log n + số kết quả), không phải duyệt toàn bộ sản phẩm.
+    """
+
+    def __init__(self, db, filename='products.json'):
+        self._names = {}    # product_id -> tên hiển thị
+        self._keys = {}     # product_id -> các khóa (để gỡ khi sửa/xóa)
+        self._entries = []  # (rank, khóa, product_id) đã sắp xếp; rank 0 = khớp từ đầu tên
+        super().__init__(db, filename)
+
+    def _entries_for(self, product):
+        words = tokenize(product.get('name'))
+        return [(0 if i == 0 else 1, ' '.join(words[i:]), product['id']) for i in range(len(words))]
+
+    def _reset(self):
+        self._names, self._keys = {}, {}
+        self._entries = None  # sắp xếp một lần ở cuối
+
+    def _add(self, product):
+        entries = self._entries_for(product)
+        self._names[product['id']] = product.get('name') or ''
+        self._keys[product['id']] = entries
+        if self._entries is not None:
+            for entry in entries:
+                bisect.insort(self._entries, entry)
+
+    def _remove(self, product_id):
+        self._names.pop(product_id, None)
+        for entry in self._keys.pop(product_id, ()):
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def _finish(self):
+        self._entries = sorted(entry for entries in self._keys.values() for entry in entries)
+
+    def suggest(self, prefix, limit=8):
+        """Trả về tối đa `limit` sản phẩm [{'id', 'name'}] có tên (hoặc một từ trong tên) bắt đầu bằng `prefix`"""
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            self._ensure_fresh()
+            # Khớp từ đầu tên trước, sau đó mới tới khớp ở giữa tên
+            for rank in (0, 1):
+                i = bisect.bisect_left(self._entries, (rank, prefix))
+                end = bisect.bisect_left(self._entries, (rank, prefix + '\uffff'))
+                while i < end and len(results) < limit:
+                    product_id = self._entries[i][2]
+                    if product_id not in seen:
+                        seen.add(product_id)
+                        results.append({'id': product_id, 'name': self._names[product_id]})
+                    i += 1
+        return results
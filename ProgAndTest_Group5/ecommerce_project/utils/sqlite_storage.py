@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from utils.storage import diff_rows, file_lock, has_ids
+
+# Cột của từng bảng (ngoài 'id'). Trường nào không có trong schema được giữ
+# trong cột 'extra' dạng JSON nên bảng mới hoặc trường mới vẫn lưu được.
+SCHEMAS = {
+    'users': [('name', 'TEXT'), ('email', 'TEXT'), ('password_hash', 'TEXT'), ('role', 'TEXT')],
+    'categories': [('name', 'TEXT'), ('parent_id', 'INTEGER')],
+    'products': [('name', 'TEXT'), ('price', 'INTEGER'), ('stock', 'INTEGER'),
+                 ('category_id', 'INTEGER'), ('description', 'TEXT'), ('image', 'TEXT')],
+    'carts': [('user_id', 'INTEGER'), ('active', 'BOOLEAN')],
+    'cart_items': [('cart_id', 'INTEGER'), ('product_id', 'INTEGER'), ('quantity', 'INTEGER')],
+    'orders': [('user_id', 'INTEGER'), ('total', 'INTEGER'), ('status', 'TEXT'), ('created_at', 'TEXT')],
+    'order_items': [('order_id', 'INTEGER'), ('product_id', 'INTEGER'),
+                    ('quantity', 'INTEGER'), ('price', 'INTEGER')],
+}
+
+# Chỉ mục trên các cột khóa ngoại và cột hay dùng để tìm kiếm
+INDEXES = {
+    'users': ['email'],
+    'categories': ['parent_id'],
+    'products': ['category_id'],
+    'carts': ['user_id'],
+    'cart_items': ['cart_id', 'product_id'],
+    'orders': ['user_id'],
+    'order_items': ['order_id', 'product_id'],
+}
+
+
+def table_name(filename):
+    return os.path.splitext(filename)[0]
+
+
+class SqliteStorage:
+    """Backend SQLite (chế độ WAL) có cùng giao diện với JsonStorage/WalStorage.
+
+    Mỗi file JSON tương ứng một bảng SQLite. Bảng _meta giữ số phiên bản của
+    từng bảng (dùng làm chữ ký cho cache của SimpleDB) và bộ đếm id.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Mỗi luồng (và mỗi tiến trình sau fork) dùng một kết nối riêng
+        self._local = threading.local()
+        self._created = set()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS _meta ('
+                         'name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, last_id INTEGER)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE giữ khóa ghi ngay từ đầu; người đọc vẫn đọc song song nhờ WAL
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _columns(self, table):
+        return [name for name, _ in SCHEMAS.get(table, [])]
+
+    def _ensure_table(self, conn, table):
+        if table in self._created:
+            return
+        columns = ''.join(f', "{name}" {kind}' for name, kind in SCHEMAS.get(table, []))
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY{columns}, extra TEXT)')
+        for column in INDEXES.get(table, []):
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+        conn.execute('INSERT OR IGNORE INTO _meta (name) VALUES (?)', (table,))
+        self._created.add(table)
+
+    def _to_params(self, table, row):
+        columns = self._columns(table)
+        extra = {key: value for key, value in row.items() if key != 'id' and key not in columns}
+        return ([row['id']] + [row.get(name) for name in columns]
+                + [json.dumps(extra, ensure_ascii=False) if extra else None])
+
+    def _from_record(self, table, record):
+        row = {'id': record['id']}
+        for name, kind in SCHEMAS.get(table, []):
+            value = record[name]
+            row[name] = bool(value) if kind == 'BOOLEAN' and value is not None else value
+        if record['extra']:
+            row.update(json.loads(record['extra']))
+        return row
+
+    def signature(self, filename):
+        record = self._connect().execute(
+            'SELECT version FROM _meta WHERE name = ?', (table_name(filename),)).fetchone()
+        return None if record is None else record['version']
+
+    def read(self, filename):
+        table = table_name(filename)
+        conn = self._connect()
+        # Đọc phiên bản và dữ liệu trong cùng một snapshot
+        conn.execute('BEGIN')
+        try:
+            record = conn.execute('SELECT version FROM _meta WHERE name = ?', (table,)).fetchone()
+            if record is None:
+                return None, []
+            rows = conn.execute(f'SELECT * FROM "{table}" ORDER BY id').fetchall()
+            return record['version'], [self._from_record(table, r) for r in rows]
+        finally:
+            conn.execute('COMMIT')
+
+    def _apply(self, conn, table, records):
+        columns = self._columns(table)
+        placeholders = ', '.join(['?'] * (len(columns) + 2))
+        quoted = ', '.join(['id'] + [f'"{name}"' for name in columns] + ['extra'])
+        upserts, deletes = [], []
+        for record in records:
+            if record['op'] == 'delete':
+                deletes.append((record['id'],))
+            else:
+                upserts.append(self._to_params(table, record['row']))
+        if upserts:
+            conn.executemany(f'INSERT OR REPLACE INTO "{table}" ({quoted}) VALUES ({placeholders})', upserts)
+        if deletes:
+            conn.executemany(f'DELETE FROM "{table}" WHERE id = ?', deletes)
+
+    def lock(self, filename):
+        return file_lock(os.path.join(os.path.dirname(self.db_path) or '.', filename + '.lock'))
+
+    def recover(self):
+        # SQLite tự khôi phục giao dịch dở dang từ WAL của nó
+        pass
+
+    def close(self):
+        """Đóng kết nối của luồng hiện tại (gọi trong tiến trình master trước khi fork worker).
+
+        Kết nối SQLite không được mang qua fork: tiến trình con dùng hoặc đóng kết
+        nối thừa hưởng có thể làm hỏng khóa/WAL của các tiến trình khác.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def commit(self, changes):
+        """Ghi mọi bảng trong cùng một giao dịch SQLite, trả về phiên bản mới của từng bảng"""
+        for filename, data, _, records in changes:
+            if records is None and not has_ids(data):
+                raise ValueError(f'Mọi dòng của {filename} phải có khóa "id" để lưu vào SQLite')
+        versions = {}
+        with self._transaction() as conn:
+            for filename, data, previous, records in changes:
+                table = table_name(filename)
+                self._ensure_table(conn, table)
+                version = conn.execute('SELECT version FROM _meta WHERE name = ?', (table,)).fetchone()['version']
+                if records is None:
+                    if previous is None or previous[0] != version:
+                        # Cache của người gọi đã cũ: so sánh với dữ liệu hiện tại trong bảng
+                        rows = conn.execute(f'SELECT * FROM "{table}"').fetchall()
+                        previous = (version, [self._from_record(table, r) for r in rows])
+                    records = diff_rows(previous[1], data)
+                # Ghi theo dòng thì chỉ các dòng trong `records` được upsert/xóa
+                self._apply(conn, table, records)
+                conn.execute('UPDATE _meta SET version = version + 1 WHERE name = ?', (table,))
+                versions[filename] = version + 1
+        return versions
+
+    def allocate_ids(self, filename, count, seed):
+        """Tăng bộ đếm id trong _meta thêm `count`, trả về id đầu tiên"""
+        table = table_name(filename)
+        with self._transaction() as conn:
+            self._ensure_table(conn, table)
+            current = conn.execute('SELECT last_id FROM _meta WHERE name = ?', (table,)).fetchone()['last_id']
+            if current is None:
+                current = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"').fetchone()[0]
+            conn.execute('UPDATE _meta SET last_id = ? WHERE name = ?', (current + count, table))
+        return current + 1
+
+    @contextmanager
+    def bulk_writer(self, filename):
+        """Thay toàn bộ bảng bằng các lô dòng được ghi dần qua writer.write(rows).
+
+        Mỗi lô là một giao dịch riêng (để có thể ghi song song nhiều bảng, ví dụ
+        orders và order_items); phiên bản bảng chỉ tăng khi ghi xong.
+        """
+        table = table_name(filename)
+        with self._transaction() as conn:
+            self._ensure_table(conn, table)
+            conn.execute(f'DELETE FROM "{table}"')
+        writer = _SqliteBulkWriter(self, table)
+        yield writer
+        with self._transaction() as conn:
+            conn.execute('UPDATE _meta SET version = version + 1, last_id = ? WHERE name = ?',
+                         (writer.last_id, table))
+
+    def import_table(self, filename, rows, last_id=None):
+        """Thay toàn bộ nội dung bảng bằng `rows` (dùng cho công cụ chuyển dữ liệu)"""
+        table = table_name(filename)
+        with self._transaction() as conn:
+            self._ensure_table(conn, table)
+            conn.execute(f'DELETE FROM "{table}"')
+            self._apply(conn, table, diff_rows([], rows))
+            if last_id is None:
+                last_id = max((row['id'] for row in rows), default=0)
+            conn.execute('UPDATE _meta SET version = version + 1, last_id = ? WHERE name = ?',
+                         (last_id, table))
+
+
+class _SqliteBulkWriter:
+    def __init__(self, storage, table):
+        self.storage = storage
+        self.table = table
+        self.count = 0
+        self.last_id = 0
+        columns = storage._columns(table)
+        placeholders = ', '.join(['?'] * (len(columns) + 2))
+        quoted = ', '.join(['id'] + [f'"{name}"' for name in columns] + ['extra'])
+        self._sql = f'INSERT OR REPLACE INTO "{table}" ({quoted}) VALUES ({placeholders})'
+
+    def write(self, rows):
+        params = [self.storage._to_params(self.table, row) for row in rows]
+        if not params:
+            return
+        with self.storage._transaction() as conn:
+            conn.executemany(self._sql, params)
+        self.count += len(params)
+        self.last_id = max(self.last_id, max(p[0] for p in params))
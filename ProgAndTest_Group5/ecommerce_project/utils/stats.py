@@ -0,0 +1,54 @@
+STATS_FILE = 'stats.json'
+STATS_ID = 1
+
+# Các chỉ số trên bảng điều khiển admin
+FIELDS = ('total_orders', 'total_products', 'total_users', 'total_revenue', 'pending_orders')
+
+
+def compute_stats(orders, products, users):
+    """Tính các chỉ số bằng cách duyệt toàn bộ bảng (dùng khi dựng lại)"""
+    return {
+        'id': STATS_ID,
+        'total_orders': len(orders),
+        'total_products': len(products),
+        'total_users': sum(1 for u in users if u['role'] == 'user'),
+        'total_revenue': sum(order['total'] for order in orders),
+        'pending_orders': sum(1 for o in orders if o['status'] == 'pending'),
+    }
+
+
+class StatsStore:
+    """Các chỉ số của dashboard lưu sẵn trong stats.json (một dòng duy nhất, id = 1).
+
+    Các route ghi đơn hàng, người dùng, sản phẩm cộng/trừ phần thay đổi vào
+    dòng này trong cùng giao dịch với bảng dữ liệu (nhớ thêm STATS_FILE vào
+    db.transaction()), nên dashboard chỉ cần đọc một dòng. rebuild() tính lại
+    từ các bảng gốc khi cần đối chiếu.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def apply(self, tx, **deltas):
+        """Cộng `deltas` (ví dụ total_orders=1) vào chỉ số trong giao dịch `tx`"""
+        rows = tx.load(STATS_FILE)
+        if not rows:
+            # Chưa có chỉ số: read() sẽ dựng lại từ các bảng gốc (đã gồm thay đổi này)
+            return
+        stats = rows[0]
+        for field, delta in deltas.items():
+            stats[field] = stats.get(field, 0) + delta
+        tx.save(STATS_FILE, rows)
+
+    def read(self):
+        stats = self.db.get_by_id(STATS_FILE, STATS_ID)
+        if stats is None:
+            stats = self.rebuild()
+        return stats
+
+    def rebuild(self):
+        """Tính lại chỉ số từ orders/products/users và ghi đè stats.json"""
+        with self.db.transaction(STATS_FILE, 'orders.json', 'products.json', 'users.json') as tx:
+            stats = compute_stats(tx.load('orders.json'), tx.load('products.json'), tx.load('users.json'))
+            tx.save(STATS_FILE, [stats])
+        return stats
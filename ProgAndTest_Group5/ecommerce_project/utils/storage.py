@@ -0,0 +1,467 @@
+import json
+import os
+import tempfile
+import uuid
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path):
+    """Khóa độc quyền giữa các tiến trình dựa trên một file .lock"""
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class IOCounters:
+    """Số byte JSON mà tiến trình đã đọc/ghi xuống đĩa (bảng, log WAL, file tồn kho).
+
+    Chỉ là vài phép cộng nên luôn bật; benchmarks/ lấy hiệu của snapshot() trước
+    và sau mỗi request để biết một route đọc/ghi bao nhiêu byte. Khi có nhiều
+    request song song, begin_local() đếm thêm riêng cho ngữ cảnh hiện tại (một
+    request) để utils/metrics.py biết chính request đó đọc/ghi bao nhiêu.
+    """
+
+    FIELDS = ('files_read', 'bytes_read', 'files_written', 'bytes_written')
+
+    def __init__(self):
+        self.reset()
+        self._local = ContextVar('io_counters_local', default=None)
+
+    def reset(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def read(self, size):
+        self.files_read += 1
+        self.bytes_read += size
+        local = self._local.get()
+        if local is not None:
+            local['files_read'] += 1
+            local['bytes_read'] += size
+
+    def written(self, size):
+        self.files_written += 1
+        self.bytes_written += size
+        local = self._local.get()
+        if local is not None:
+            local['files_written'] += 1
+            local['bytes_written'] += size
+
+    def snapshot(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def begin_local(self):
+        """Bắt đầu đếm riêng cho ngữ cảnh hiện tại; trả về token cho end_local()"""
+        return self._local.set(dict.fromkeys(self.FIELDS, 0))
+
+    def end_local(self, token):
+        self._local.reset(token)
+
+    def local_snapshot(self):
+        """Bộ đếm riêng của ngữ cảnh hiện tại, hoặc None nếu chưa begin_local()"""
+        local = self._local.get()
+        return dict(local) if local is not None else None
+
+
+io_counters = IOCounters()
+
+
+def _stat_signature(stat_result):
+    # Mỗi lần ghi đều thay file mới nên inode đổi, kèm mtime và size để chắc chắn
+    return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def write_json_temp(filepath, data, indent=2):
+    """Ghi JSON ra một file tạm cạnh `filepath` và trả về đường dẫn file tạm"""
+    directory, name = os.path.split(filepath)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix='.' + name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            io_counters.written(f.tell())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def write_json_atomic(filepath, data, indent=2):
+    """Ghi JSON ra file tạm rồi đổi tên để người đọc không bao giờ thấy file ghi dở"""
+    tmp_path = write_json_temp(filepath, data, indent)
+    try:
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class BulkWriter:
+    """Ghi một mảng JSON theo từng lô vào file đã mở, không giữ cả bảng trong bộ nhớ"""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+        self.last_id = 0
+        self.size = 0
+
+    def write(self, rows):
+        parts = []
+        for row in rows:
+            parts.append(('[\n' if self.count == 0 else ',\n') + json.dumps(row, ensure_ascii=False))
+            self.count += 1
+            self.last_id = max(self.last_id, row['id'])
+        chunk = ''.join(parts)
+        self.f.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        self.f.write('\n]' if self.count else '[]')
+
+
+def has_ids(data):
+    return all(isinstance(row, dict) and 'id' in row for row in data)
+
+
+def diff_rows(previous, data):
+    """Sinh các bản ghi insert/update/delete (theo 'id') để biến `previous` thành `data`"""
+    old_rows = {row['id']: row for row in previous}
+    new_ids = set()
+    for row in data:
+        new_ids.add(row['id'])
+        old = old_rows.get(row['id'])
+        if old is None:
+            yield {'op': 'insert', 'row': row}
+        elif old != row:
+            yield {'op': 'update', 'row': row}
+    for row_id in old_rows:
+        if row_id not in new_ids:
+            yield {'op': 'delete', 'id': row_id}
+
+
+def apply_records(rows, records):
+    """Áp các bản ghi của diff_rows() lên `rows`, giữ nguyên thứ tự các dòng còn lại.
+
+    Không sửa `rows`. Nếu chỉ có insert (id mới cấp từ next_id) thì chỉ nối thêm
+    vào bản sao nông của danh sách, không phải dựng dict theo id của cả bảng.
+    """
+    records = list(records)
+    if all(record['op'] == 'insert' for record in records):
+        return list(rows) + [record['row'] for record in records]
+    result = {row['id']: row for row in rows}
+    for record in records:
+        if record['op'] == 'delete':
+            result.pop(record['id'], None)
+        else:
+            result[record['row']['id']] = record['row']
+    return list(result.values())
+
+
+class JsonStorage:
+    """Mỗi bảng là một file JSON, mỗi lần ghi thay toàn bộ file.
+
+    Người gọi (SimpleDB) phải giữ lock() của các bảng trước khi gọi commit().
+    Giao dịch nhiều bảng ghi mọi bảng ra file tạm, lưu danh sách đổi tên vào
+    một file journal rồi mới đổi tên; nếu tiến trình chết giữa chừng thì
+    recover() hoàn tất nốt các lần đổi tên còn lại.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def lock(self, filename):
+        return file_lock(self.path(filename) + '.lock')
+
+    def signature(self, filename):
+        try:
+            return _stat_signature(os.stat(self.path(filename)))
+        except FileNotFoundError:
+            return None
+
+    def read(self, filename):
+        try:
+            with open(self.path(filename), 'r', encoding='utf-8') as f:
+                stat = os.fstat(f.fileno())
+                io_counters.read(stat.st_size)
+                return _stat_signature(stat), json.load(f)
+        except FileNotFoundError:
+            return None, []
+
+    def commit(self, changes):
+        """Ghi các thay đổi [(filename, data, previous, records)] và trả về chữ ký mới của từng bảng.
+
+        `records` là các bản ghi insert/update/delete đã biết trước (ghi theo dòng,
+        xem SimpleDB.append) hoặc None để backend tự so `data` với `previous`.
+        Backend này luôn ghi lại cả file nên chỉ dùng `data`.
+        """
+        if len(changes) == 1:
+            filename, data, _, _ = changes[0]
+            write_json_atomic(self.path(filename), data)
+        else:
+            entries = []
+            try:
+                for filename, data, _, _ in changes:
+                    entries.append({'filename': filename,
+                                    'tmp': write_json_temp(self.path(filename), data)})
+            except BaseException:
+                for entry in entries:
+                    os.remove(entry['tmp'])
+                raise
+            self._run_journal(entries)
+        return {filename: self.signature(filename) for filename, _, _, _ in changes}
+
+    def _run_journal(self, entries):
+        # Journal được ghi nguyên tử nên hoặc chưa có gì, hoặc có đủ mọi bước cần làm lại
+        journal = os.path.join(self.data_dir, f'.txn-{uuid.uuid4().hex}.journal')
+        write_json_atomic(journal, {'tables': [e['filename'] for e in entries], 'entries': entries})
+        for entry in entries:
+            self._apply_entry(entry)
+        os.remove(journal)
+
+    def _apply_entry(self, entry):
+        try:
+            os.replace(entry['tmp'], self.path(entry['filename']))
+        except FileNotFoundError:
+            # Đã đổi tên ở lần chạy trước
+            pass
+
+    def close(self):
+        # Không giữ file hay kết nối nào mở giữa các lần gọi
+        pass
+
+    def recover(self):
+        """Hoàn tất các giao dịch bị gián đoạn (gọi khi khởi động)"""
+        for name in sorted(os.listdir(self.data_dir)):
+            if not (name.startswith('.txn-') and name.endswith('.journal')):
+                continue
+            path = os.path.join(self.data_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    journal = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            with ExitStack() as stack:
+                for filename in sorted(journal['tables']):
+                    stack.enter_context(self.lock(filename))
+                # Tiến trình ghi journal có thể vẫn đang chạy và đã tự hoàn tất
+                if not os.path.exists(path):
+                    continue
+                for entry in journal['entries']:
+                    self._apply_entry(entry)
+                os.remove(path)
+
+    @contextmanager
+    def bulk_writer(self, filename):
+        """Thay toàn bộ bảng bằng các lô dòng được ghi dần qua writer.write(rows).
+
+        Dữ liệu được ghi ra file tạm và chỉ thay bảng (nguyên tử) khi khối `with`
+        kết thúc không lỗi; bộ đếm id (.seq) được đặt bằng id lớn nhất đã ghi.
+        Người gọi phải giữ lock() của bảng (xem SimpleDB.bulk_load).
+        """
+        path = self.path(filename)
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix='.' + filename, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                writer = BulkWriter(f)
+                yield writer
+                writer.close()
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        io_counters.written(writer.size)
+        self._replace(filename, tmp_path)
+        write_json_atomic(path + '.seq', writer.last_id)
+
+    def _replace(self, filename, tmp_path):
+        os.replace(tmp_path, self.path(filename))
+
+    def allocate_ids(self, filename, count, seed):
+        """Tăng bộ đếm id của bảng (lưu trong <bảng>.seq) thêm `count`, trả về id đầu tiên.
+
+        Bộ đếm được khóa giữa các tiến trình và không bao giờ giảm, kể cả khi
+        dòng bị xóa. Nếu chưa có file .seq thì khởi tạo từ `seed()` (id lớn nhất
+        hiện có) đúng một lần.
+        """
+        seq_path = self.path(filename) + '.seq'
+        with file_lock(seq_path + '.lock'):
+            try:
+                with open(seq_path, 'r', encoding='utf-8') as f:
+                    current = int(json.load(f))
+            except (FileNotFoundError, ValueError):
+                current = seed()
+            write_json_atomic(seq_path, current + count)
+        return current + 1
+
+
+class WalStorage(JsonStorage):
+    """Ghi thêm (append-only) các bản ghi insert/update/delete vào <bảng>.log.
+
+    File JSON của bảng đóng vai trò snapshot. Khi đọc, snapshot được phát lại
+    (replay) cùng log; khi log đủ dài thì gộp (compact) vào snapshot mới.
+    Các bản ghi đều theo khóa 'id' nên phát lại nhiều lần vẫn cho cùng kết quả,
+    nhờ vậy journal của giao dịch nhiều bảng có thể chạy lại an toàn.
+    """
+
+    def __init__(self, data_dir, compact_threshold=500, fsync=False):
+        super().__init__(data_dir)
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        # Số bản ghi đang nằm trong log của từng bảng (để biết khi nào cần compact)
+        self._log_lengths = {}
+
+    def log_path(self, filename):
+        return self.path(filename) + '.log'
+
+    def signature(self, filename):
+        snapshot = super().signature(filename)
+        try:
+            log = _stat_signature(os.stat(self.log_path(filename)))
+        except FileNotFoundError:
+            log = None
+        if snapshot is None and log is None:
+            return None
+        return (snapshot, log)
+
+    def read(self, filename, attempts=3):
+        # Chữ ký được so lại sau khi đã đọc xong snapshot và log: nếu có lần ghi
+        # hoặc compact xen giữa thì đọc lại, để dữ liệu không bị gắn với chữ ký
+        # của một trạng thái khác. Ghi liên tục quá nhiều lần thì trả về chữ ký
+        # lấy trước khi đọc (đã cũ nên lần dùng sau sẽ tự đọc lại).
+        for _ in range(attempts):
+            signature = self.signature(filename)
+            _, snapshot = super().read(filename)
+            rows, records = self._replay(filename, snapshot)
+            if self.signature(filename) == signature:
+                break
+        self._log_lengths[filename] = records
+        return signature, rows
+
+    def _replay(self, filename, snapshot):
+        if not has_ids(snapshot):
+            return snapshot, 0
+        rows = {row['id']: row for row in snapshot}
+        records = 0
+        try:
+            with open(self.log_path(filename), 'r', encoding='utf-8') as f:
+                io_counters.read(os.fstat(f.fileno()).st_size)
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dòng bị ghi dở do tiến trình chết giữa chừng: bỏ qua
+                        continue
+                    if record['op'] == 'delete':
+                        rows.pop(record['id'], None)
+                    else:
+                        rows[record['row']['id']] = record['row']
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return list(rows.values()), records
+
+    def commit(self, changes):
+        entries = []
+        for filename, data, previous, records in changes:
+            if records is None:
+                if not has_ids(data):
+                    # Không có khóa 'id' thì không ghi log được: ghi snapshot đầy đủ
+                    entries.append({'filename': filename, 'snapshot': data})
+                    continue
+                if previous is None or previous[0] != self.signature(filename):
+                    # Cache của người gọi đã cũ: so sánh với trạng thái hiện tại trên đĩa
+                    previous = self.read(filename)
+                records = diff_rows(previous[1], data)
+            # Ghi theo dòng thì các bản ghi được ghi thẳng, không so sánh cả bảng
+            lines = [json.dumps(record, ensure_ascii=False) + '\n' for record in records]
+            if lines:
+                entries.append({'filename': filename, 'lines': lines})
+
+        if len(entries) == 1:
+            self._apply_entry(entries[0])
+        elif entries:
+            self._run_journal(entries)
+
+        for filename, data, _, _ in changes:
+            if self._log_lengths.get(filename, 0) >= self.compact_threshold:
+                self._compact(filename, data)
+        return {filename: self.signature(filename) for filename, _, _, _ in changes}
+
+    def _apply_entry(self, entry):
+        filename = entry['filename']
+        if 'snapshot' in entry:
+            self._compact(filename, entry['snapshot'])
+            return
+        with open(self.log_path(filename), 'a+b') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # Tách dòng ghi dở ra khỏi các bản ghi mới
+                    f.write(b'\n')
+            data = ''.join(entry['lines']).encode('utf-8')
+            f.write(data)
+            io_counters.written(len(data))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._log_lengths[filename] = self._log_lengths.get(filename, 0) + len(entry['lines'])
+
+    def _compact(self, filename, data):
+        # Snapshot mới được ghi trước, log mới xóa sau; nếu chết ở giữa thì
+        # việc phát lại log cũ trên snapshot mới vẫn cho cùng kết quả
+        write_json_atomic(self.path(filename), data)
+        try:
+            os.remove(self.log_path(filename))
+        except FileNotFoundError:
+            pass
+        self._log_lengths[filename] = 0
+
+    def _replace(self, filename, tmp_path):
+        # Snapshot mới đã gồm mọi dòng nên log cũ bị bỏ
+        super()._replace(filename, tmp_path)
+        try:
+            os.remove(self.log_path(filename))
+        except FileNotFoundError:
+            pass
+        self._log_lengths[filename] = 0
+
+    def compact(self, filename):
+        """Gộp log của một bảng vào snapshot ngay lập tức"""
+        with self.lock(filename):
+            _, rows = self.read(filename)
+            self._compact(filename, rows)
+
+
+def create_storage(backend, data_dir):
+    if backend == 'json':
+        return JsonStorage(data_dir)
+    if backend == 'wal':
+        return WalStorage(data_dir,
+                          compact_threshold=Config.WAL_COMPACT_THRESHOLD,
+                          fsync=Config.WAL_FSYNC)
+    if backend == 'sqlite':
+        from utils.sqlite_storage import SqliteStorage
+        return SqliteStorage(Config.SQLITE_PATH)
+    raise ValueError(f'Backend lưu trữ không hợp lệ: {backend}')
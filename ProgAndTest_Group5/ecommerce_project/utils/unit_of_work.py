@@ -0,0 +1,125 @@
+from utils.db import FOREIGN_KEYS
+from utils.storage import apply_records, diff_rows, has_ids
+
+
+class UnitOfWork:
+    """Bộ nhớ tạm cho các bảng trong phạm vi một request (lưu trên flask.g).
+
+    Mỗi bảng được tải (load) tối đa một lần cho mỗi request và dùng chung giữa
+    route, get_cart_count() và template. save() chỉ ghi nhận thay đổi; commit()
+    ghi mọi bảng đã đổi trong một db.transaction() khi request kết thúc.
+
+    Nếu bảng đã bị request khác ghi sau khi được tải, commit() không ghi đè mà
+    áp phần thay đổi của request này (theo từng dòng, khóa 'id') lên dữ liệu
+    mới nhất, nên hai request sửa hai dòng khác nhau không làm mất của nhau.
+
+    append()/update_row()/delete_rows() ghi nhận thay đổi theo dòng mà không cần
+    tải cả bảng; get_by_id()/find_by() trong cùng request đã thấy các thay đổi đó.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._tables = {}      # filename -> danh sách dòng của request này
+        self._originals = {}   # filename -> (version, rows) lúc tải, để tính thay đổi
+        self._dirty = []
+        self._indexes = {}     # (filename, field) -> {value: [dòng]} trên bảng đã tải
+        self._lookups = {}     # (filename, field, value) -> kết quả đã tra từ db
+        self._records = {}     # filename -> bản ghi insert/update/delete của bảng chưa tải
+
+    def load(self, filename):
+        if filename not in self._tables:
+            version, rows = self.db.snapshot(filename)
+            self._originals[filename] = (version, rows)
+            self._tables[filename] = self.db._copy(rows)
+            if filename in self._records:
+                # Đã ghi theo dòng trước khi tải: gộp vào bản của request (vẫn là bảng bẩn)
+                self._tables[filename] = apply_records(self._tables[filename], self._records.pop(filename))
+        return self._tables[filename]
+
+    def save(self, filename, data):
+        self._tables[filename] = data
+        if filename not in self._dirty:
+            self._dirty.append(filename)
+        self._indexes = {key: index for key, index in self._indexes.items() if key[0] != filename}
+
+    def _record(self, filename, records):
+        if filename in self._tables:
+            # Bảng đã tải cả: sửa thẳng trên bản của request
+            self.save(filename, apply_records(self._tables[filename], records))
+            return
+        self._records.setdefault(filename, []).extend(records)
+        if filename not in self._dirty:
+            self._dirty.append(filename)
+
+    def append(self, filename, *rows):
+        self._record(filename, [{'op': 'insert', 'row': row} for row in rows])
+
+    def update_row(self, filename, row):
+        self._record(filename, [{'op': 'update', 'row': row}])
+
+    def delete_rows(self, filename, row_ids):
+        self._record(filename, [{'op': 'delete', 'id': row_id} for row_id in row_ids])
+
+    def _pending(self, filename, rows, field, value):
+        # Kết quả tra từ db cộng các thay đổi theo dòng chưa ghi của request này
+        records = self._records.get(filename)
+        if not records:
+            return rows
+        return [row for row in apply_records(rows, records) if row.get(field) == value]
+
+    def _index(self, filename, field):
+        index = self._indexes.get((filename, field))
+        if index is None:
+            index = {}
+            for row in self._tables[filename]:
+                index.setdefault(row.get(field), []).append(row)
+            self._indexes[(filename, field)] = index
+        return index
+
+    def get_by_id(self, filename, item_id):
+        if filename in self._tables:
+            rows = self._index(filename, 'id').get(item_id)
+            return rows[0] if rows else None
+        key = (filename, 'id', item_id)
+        if key not in self._lookups:
+            self._lookups[key] = self.db.get_by_id(filename, item_id)
+        row = self._lookups[key]
+        if filename in self._records:
+            rows = self._pending(filename, [row] if row is not None else [], 'id', item_id)
+            row = rows[0] if rows else None
+        return row
+
+    def find_by(self, filename, field, value):
+        if field not in FOREIGN_KEYS.get(filename, ()):
+            raise ValueError(f'Cột {field} của {filename} chưa được khai báo chỉ mục')
+        if filename in self._tables:
+            return list(self._index(filename, field).get(value, []))
+        key = (filename, field, value)
+        if key not in self._lookups:
+            self._lookups[key] = self.db.find_by(filename, field, value)
+        return self._pending(filename, list(self._lookups[key]), field, value)
+
+    def commit(self):
+        """Ghi các bảng đã save() và các thay đổi theo dòng trong một giao dịch, trả về danh sách bảng đã ghi"""
+        dirty, self._dirty = self._dirty, []
+        if not dirty:
+            return []
+        records, self._records = self._records, {}
+        with self.db.transaction(*dirty) as tx:
+            for filename in dirty:
+                if filename in records:
+                    tx.write_records(filename, records[filename])
+                    continue
+                data = self._tables[filename]
+                version, original = self._originals.get(filename, (None, None))
+                if (original is not None and self.db.version(filename) != version
+                        and has_ids(original) and has_ids(data)):
+                    # Bảng đã đổi từ lúc tải: chỉ áp phần thay đổi của request này
+                    data = apply_records(tx.load(filename), diff_rows(original, data))
+                tx.save(filename, data)
+        self._lookups = {}
+        return dirty
+
+    def rollback(self):
+        self._dirty = []
+        self._records = {}
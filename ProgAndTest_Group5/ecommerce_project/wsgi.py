@@ -0,0 +1,50 @@
+"""Điểm vào WSGI cho môi trường production.
+
+    gunicorn -c gunicorn.conf.py          # Linux/macOS: nhiều tiến trình x nhiều luồng
+    py run_waitress.py                    # Windows: một tiến trình nhiều luồng
+
+Các đối tượng dùng chung (db, auth, cache, chỉ mục...) được tạo một lần khi
+import app. Chúng an toàn khi chạy song song nhiều luồng (mỗi cấu trúc có khóa
+riêng) và nhất quán giữa các tiến trình: dữ liệu nằm trên đĩa và được ghi dưới
+file lock, cache của mỗi tiến trình luôn so chữ ký/version với đĩa trước khi
+dùng, giới hạn đăng nhập được đếm chung qua file. before_fork()/after_fork()
+lo phần tài nguyên không được mang qua fork (kết nối SQLite, số liệu đo).
+"""
+import os
+import sys
+from config import Config
+
+
+def create_app(**overrides):
+    """Áp dụng cấu hình (biến môi trường TECHSTORE_* hoặc `overrides`) rồi trả về app Flask.
+
+    Cấu hình phải được đặt trước khi import app vì db/auth/cache đọc Config lúc
+    khởi tạo, nên `overrides` chỉ có tác dụng ở lần gọi đầu tiên trong tiến trình.
+    """
+    if overrides and 'app' in sys.modules:
+        raise RuntimeError('create_app(**overrides) phải được gọi trước khi import app')
+    for key, value in overrides.items():
+        if not hasattr(Config, key):
+            raise AttributeError(f'Config không có thiết lập {key}')
+        setattr(Config, key, value)
+    if 'DATA_DIR' in overrides and 'SQLITE_PATH' not in overrides:
+        Config.SQLITE_PATH = os.path.join(Config.DATA_DIR, 'techstore.db')
+    from app import app
+    return app
+
+
+def before_fork():
+    """Gọi trong tiến trình master ngay trước khi fork worker"""
+    if 'app' not in sys.modules:
+        # Không preload: master chưa import app nên không giữ tài nguyên nào
+        return
+    from app import db
+    db.close()
+
+
+def after_fork():
+    """Gọi trong tiến trình worker ngay sau khi fork"""
+    from utils.metrics import metrics
+    # Số liệu /metrics là của từng worker, không tính những gì master đã đo
+    metrics.reset()
+